@@ -0,0 +1,171 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import argparse, json, os, random, socket, sys, time
+
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code')
+sys.path.insert(0, CODE_DIR)
+
+from packets import *
+from ports   import parse_ports
+
+
+class Packet_Benchmark:
+
+    RUNS      = 5
+    DURATION  = 0.5     # Seconds every run keeps calling the case
+    TOLERANCE = 0.20    # Share of the baseline rate a case may lose before it counts as a regression
+    BATCH     = 1024    # Probes built per call, so the loop overhead stays out of the rates
+    DST_IP    = '192.0.2.1'
+    SRC_IP    = '192.0.2.2'
+
+    def __init__(self, runs:int, tolerance:float, baseline:str|None, only:list|None) -> None:
+        self._runs:int         = runs
+        self._tolerance:float  = tolerance
+        self._baseline:dict    = self._load_baseline(baseline)
+        self._only:list        = only
+        self._results:dict     = dict()
+
+
+    @staticmethod
+    def _load_baseline(path:str|None) -> dict:
+        if not path or not os.path.exists(path): return dict()
+        with open(path) as file:
+            return json.load(file)
+
+
+    def _run(self) -> bool:
+        passed = True
+        for name, create in self._cases().items():
+            if self._only and name not in self._only: continue
+            try:   function, units, unit = create()
+            except ImportError as error:
+                self._results[name] = {'skipped': str(error)}
+                print(f'{name:<16} skipped ({error})')
+                continue
+            rates = [self._measure(function, units) for _ in range(self._runs)]
+            self._results[name] = {'rate': max(rates), 'unit': unit, 'runs': rates}
+            passed &= self._check(name, max(rates), unit)
+        return passed
+
+
+    def _measure(self, function, units:int) -> float:
+        calls    = 0
+        start    = time.perf_counter()
+        deadline = start + self.DURATION
+        while (now := time.perf_counter()) < deadline:
+            function()
+            calls += 1
+        return calls * units / (now - start)
+
+
+    def _check(self, name:str, rate:float, unit:str) -> bool:
+        line = f'{name:<16} {rate:16,.0f} {unit}/s'
+        base = self._baseline.get(name, {}).get('rate')
+        if not base:
+            print(line)
+            return True
+        ratio  = rate / base
+        status = 'ok' if ratio >= 1 - self._tolerance else 'SLOWER'
+        print(f'{line}  x{ratio:.2f} of baseline {status}')
+        return status == 'ok'
+
+
+    # CASES --------------------------------------------------------------------------------------------------
+
+    # Every case returns the function to time, the units one call handles and their name
+    def _cases(self) -> dict:
+        return {
+            'tcp_builder':     self._tcp_builder,
+            'tcp_template':    self._tcp_template,
+            'udp_template':    self._udp_template,
+            'scapy_tcp':       self._scapy_tcp,
+            'checksum':        self._checksum,
+            'arena_checksums': self._arena_checksums,
+            'parse_tcp_reply': self._parse_tcp_reply,
+            'port_spec':       self._port_spec,
+        }
+
+
+    def _tcp_builder(self) -> tuple:
+        return lambda: create_tcp_packet(self.DST_IP, 80, self.SRC_IP, 40000), 1, 'probes'
+
+
+    def _tcp_template(self) -> tuple:
+        template = Tcp_Template(self.DST_IP, self.SRC_IP, 40000)
+        arena    = Packet_Arena(self.BATCH)
+        def render():
+            for index in range(self.BATCH):
+                template._render(arena._slot(index), index + 1, index)
+        return render, self.BATCH, 'probes'
+
+
+    def _udp_template(self) -> tuple:
+        template = Udp_Template(self.SRC_IP, 40000)
+        arena    = Packet_Arena(self.BATCH, Udp_Template.HEADER + 64)
+        dst_ip   = int.from_bytes(socket.inet_aton(self.DST_IP), 'big')
+        payload  = bytes(range(32))
+        def render():
+            for index in range(self.BATCH):
+                template._render(arena._slot(index), dst_ip, index + 1, payload, index)
+        return render, self.BATCH, 'probes'
+
+
+    def _scapy_tcp(self) -> tuple:
+        from scapy.layers.inet import IP as Scapy_IP, TCP as Scapy_TCP
+        return lambda: bytes(Scapy_IP(dst=self.DST_IP, src=self.SRC_IP) / Scapy_TCP(dport=80, flags='S')), 1, 'probes'
+
+
+    @staticmethod
+    def _checksum() -> tuple:
+        data = random.randbytes(1500)
+        return lambda: checksum(data), len(data), 'bytes'
+
+
+    def _arena_checksums(self) -> tuple:
+        template = Tcp_Template(self.DST_IP, self.SRC_IP, 40000)
+        arena    = Packet_Arena(self.BATCH)
+        for index in range(self.BATCH): template._render(arena._slot(index), index + 1)
+        return lambda: arena._recompute_tcp_checksums(template._pseudo_sum), self.BATCH, 'probes'
+
+
+    def _parse_tcp_reply(self) -> tuple:
+        reply = bytes(create_tcp_packet(self.SRC_IP, 40000, self.DST_IP, 80))
+        def parse():
+            for _ in range(self.BATCH):
+                parse_tcp_reply(reply)
+        return parse, self.BATCH, 'replies'
+
+
+    # Expanding the spec is what a scan of every port pays for, parsing alone only builds one range
+    @staticmethod
+    def _port_spec() -> tuple:
+        def expand():
+            for _ in parse_ports('1-65535'): pass
+        return expand, 65535, 'ports'
+
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure packet construction, checksum and parsing rates')
+    parser.add_argument('-n', '--runs',      type=int,   default=Packet_Benchmark.RUNS)
+    parser.add_argument('-t', '--tolerance', type=float, default=Packet_Benchmark.TOLERANCE)
+    parser.add_argument('-b', '--baseline',  type=str,   help='JSON results of a previous run to compare against')
+    parser.add_argument('-o', '--output',    type=str,   help='Write the results as JSON')
+    parser.add_argument('cases',             nargs='*',  help='Run only these cases')
+    args      = parser.parse_args()
+    benchmark = Packet_Benchmark(args.runs, args.tolerance, args.baseline, args.cases)
+    passed    = benchmark._run()
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(benchmark._results, file, indent=2)
+    sys.exit(0 if passed else 1)
+
+
+
+if __name__ == '__main__':
+    main()
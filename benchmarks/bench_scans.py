@@ -0,0 +1,207 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import argparse, importlib.util, json, os, shutil, statistics, subprocess, sys, tempfile, time
+
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code')
+MAIN     = os.path.join(CODE_DIR, 'main.py')
+sys.path.insert(0, CODE_DIR)
+
+from ports import parse_ports
+
+
+# Opens TCP listeners and UDP echo sockets on the given address, prints their ports and runs until stdin closes
+LISTENER = '''
+import select, socket, sys
+host, count = sys.argv[1], int(sys.argv[2])
+tcp = [socket.create_server((host, 0), backlog=4096) for _ in range(count)]
+udp = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(count)]
+for sock in udp: sock.bind((host, 0))
+print(*(sock.getsockname()[1] for sock in tcp), sep=',')
+print(*(sock.getsockname()[1] for sock in udp), sep=',', flush=True)
+while True:
+    for sock in select.select([*udp, sys.stdin], [], [])[0]:
+        if sock is sys.stdin: sys.exit()
+        data, peer = sock.recvfrom(2048)
+        sock.sendto(data or b'\\x00', peer)
+'''
+
+
+class Scan_Benchmark:
+
+    RUNS      = 3
+    LISTENERS = 32
+    TOLERANCE = 0.20    # Share of the baseline throughput a case may lose before it counts as a regression
+    TIMEOUT   = 600
+    NAMESPACE = 'nxbench'
+    VETH      = ('nxbench0', 'nxbench1')
+    ADDRESSES = ('10.254.0.1', '10.254.0.2')    # Host and namespace ends of the veth pair
+    SIMULATED = ('10.254.1.1', '10.254.1.2')    # Scanner and target of the virtual network
+    CASES     = {                               # Engine options, ports scanned besides the listeners, root needed
+        'connect': (['-C'],                '1-65535', False),
+        'fast':    (['-F'],                '1-65535', True),
+        'udp':     (['-U', '-R', '20000'], '1-4096',  True),
+        'normal':  ([],                    '1-256',   True),
+    }
+
+    def __init__(self, runs:int, tolerance:float, latency:float, baseline:str|None, only:list|None) -> None:
+        self._runs:int         = runs
+        self._tolerance:float  = tolerance
+        self._latency:float    = latency
+        self._baseline:dict    = self._load_baseline(baseline)
+        self._only:list        = only
+        self._results:dict     = dict()
+
+
+    @staticmethod
+    def _load_baseline(path:str|None) -> dict:
+        if not path or not os.path.exists(path): return dict()
+        with open(path) as file:
+            return json.load(file)
+
+
+    def _run(self) -> bool:
+        passed  = self._run_network('loopback', '127.0.0.1', [])
+        passed &= self._run_simulated()
+        if reason := self._veth_unavailable():
+            print(f'veth/*{"":<11} skipped ({reason})')
+            return passed
+        self._create_namespace()
+        try:     passed &= self._run_network('veth', self.ADDRESSES[1], ['ip', 'netns', 'exec', self.NAMESPACE])
+        finally: self._delete_namespace()
+        return passed
+
+
+    def _run_network(self, network:str, address:str, prefix:list) -> bool:
+        listener = subprocess.Popen([*prefix, sys.executable, '-c', LISTENER, address, str(self.LISTENERS)],
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        try:
+            listening = {'tcp': listener.stdout.readline().strip(), 'udp': listener.stdout.readline().strip()}
+            return self._run_cases(network, address, listening, [])
+        finally:
+            listener.stdin.close()
+            listener.wait()
+
+
+    # The in-process virtual network needs no privileges and takes the kernel out of the measurement
+    def _run_simulated(self) -> bool:
+        opened = ','.join(str(port) for port in range(40000, 40000 + self.LISTENERS))
+        spec   = {'local': f'{self.SIMULATED[0]}/24', 'latency': self._latency / 1000, 'seed': 1,
+                  'hosts': {self.SIMULATED[1]: {'tcp': opened, 'udp': opened}}}
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump(spec, file)
+            file.flush()
+            return self._run_cases('simulated', self.SIMULATED[1], {'tcp': opened, 'udp': opened}, ['-Z', file.name])
+
+
+    # Extra options are only given to the simulated network, which has no need for root
+    def _run_cases(self, network:str, address:str, listening:dict, extra:list) -> bool:
+        passed = True
+        for case, (options, ports, privileged) in self.CASES.items():
+            name = f'{network}/{case}'
+            if self._only and case not in self._only and name not in self._only: continue
+            if reason := self._unavailable(case, privileged and not extra):
+                self._results[name] = {'skipped': reason}
+                print(f'{name:<16} skipped ({reason})')
+                continue
+            opened  = listening['udp' if case == 'udp' else 'tcp']
+            passed &= self._run_case(name, address, [*options, *extra], f'{ports},{opened}', set(map(int, opened.split(','))))
+        return passed
+
+
+    @staticmethod
+    def _unavailable(case:str, privileged:bool) -> str|None:
+        if privileged and os.geteuid() != 0: return 'needs root'
+        if case == 'normal' and not importlib.util.find_spec('scapy'): return 'Scapy is not installed'
+        return None
+
+
+    # RUNS ---------------------------------------------------------------------------------------------------
+
+    def _run_case(self, name:str, address:str, options:list, ports:str, expected:set) -> bool:
+        probes  = len(parse_ports(ports))
+        runs    = [self._time_scan(address, options, ports) for _ in range(self._runs)]
+        median  = statistics.median(elapsed for elapsed, _ in runs)
+        missing = sorted(set.union(*(expected - opened for _, opened in runs)))
+        self._results[name] = {'rate': probes / median, 'probes': probes, 'median': median,
+                               'runs': [elapsed for elapsed, _ in runs], 'missing': missing}
+        return self._check(name, probes / median, median, missing)
+
+
+    def _time_scan(self, address:str, options:list, ports:str) -> tuple[float, set]:
+        start  = time.perf_counter()
+        result = subprocess.run([sys.executable, MAIN, 'pscan', address, '-p', ports, *options, '-o', 'jsonl'],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=self.TIMEOUT)
+        elapsed = time.perf_counter() - start
+        records = [json.loads(line) for line in result.stdout.splitlines() if line.startswith('{')]
+        return elapsed, {record['port'] for record in records if record.get('state') == 'open'}
+
+
+    def _check(self, name:str, rate:float, median:float, missing:list) -> bool:
+        line   = f'{name:<16} {rate:12,.0f} probes/s ({median:.2f} s)'
+        base   = self._baseline.get(name, {}).get('rate')
+        ratio  = rate / base if base else 1.0
+        status = 'ok' if ratio >= 1 - self._tolerance and not missing else 'FAIL'
+        print(f'{line}  x{ratio:.2f} of baseline {status}' if base else f'{line} {status}')
+        if missing: print(f'{"":<17}open ports not found: {", ".join(map(str, missing))}')
+        return status == 'ok'
+
+
+    # NETWORK NAMESPACE --------------------------------------------------------------------------------------
+
+    # The namespace stands in for a remote host: its replies cross a veth pair and, with --latency, a netem delay
+    @staticmethod
+    def _veth_unavailable() -> str|None:
+        if os.geteuid() != 0: return 'needs root'
+        if not shutil.which('ip'): return 'iproute2 is not installed'
+        return None
+
+
+    def _create_namespace(self) -> None:
+        host, remote = self.VETH
+        inside       = ['ip', 'netns', 'exec', self.NAMESPACE]
+        commands     = [
+            ['ip', 'netns', 'add', self.NAMESPACE],
+            ['ip', 'link', 'add', host, 'type', 'veth', 'peer', 'name', remote, 'netns', self.NAMESPACE],
+            ['ip', 'addr', 'add', f'{self.ADDRESSES[0]}/30', 'dev', host],
+            ['ip', 'link', 'set', host, 'up'],
+            [*inside, 'ip', 'addr', 'add', f'{self.ADDRESSES[1]}/30', 'dev', remote],
+            [*inside, 'ip', 'link', 'set', remote, 'up'],
+            [*inside, 'ip', 'link', 'set', 'lo', 'up'],
+        ]
+        if self._latency: commands.append([*inside, 'tc', 'qdisc', 'add', 'dev', remote, 'root', 'netem', 'delay', f'{self._latency}ms'])
+        self._delete_namespace()
+        for command in commands:
+            subprocess.run(command, check=True)
+
+
+    def _delete_namespace(self) -> None:
+        subprocess.run(['ip', 'link', 'del', self.VETH[0]], stderr=subprocess.DEVNULL)
+        subprocess.run(['ip', 'netns', 'del', self.NAMESPACE], stderr=subprocess.DEVNULL)
+
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure end-to-end scan throughput against local listeners')
+    parser.add_argument('-n', '--runs',      type=int,   default=Scan_Benchmark.RUNS)
+    parser.add_argument('-t', '--tolerance', type=float, default=Scan_Benchmark.TOLERANCE)
+    parser.add_argument('-l', '--latency',   type=float, default=0, help='Milliseconds of delay added to the veth link and the virtual network')
+    parser.add_argument('-b', '--baseline',  type=str,   help='JSON results of a previous run to compare against')
+    parser.add_argument('-o', '--output',    type=str,   help='Write the results as JSON')
+    parser.add_argument('cases',             nargs='*',  help='Run only these cases (engine or network/engine)')
+    args      = parser.parse_args()
+    benchmark = Scan_Benchmark(args.runs, args.tolerance, args.latency, args.baseline, args.cases)
+    passed    = benchmark._run()
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(benchmark._results, file, indent=2)
+    sys.exit(0 if passed else 1)
+
+
+
+if __name__ == '__main__':
+    main()
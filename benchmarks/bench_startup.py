@@ -0,0 +1,91 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import argparse, json, os, statistics, subprocess, sys, time
+
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code')
+MAIN     = os.path.join(CODE_DIR, 'main.py')
+
+
+class Startup_Benchmark:
+
+    RUNS      = 20
+    THRESHOLD = 0.15    # Seconds allowed for the median cold start of a command that does no work
+    CASES     = {
+        'help':   ['--help'],
+        'banner': ['banner'],
+    }
+    FORBIDDEN = ('scapy', 'asyncio')    # Modules that must not be loaded by the cases above
+
+    def __init__(self, runs:int, threshold:float, baseline:str|None) -> None:
+        self._runs:int         = runs
+        self._threshold:float  = threshold
+        self._baseline:dict    = self._load_baseline(baseline)
+        self._results:dict     = dict()
+
+
+    @staticmethod
+    def _load_baseline(path:str|None) -> dict:
+        if not path or not os.path.exists(path): return dict()
+        with open(path) as file:
+            return json.load(file)
+
+
+    def _run(self) -> bool:
+        passed = True
+        for name, arguments in self.CASES.items():
+            timings  = [self._time_once(arguments) for _ in range(self._runs)]
+            imported = self._forbidden_imports(arguments)
+            median   = statistics.median(timings)
+            self._results[name] = {'median': median, 'min': min(timings), 'max': max(timings), 'forbidden': imported}
+            passed  &= self._check(name, median, imported)
+        return passed
+
+
+    @staticmethod
+    def _time_once(arguments:list) -> float:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, MAIN, *arguments], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return time.perf_counter() - start
+
+
+    def _forbidden_imports(self, arguments:list) -> list[str]:
+        result = subprocess.run([sys.executable, '-X', 'importtime', MAIN, *arguments],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        loaded = {line.split('|')[-1].strip() for line in result.stderr.splitlines() if line.startswith('import time:')}
+        return sorted(module for module in loaded if module.split('.')[0] in self.FORBIDDEN)
+
+
+    def _check(self, name:str, median:float, imported:list) -> bool:
+        limit = self._threshold
+        if name in self._baseline:
+            limit = min(limit, self._baseline[name]['median'] * 1.25)
+        status = 'ok' if median <= limit and not imported else 'FAIL'
+        print(f'{name:<8} median {median * 1000:7.1f} ms (limit {limit * 1000:.1f} ms) {status}')
+        if imported: print(f'         unexpected imports: {", ".join(imported)}')
+        return status == 'ok'
+
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure the cold start time of the CLI')
+    parser.add_argument('-n', '--runs',      type=int,   default=Startup_Benchmark.RUNS)
+    parser.add_argument('-t', '--threshold', type=float, default=Startup_Benchmark.THRESHOLD)
+    parser.add_argument('-b', '--baseline',  type=str,   help='JSON results of a previous run to compare against')
+    parser.add_argument('-o', '--output',    type=str,   help='Write the results as JSON')
+    args      = parser.parse_args()
+    benchmark = Startup_Benchmark(args.runs, args.threshold, args.baseline)
+    passed    = benchmark._run()
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(benchmark._results, file, indent=2)
+    sys.exit(0 if passed else 1)
+
+
+
+if __name__ == '__main__':
+    main()
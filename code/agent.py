@@ -0,0 +1,114 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import argparse, multiprocessing, threading, time
+from multiprocessing.connection import Client
+from arg_parser  import Argument_Manager as ArgParser
+from coordinator import HEARTBEAT, parse_address
+from workers     import stream_rows
+from telemetry   import METRICS
+from transport   import select_transport
+from display     import *
+
+
+class Scan_Agent:
+
+    WAIT = 30.0    # Seconds an agent keeps trying to reach a coordinator that is not listening yet
+
+    def __init__(self, parser_manager:ArgParser) -> None:
+        self._coordinator:str = parser_manager.coordinator
+        self._key:str         = parser_manager.key
+        self._connection      = None
+        self._unit:tuple      = None
+        self._send_lock       = threading.Lock()
+        self._stop            = threading.Event()
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        if self._connection: self._connection.close()
+        return False
+
+
+    def _execute(self) -> None:
+        try:
+            if not self._key: raise ValueError('The key printed by the coordinator is required (-y)')
+            self._connection = self._connect()
+            command          = self._create_command(self._connection.recv()[1])
+            threading.Thread(target=self._send_heartbeats, daemon=True).start()
+            print(f'{green("Connected")} to {self._coordinator}')
+            print(f'Finished after {self._run_units(command)} units')
+        except KeyboardInterrupt:                   print(yellow("Process stopped"))
+        except multiprocessing.AuthenticationError: print(yellow('The coordinator rejected the key'))
+        except (EOFError, ConnectionError):         print(yellow('Lost the connection to the coordinator'))
+        except ValueError as error:                 print(yellow(str(error)))
+        except Exception as error:                  print(unexpected_error(error))
+
+
+    def _connect(self):
+        deadline = time.monotonic() + self.WAIT
+        while True:
+            try: return Client(parse_address(self._coordinator), authkey=self._key.encode())
+            except (ConnectionRefusedError, FileNotFoundError):
+                if time.monotonic() >= deadline: raise
+                time.sleep(1)
+
+
+    # The job carries the options of the command run by the coordinator, the agent runs the same command on its units
+    def _create_command(self, job:dict):
+        select_transport(job['flags'].get('simulate'))
+        match job['command']:
+            case 'pscan':
+                from pscan import Port_Scanner
+                scanner = Port_Scanner(argparse.Namespace(host=job['host'], **job['flags']), self)
+                scanner._load_targets()
+                return scanner._get_result_by_transmission_method
+            case 'netmap':
+                from netmap import Network_Mapper
+                return Network_Mapper(argparse.Namespace(**job['flags']), self)._ping_sweep
+
+
+    # An error is reported so the coordinator hands the unit to another agent
+    def _run_units(self, command) -> int:
+        count = 0
+        while (message := self._connection.recv())[0] == 'unit':
+            self._unit = message[1]
+            try:   command()
+            except Exception as error:
+                self._send(('error', str(error)))
+                raise
+            self._send(('metrics', METRICS._take()))
+            self._send(('done', self._unit))
+            count += 1
+        return count
+
+
+    def _send(self, message:tuple) -> None:
+        with self._send_lock:
+            self._connection.send(message)
+
+
+    def _send_heartbeats(self) -> None:
+        while not self._stop.wait(HEARTBEAT):
+            try:   self._send(('alive', None))
+            except OSError: return
+
+
+    # UNITS --------------------------------------------------------------------------------------------------
+
+    # create(unit, units) returns the engine of the current unit and start(engine) its result stream
+    def _run_scan(self, create, start) -> None:
+        with create(*self._unit) as ENGINE:
+            stream_rows(self._send, start(ENGINE))
+
+
+    # sweep(unit, units) returns the active hosts of the current unit, the coordinator displays them
+    def _run_sweep(self, sweep) -> list:
+        self._send(('hosts', sweep(*self._unit)))
+        return list()
@@ -22,36 +22,87 @@ class Argument_Manager:
     def _create_arguments(self, command:str) -> None:
         for arg in self._argument_definitions(command):
             match arg[0]:
-                case 'bool':  self._parser.add_argument(arg[1], arg[2], action="store_true", help=arg[3])
-                case 'value': self._parser.add_argument(arg[1], arg[2], type=arg[3], help=arg[4])
-                case 'opt':   self._parser.add_argument(arg[1], arg[2], nargs='?', const=True, default=False, help=arg[3])
-                case 'arg':   self._parser.add_argument(arg[1], type=str, help=arg[2])
-                case _:       self._parser.add_argument(arg[1], type=str, choices=arg[2], help=arg[3])
+                case 'bool':    self._parser.add_argument(arg[1], arg[2], action="store_true", help=arg[3])
+                case 'value':   self._parser.add_argument(arg[1], arg[2], type=arg[3], help=arg[4])
+                case 'opt':     self._parser.add_argument(arg[1], arg[2], nargs='?', const=True, default=False, help=arg[3])
+                case 'arg':     self._parser.add_argument(arg[1], type=str, help=arg[2])
+                case 'oarg':    self._parser.add_argument(arg[1], type=str, nargs='?', help=arg[2])
+                case 'ochoice': self._parser.add_argument(arg[1], type=str, nargs='?', choices=arg[2], help=arg[3])
+                case 'vchoice': self._parser.add_argument(arg[1], arg[2], type=str, choices=arg[3], help=arg[4])
+                case _:         self._parser.add_argument(arg[1], type=str, choices=arg[2], help=arg[3])
     
 
     @staticmethod
     def _argument_definitions(command:str) -> dict:
         PROTOCOLS   = ['ftp', 'ssh', 'http', 'https']
+        FORMATS     = ['jsonl', 'csv', 'binary']
         DEFINITIONS = {
             'pscan': [
-                ('arg',   'host', 'Target IP/Hostname'),
-                ('bool',  '-s', '--show',    'Display all statuses, both open and closed'),
-                ('bool',  '-r', '--random',  'Use the ports in random order'),
-                ('value', '-p', '--port',    str, 'Specify a port to scan'),
-                ('bool',  '-a', '--all',     'Scan all ports'),
-                ('opt',   '-d', '--delay',   'Add a delay between packet transmissions'),
-                ('bool',  '-S', '--stealth', 'Use only one packet with "SYN" flag'),
-                ('value', '-D', '--decoy',   str, 'Uses decoy method'),
+                ('oarg',    'host', 'Target IP/Hostname/CIDR (comma-separated list or @file)'),
+                ('bool',    '-s', '--show',        'Display all statuses, both open and closed'),
+                ('bool',    '-r', '--random',      'Use the ports in random order'),
+                ('value',   '-p', '--port',        str, 'Specify a port to scan'),
+                ('bool',    '-a', '--all',         'Scan all ports'),
+                ('opt',     '-d', '--delay',       'Add a delay between packet transmissions'),
+                ('bool',    '-S', '--stealth',     'Use only one packet with "SYN" flag'),
+                ('value',   '-D', '--decoy',       str, 'Uses decoy method'),
+                ('bool',    '-F', '--fast',        'Use the stateless high-rate SYN engine'),
+                ('value',   '-e', '--seed',        int, 'Seed for the randomized probe order'),
+                ('value',   '-k', '--shard',       str, 'Scan only one shard of the probe space (i/n)'),
+                ('value',   '-R', '--rate',        float, 'Target rate in packets per second'),
+                ('bool',    '-C', '--connect',     'Use the unprivileged TCP connect engine'),
+                ('value',   '-c', '--concurrency', int, 'Maximum connections in flight (connect engine)'),
+                ('bool',    '-U', '--udp',         'Scan UDP ports with protocol-specific payloads'),
+                ('value',   '-t', '--timeout',     float, 'Upper bound in seconds for the adaptive per-probe timeout'),
+                ('value',   '-n', '--retries',     int, 'Retransmissions of an unanswered probe'),
+                ('vchoice', '-o', '--output',      FORMATS, 'Machine-readable output format'),
+                ('value',   '-w', '--write',       str, 'Write the machine-readable output to a file instead of stdout'),
+                ('value',   '-K', '--checkpoint',  str, 'Periodically save the scan state to this file'),
+                ('value',   '-u', '--resume',      str, 'Continue the scan saved in this checkpoint file'),
+                ('value',   '-H', '--history',     str, 'Record the results in this SQLite history database'),
+                ('bool',    '-x', '--diff',        'Reprobe only what is likely to have changed since the last run'),
+                ('value',   '-m', '--sample',      float, 'Share of the other probes reprobed in diff mode (0-1)'),
+                ('value',   '-W', '--workers',     int, 'Split the scan across this many worker processes'),
+                ('value',   '-L', '--coordinate',  str, 'Hand the scan out to agents connecting to this host:port or Unix socket'),
+                ('value',   '-y', '--key',         str, 'Key the agents authenticate with (random when omitted)'),
+                ('bool',    '-i', '--stats',       'Show a live status line with rates, retransmits, drops and RTT'),
+                ('value',   '-M', '--metrics',     str, 'Keep the scan metrics in this file in the Prometheus text format'),
+                ('value',   '-Z', '--simulate',    str, 'Scan the virtual network described in this JSON file instead of the real one'),
                 ],
             
             'banner': [
-                ('arg',    'host',     'Target IP/Hostname'),
-                ('choice', 'protocol', PROTOCOLS, 'Protocol'),
-                ('value',  '-p', '--port', str, 'Specify a port to grab the banners')
+                ('oarg',    'host',     'Target IP/Hostname'),
+                ('ochoice', 'protocol', PROTOCOLS, 'Protocol'),
+                ('value',   '-p', '--port',        str, 'Specify a port to grab the banners'),
+                ('value',   '-T', '--targets',     str, 'Bulk targets as host:port[:protocol] (comma-separated list or @file)'),
+                ('value',   '-c', '--concurrency', int, 'Maximum simultaneous connections in bulk mode'),
+                ('value',   '-t', '--timeout',     float, 'Per-connection timeout in seconds'),
+                ('value',   '-g', '--deadline',    float, 'Global deadline in seconds for bulk mode'),
+                ('vchoice', '-o', '--output',      FORMATS, 'Machine-readable output format'),
+                ('value',   '-w', '--write',       str, 'Write the machine-readable output to a file instead of stdout'),
+                ('bool',    '-i', '--stats',       'Show a live status line with rates, timeouts and timings'),
+                ('value',   '-M', '--metrics',     str, 'Keep the metrics in this file in the Prometheus text format'),
                 ],
 
             'netmap': [
-                ('bool', '-p', '--ping', 'Use ping instead of an ARP packet')
+                ('bool',    '-p', '--ping',       'Use ping instead of an ARP packet'),
+                ('value',   '-R', '--rate',       float, 'Target rate in packets per second'),
+                ('value',   '-t', '--target',     str, 'Ping sweep target CIDR/IP list (defaults to the local network)'),
+                ('vchoice', '-o', '--output',     FORMATS, 'Machine-readable output format'),
+                ('value',   '-w', '--write',      str, 'Write the machine-readable output to a file instead of stdout'),
+                ('value',   '-H', '--history',    str, 'Record the active hosts in this SQLite history database'),
+                ('bool',    '-x', '--diff',       'Report the hosts that changed since the last sweep'),
+                ('value',   '-W', '--workers',    int, 'Split the sweep across this many worker processes'),
+                ('value',   '-L', '--coordinate', str, 'Hand the ping sweep out to agents connecting to this host:port or Unix socket'),
+                ('value',   '-y', '--key',        str, 'Key the agents authenticate with (random when omitted)'),
+                ('bool',    '-i', '--stats',      'Show a live status line with rates, drops and RTT'),
+                ('value',   '-M', '--metrics',    str, 'Keep the sweep metrics in this file in the Prometheus text format'),
+                ('value',   '-Z', '--simulate',   str, 'Sweep the virtual network described in this JSON file instead of the real one'),
+                ],
+
+            'agent': [
+                ('arg',     'coordinator', 'Coordinator address (host:port or Unix socket path)'),
+                ('value',   '-y', '--key', str, 'Key printed by the coordinator'),
                 ]
         }
         return DEFINITIONS[command]
\ No newline at end of file
@@ -6,15 +6,19 @@
 
 import socket, ssl
 from arg_parser import Argument_Manager as ArgParser
+from output     import Output_Sink, create_sink
+from telemetry  import METRICS, Stats_Reporter
 from display    import *
 
 
 class Banner_Grabbing:
 
     def __init__(self, parser_manager:ArgParser) -> None:
-        self._host:str     = None
-        self._protocol:str = None
-        self._port:int     = None
+        self._host:str         = None
+        self._protocol:str     = None
+        self._port:int         = None
+        self._flags:dict       = None
+        self._sink:Output_Sink = None
         self._get_argument_and_flags(parser_manager)
 
 
@@ -29,21 +33,59 @@ class Banner_Grabbing:
         self._host     = parser_manager.host
         self._protocol = parser_manager.protocol
         self._port     = parser_manager.port
+        self._flags    = {
+            'targets':     parser_manager.targets,
+            'concurrency': parser_manager.concurrency,
+            'timeout':     parser_manager.timeout,
+            'deadline':    parser_manager.deadline,
+            'output':      parser_manager.output,
+            'write':       parser_manager.write,
+            'stats':       parser_manager.stats,
+            'metrics':     parser_manager.metrics,
+        }
 
 
     def _execute(self) -> None:
-        try:   self._grab_banners_on_the_protocol()
+        try:
+            self._sink = create_sink(self._flags['output'], self._flags['write'])
+            with Stats_Reporter('banner', self._flags['stats'], self._flags['metrics']):
+                self._choose_grabbing_mode()
         except ConnectionRefusedError as error: print(f'{err_icon()} {yellow("Connection refused")}: {error}')
         except socket.timeout as error:         print(f'{err_icon()} {yellow("Timeout")}')
         except socket.error as error:           print(f'{err_icon()} {yellow("Socket error")}:\n{error}')
         except Exception as error:              print(f'{unexpected_error(error)}')
+        finally:
+            if self._sink: self._sink._close()
+
+
+    # Machine-readable output for a single target goes through the bulk engine, which returns structured results
+    def _choose_grabbing_mode(self) -> None:
+        if   self._flags['targets']:                       self._grab_banners_in_bulk(self._flags['targets'])
+        elif self._host and self._protocol and self._sink: self._grab_banners_in_bulk(self._single_target())
+        elif self._host and self._protocol:                self._grab_banners_on_the_protocol()
+        else: print(f'{yellow("Missing arguments")}: give a host and a protocol, or --targets')
+
+
+    def _grab_banners_in_bulk(self, spec:str) -> None:
+        from bgrab_bulk import Bulk_Banner_Grabbing, parse_banner_targets    # asyncio is only needed here
+        with METRICS._phase('targets'):
+            targets = parse_banner_targets(spec)
+        with Bulk_Banner_Grabbing(targets, self._flags, self._sink) as BULK:
+            BULK._perform_bulk_grabbing()
+
+
+    def _single_target(self) -> str:
+        port = self._port if self._port else self._protocol_dictionary()[self._protocol]['port']
+        return f'{self._host}:{port}:{self._protocol}'
 
 
     def _grab_banners_on_the_protocol(self) -> None:
         protocol = self._protocol_dictionary().get(self._protocol)
         host     = socket.gethostbyname(self._host)
         port     = self._port if self._port else protocol['port']
+        METRICS._sent += 1
         protocol['func'](host, port)
+        METRICS._replies += 1
 
 
     @staticmethod
@@ -56,15 +98,6 @@ class Banner_Grabbing:
         }
 
 
-# ICONS ======================================================================================================
-
-def ok_icon() -> str:
-    return f'[{green("+")}]'
-
-def err_icon() -> str:
-    return f'[{red("x")}]'
-
-
 # FUNCTIONS ==================================================================================================
 
 def ftp_banner_grabbing(host:str, port:int) -> None:
@@ -0,0 +1,161 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import asyncio, ssl, sys
+from targets   import expand_target_list
+from output    import Output_Sink
+from telemetry import METRICS
+from display   import *
+
+
+PROTOCOLS = ('ftp', 'ssh', 'http', 'https')
+
+
+class Bulk_Banner_Grabbing:
+
+    CONCURRENCY = 200
+    TIMEOUT     = 5.0
+    DEADLINE    = 300.0
+
+    def __init__(self, targets:list[tuple[str, int, str]], arg_flags:dict, sink:Output_Sink=None) -> None:
+        self._targets:list     = targets
+        self._timeout:float    = arg_flags.get('timeout') or self.TIMEOUT
+        self._deadline:float   = arg_flags.get('deadline') or self.DEADLINE
+        self._concurrency:int  = arg_flags.get('concurrency') or self.CONCURRENCY
+        self._semaphore        = None
+        self._ssl_context      = create_ssl_context()
+        self._sink:Output_Sink = sink
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+    def _perform_bulk_grabbing(self) -> None:
+        asyncio.run(self._grab_all())
+
+
+    async def _grab_all(self) -> None:
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+        tasks           = [asyncio.create_task(self._grab(*target)) for target in self._targets]
+        try:
+            for task in asyncio.as_completed(tasks, timeout=self._deadline):
+                result = await task
+                with METRICS._phase('output'):
+                    self._display_result(*result)
+        except asyncio.TimeoutError:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending: task.cancel()
+            owned = self._sink and self._sink._path is None    # Records own stdout, the notice goes to stderr
+            print(f'{yellow("Deadline reached")}: {len(pending)} targets were not finished', file=sys.stderr if owned else sys.stdout)
+
+
+    async def _grab(self, host:str, port:int, protocol:str) -> tuple[str, int, str, list[str]|None, str|None]:
+        async with self._semaphore:
+            METRICS._sent += 1
+            try:
+                lines = await asyncio.wait_for(self._protocol_dictionary()[protocol](host, port), self._timeout)
+                METRICS._replies += 1
+                return host, port, protocol, lines, None
+            except ConnectionRefusedError: return host, port, protocol, None, 'Connection refused'
+            except asyncio.TimeoutError:
+                METRICS._timeouts += 1
+                return host, port, protocol, None, 'Timeout'
+            except (OSError, ssl.SSLError) as error: return host, port, protocol, None, f'Socket error: {error}'
+
+
+    def _protocol_dictionary(self) -> dict:
+        return {
+            'ftp':   self._ftp_banner,
+            'ssh':   self._ssh_banner,
+            'http':  self._http_banner,
+            'https': self._https_banner,
+        }
+
+
+    def _display_result(self, host:str, port:int, protocol:str, lines:list[str]|None, error:str|None) -> None:
+        METRICS._results += 1
+        if self._sink:
+            self._sink._write('banner', {'host': host, 'port': port, 'protocol': protocol, 'lines': lines, 'error': error})
+            if self._sink._path is None: return
+        if error:
+            print(f'{err_icon()} {host}:{port} ({protocol}) -> {yellow(error)}')
+            return
+        print(f'{ok_icon()} {host}:{port} ({protocol})')
+        for line in lines:
+            print(f'  - {line}')
+
+
+    # PROTOCOLS ----------------------------------------------------------------------------------------------
+
+    async def _ftp_banner(self, host:str, port:int) -> list[str]:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:     banner = (await reader.read(1024)).decode('utf-8', errors='ignore').strip()
+        finally: writer.close()
+        return [banner] if banner else ['No banner received']
+
+
+    async def _ssh_banner(self, host:str, port:int) -> list[str]:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:     banner = (await reader.read(1024)).decode(errors='ignore')
+        finally: writer.close()
+        return [line.strip() for line in banner.split(',') if line.strip()]
+
+
+    async def _http_banner(self, host:str, port:int) -> list[str]:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(f'HEAD / HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode())
+            response = (await reader.read(4096)).decode(errors='ignore')
+        finally:
+            writer.close()
+        return [line for line in response.split('\r\n') if line]
+
+
+    async def _https_banner(self, host:str, port:int) -> list[str]:
+        reader, writer = await asyncio.open_connection(host, port, ssl=self._ssl_context, server_hostname=host)
+        try:
+            cert  = writer.get_extra_info('peercert')
+            lines = [f'{field}: {value}' for field, value in cert.items()] if cert else ['No SSL certificates returned']
+            writer.write(b'GET / HTTP/1.1\r\nHost: ' + host.encode() + b'\r\nConnection: close\r\n\r\n')
+            response = (await reader.read(1024)).decode(errors='ignore')
+        finally:
+            writer.close()
+        return lines + [line for line in response.split('\r\n') if line]
+
+
+
+# FUNCTIONS ==================================================================================================
+
+def create_ssl_context() -> ssl.SSLContext:
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode    = ssl.CERT_NONE
+    return context
+
+
+
+def parse_banner_targets(spec:str) -> list[tuple[str, int, str]]:
+    targets = list()
+    for item in expand_target_list(spec):
+        host, port, *protocol = item.split(':')
+        port     = int(port)
+        protocol = protocol[0] if protocol else guess_protocol(port)
+        if protocol not in PROTOCOLS: raise ValueError(f'Unknown protocol: {protocol}')
+        targets.append((host, port, protocol))
+    return targets
+
+
+
+def guess_protocol(port:int) -> str:
+    match port:
+        case 21:         return 'ftp'
+        case 22:         return 'ssh'
+        case 443 | 8443: return 'https'
+        case _:          return 'http'
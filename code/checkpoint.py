@@ -0,0 +1,152 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import array, itertools, json, os, signal, struct, sys, threading, zlib
+from results import Result_Table
+from targets import Cyclic_Permutation, Sequential_Order
+
+
+MAGIC   = b'NXCK'
+VERSION = 1
+
+
+class Scan_Progress:
+
+    def __init__(self, order:Cyclic_Permutation|Sequential_Order, done:bytearray=None,
+                 outstanding:list[int]=None, table:Result_Table=None) -> None:
+        self._order              = order
+        self._done:bytearray     = done if done is not None else bytearray((order._size + 7) // 8)
+        self._outstanding:list   = outstanding or list()
+        self._table:Result_Table = table if table is not None else Result_Table()
+        self._in_flight:set      = set()
+        self._settled:int        = None
+        self._complete:bool      = False
+        self._lock               = threading.Lock()
+
+
+    def _is_done(self, index:int) -> bool:
+        return self._done[index >> 3] & (1 << (index & 7))
+
+
+    def _mark_done(self, index:int) -> None:
+        self._done[index >> 3] |= 1 << (index & 7)
+
+
+    def _done_count(self) -> int:
+        return int.from_bytes(self._done, 'little').bit_count()
+
+
+    # Probes left in flight by the previous run come first, then the order continues from the saved position
+    def _probes(self, track:bool=True):
+        probes = itertools.chain(self._outstanding, iter(self._order))
+        while True:
+            with self._lock:
+                index = next(probes, None)
+                if index is None: return
+                if self._is_done(index): continue
+                if track: self._in_flight.add(index)
+            yield index
+
+
+    # The result is published under the same lock as the done bit, so a checkpoint never holds one without the other.
+    # A probe completes once, a duplicate reply or a reply racing its timeout is dropped
+    def _complete_probe(self, index:int, publish=None) -> None:
+        with self._lock:
+            if self._is_done(index): return
+            if publish: publish()
+            self._in_flight.discard(index)
+            self._mark_done(index)
+
+
+    # The stateless SYN engine cannot tell which probes are still in flight, so it reports the last position
+    # whose probes have all outlived the reply timeout
+    def _settle(self, position:int) -> None:
+        self._settled = position
+
+
+    def _snapshot(self) -> tuple[int, list[int], bytes, int]:
+        with self._lock:
+            position = self._order._position if self._settled is None else self._settled
+            return position, sorted(self._in_flight), bytes(self._done), len(self._table)
+
+
+
+class Checkpoint_Writer:
+
+    INTERVAL = 10.0
+
+    def __init__(self, path:str|None, meta:dict, progress:Scan_Progress) -> None:
+        self._path:str               = path
+        self._meta:dict              = meta
+        self._progress:Scan_Progress = progress
+        self._stop                   = threading.Event()
+        self._save_lock              = threading.Lock()
+        self._thread                 = threading.Thread(target=self._run, daemon=True)
+
+
+    # Every row goes into the checkpoint, so the table keeps the rows already read
+    def __enter__(self):
+        if not self._path: return self
+        self._progress._table._recycle = False
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._path: return False
+        self._stop.set()
+        self._progress._complete = exc_type is None
+        handler = signal.signal(signal.SIGINT, signal.SIG_IGN)    # A second Ctrl+C must not cut the final save short
+        try:     self._save()
+        finally: signal.signal(signal.SIGINT, handler)
+        return False
+
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.INTERVAL):
+            self._save()
+
+
+    def _save(self) -> None:
+        with self._save_lock:
+            position, outstanding, done, rows = self._progress._snapshot()
+            meta = {**self._meta, 'position': position, 'complete': self._progress._complete, 'byteorder': sys.byteorder}
+            save_checkpoint(self._path, meta, done, outstanding, self._progress._table, rows)
+
+
+
+# FUNCTIONS ==================================================================================================
+
+# Layout: MAGIC, version, then length-prefixed sections: JSON metadata, zlib-compressed done bitmap,
+# outstanding probe indices and one section per result table column
+def save_checkpoint(path:str, meta:dict, done:bytes, outstanding:list[int], table:Result_Table, rows:int) -> None:
+    sections = [json.dumps(meta).encode(), zlib.compress(done, 1), array.array('Q', outstanding).tobytes()]
+    sections.extend(column[:rows].tobytes() for column in table._columns())
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(MAGIC + struct.pack('!B', VERSION))
+        for section in sections:
+            file.write(struct.pack('!Q', len(section)) + section)
+    os.replace(temporary, path)
+
+
+
+def load_checkpoint(path:str) -> tuple[dict, bytearray, list[int], Result_Table]:
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data[:4] != MAGIC or data[4] != VERSION: raise ValueError(f'Not a scan checkpoint: {path}')
+    sections, offset = list(), 5
+    while offset < len(data):
+        length = struct.unpack_from('!Q', data, offset)[0]
+        sections.append(data[offset + 8:offset + 8 + length])
+        offset += 8 + length
+    meta        = json.loads(sections[0])
+    outstanding = array.array('Q', sections[2])
+    table       = Result_Table()
+    for column, section in zip(table._columns(), sections[3:]):
+        column.frombytes(section)
+        if meta['byteorder'] != sys.byteorder: column.byteswap()
+    if meta['byteorder'] != sys.byteorder: outstanding.byteswap()
+    return meta, bytearray(zlib.decompress(sections[1])), outstanding.tolist(), table
@@ -0,0 +1,154 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import collections, multiprocessing, secrets, threading, time
+from multiprocessing.connection import Listener
+from results    import Result_Stream, Result_Table
+from checkpoint import Scan_Progress
+from targets    import Target_Space
+from telemetry  import METRICS
+
+
+HEARTBEAT = 10.0    # Seconds between the messages an idle agent sends to show it is alive
+
+
+class Scan_Coordinator:
+
+    UNITS   = 64               # Work units a job is split into, a lost agent only costs the unit it held
+    SILENCE = 3 * HEARTBEAT    # An agent that sends nothing for this long is considered dead
+    LINGER  = 1.0              # Seconds given to every agent to be told that the job is finished
+
+    def __init__(self, address:str, key:str|None, job:dict, notify=print) -> None:
+        self._address      = parse_address(address)
+        self._key:str      = key or secrets.token_hex(16)
+        self._job:dict     = job
+        self._notify       = notify
+        self._pending      = collections.deque(range(self.UNITS))
+        self._finished:int = 0
+        self._condition    = threading.Condition()
+        self._agents:list  = list()
+        self._closed:bool  = False
+        self._listener     = Listener(self._address, authkey=self._key.encode())
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._closed = True
+        self._listener.close()
+        with self._condition:
+            self._finished = self.UNITS
+            self._condition.notify_all()
+        for agent in list(self._agents):
+            agent.join(self.LINGER)
+        return False
+
+
+    # Blocks until every unit has been scanned, handle(payload) receives the results of the agents as they arrive
+    def _run(self, handle) -> None:
+        threading.Thread(target=self._accept_agents, args=(handle,), daemon=True).start()
+        with self._condition:
+            while self._finished < self.UNITS:
+                self._condition.wait()
+
+
+    # The key is checked by the listener before an agent is accepted. Port probes and clients that drop out of
+    # the handshake are skipped, the loop only ends with the listener
+    def _accept_agents(self, handle) -> None:
+        while not self._closed:
+            try:   connection = self._listener.accept()
+            except (multiprocessing.AuthenticationError, EOFError, ConnectionError): continue
+            except OSError:
+                if self._closed: return
+                time.sleep(0.1)
+                continue
+            agent = threading.Thread(target=self._serve_agent, args=(connection, handle), daemon=True)
+            agent.start()
+            self._agents.append(agent)
+
+
+    def _serve_agent(self, connection, handle) -> None:
+        unit = None
+        try:
+            connection.send(('job', self._job))
+            while (unit := self._next_unit()) is not None:
+                connection.send(('unit', (unit, self.UNITS)))
+                self._receive_unit(connection, handle)
+                self._finish_unit()
+            connection.send(('finish', None))
+        except Exception as error:
+            if unit is not None: self._requeue(unit, error)
+        finally:
+            connection.close()
+
+
+    def _receive_unit(self, connection, handle) -> None:
+        while True:
+            if not connection.poll(self.SILENCE): raise TimeoutError('The agent stopped responding')
+            kind, payload = connection.recv()
+            match kind:
+                case 'done':    return
+                case 'alive':   continue
+                case 'error':   raise RuntimeError(payload)
+                case 'metrics': METRICS._merge(payload)
+                case _:         handle(payload)
+
+
+    # UNITS --------------------------------------------------------------------------------------------------
+
+    # Waits while the remaining units are held by other agents, one of them may still be handed back
+    def _next_unit(self) -> int|None:
+        with self._condition:
+            while not self._pending and self._finished < self.UNITS:
+                self._condition.wait()
+            return self._pending.popleft() if self._pending else None
+
+
+    def _finish_unit(self) -> None:
+        with self._condition:
+            self._finished += 1
+            self._condition.notify_all()
+
+
+    def _requeue(self, unit:int, error:Exception) -> None:
+        with self._condition:
+            self._pending.appendleft(unit)
+            self._condition.notify_all()
+        self._notify(f'Agent lost ({str(error) or type(error).__name__}), unit {unit} was handed back')
+
+
+    # JOBS ---------------------------------------------------------------------------------------------------
+
+    # A unit handed back is scanned again from its start, the probes its first agent already reported are dropped
+    def _stream(self, space:Target_Space, progress:Scan_Progress) -> Result_Stream:
+        stream = Result_Stream(progress._table)
+        return stream._produce(lambda: self._run(lambda columns: self._merge_rows(space, progress, stream, columns)))
+
+
+    @staticmethod
+    def _merge_rows(space:Target_Space, progress:Scan_Progress, stream:Result_Stream, columns:tuple[bytes, ...]) -> None:
+        rows = Result_Table()
+        for row in rows._extend(columns):
+            host, port = rows._hosts[row], rows._ports[row]
+            values     = (host, port, rows._flags[row], rows._ttls[row], rows._windows[row], rows._rtts[row])
+            progress._complete_probe(space._index(host, port), lambda: stream._put(*values))
+
+
+    def _gather(self) -> list:
+        results = set()
+        self._run(results.update)
+        return list(results)
+
+
+
+# FUNCTIONS ==================================================================================================
+
+# "host:port" is a TCP address, where an empty host listens on every interface. Anything else is a Unix socket path
+def parse_address(spec:str) -> tuple[str, int]|str:
+    host, separator, port = spec.rpartition(':')
+    if separator and port.isdigit() and '/' not in spec: return host or '0.0.0.0', int(port)
+    return spec
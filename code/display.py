@@ -26,4 +26,10 @@ def yellow(message:str) -> str:
     return '\033[33m' + message + '\033[0m'
 
 def unexpected_error(error:str) -> str:
-    return red('Unexpected error') + f'\nERROR: {error}'
\ No newline at end of file
+    return red('Unexpected error') + f'\nERROR: {error}'
+
+def ok_icon() -> str:
+    return f'[{green("+")}]'
+
+def err_icon() -> str:
+    return f'[{red("x")}]'
\ No newline at end of file
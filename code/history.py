@@ -0,0 +1,151 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import os, sqlite3, time
+from packets import TCP_SYN_ACK
+
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.netxplorer', 'history.db')
+SCHEMA       = '''
+    CREATE TABLE IF NOT EXISTS scans (
+        id       INTEGER PRIMARY KEY,
+        command  TEXT    NOT NULL,
+        target   TEXT    NOT NULL,
+        started  REAL    NOT NULL,
+        finished REAL
+    );
+    CREATE TABLE IF NOT EXISTS ports (
+        scan   INTEGER NOT NULL REFERENCES scans (id),
+        host   INTEGER NOT NULL,
+        port   INTEGER NOT NULL,
+        flags  INTEGER NOT NULL,
+        ttl    INTEGER NOT NULL,
+        window INTEGER NOT NULL,
+        rtt    REAL    NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS hosts (
+        scan INTEGER NOT NULL REFERENCES scans (id),
+        host INTEGER NOT NULL,
+        mac  TEXT
+    );
+    CREATE INDEX IF NOT EXISTS scans_by_target ON scans (command, target, started);
+    CREATE INDEX IF NOT EXISTS ports_by_scan   ON ports (scan, host, port);
+    CREATE INDEX IF NOT EXISTS hosts_by_scan   ON hosts (scan, host);
+'''
+
+
+class Scan_History:
+
+    BATCH = 1000
+
+    # opened are the flags of an open port, a SYN/ACK unless the scan is not a TCP one
+    def __init__(self, path:str, command:str, target:str, opened:int=TCP_SYN_ACK) -> None:
+        self._path:str            = path
+        self._command:str         = command
+        self._target:str          = target
+        self._opened:int          = opened
+        self._connection          = self._connect()
+        self._previous_scan:tuple = self._last_scan()
+        self._scan:int            = self._begin()
+        self._pending_ports:list  = list()
+        self._pending_hosts:list  = list()
+        self._current_ports:dict  = dict()
+        self._current_hosts:dict  = dict()
+
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self._path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self._path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        return connection
+
+
+    # (id, start time) of the last run of the same command against the same target that finished
+    def _last_scan(self) -> tuple[int, float]|None:
+        return self._connection.execute(
+            'SELECT id, started FROM scans WHERE command = ? AND target = ? AND finished IS NOT NULL '
+            'ORDER BY started DESC LIMIT 1', (self._command, self._target)).fetchone()
+
+
+    def _begin(self) -> int:
+        cursor = self._connection.execute('INSERT INTO scans (command, target, started) VALUES (?, ?, ?)',
+                                          (self._command, self._target, time.time()))
+        self._connection.commit()
+        return cursor.lastrowid
+
+
+    def _finish(self) -> None:
+        self._flush()
+        self._connection.execute('UPDATE scans SET finished = ? WHERE id = ?', (time.time(), self._scan))
+        self._connection.commit()
+
+
+    # Rows of an interrupted run are kept, only the run is left without a finish time
+    def _close(self) -> None:
+        self._flush()
+        self._connection.commit()
+        self._connection.close()
+
+
+    def _flush(self) -> None:
+        self._connection.executemany('INSERT INTO ports VALUES (?, ?, ?, ?, ?, ?, ?)', self._pending_ports)
+        self._connection.executemany('INSERT INTO hosts VALUES (?, ?, ?)', self._pending_hosts)
+        self._pending_ports.clear()
+        self._pending_hosts.clear()
+
+
+    # PORTS --------------------------------------------------------------------------------------------------
+
+    def _record_port(self, host:int, port:int, flags:int, ttl:int=0, window:int=0, rtt:float=0.0) -> None:
+        self._current_ports[(host, port)] = flags
+        self._pending_ports.append((self._scan, host, port, flags, ttl, window, rtt))
+        if len(self._pending_ports) >= self.BATCH: self._flush()
+
+
+    # Differential runs reprobe every probe open before them and record the ones that stopped answering, so the
+    # last finished run holds the latest observation of every open probe. Interrupted runs are left out
+    def _previous_ports(self) -> dict[tuple[int, int], int]:
+        if self._previous_scan is None: return dict()
+        rows = self._connection.execute('SELECT host, port, flags FROM ports WHERE scan = ?', (self._previous_scan[0],))
+        return {(host, port): flags for host, port, flags in rows}
+
+
+    def _previous_open(self) -> list[tuple[int, int]]:
+        return [probe for probe, flags in self._previous_ports().items() if flags == self._opened]
+
+
+    # Probes open in an earlier run that this run reached without finding them open are reported as closed
+    def _port_changes(self, previous_open:list, probed) -> tuple[list, list]:
+        previous = set(previous_open)
+        opened   = [probe for probe, flags in self._current_ports.items() if flags == self._opened and probe not in previous]
+        closed   = [probe for probe in previous_open if self._current_ports.get(probe) != self._opened and probed(*probe)]
+        for host, port in closed:
+            if (host, port) not in self._current_ports: self._record_port(host, port, 0)
+        return sorted(opened), sorted(closed)
+
+
+    # HOSTS --------------------------------------------------------------------------------------------------
+
+    def _record_host(self, host:int, mac:str|None) -> None:
+        self._current_hosts[host] = mac
+        self._pending_hosts.append((self._scan, host, mac))
+        if len(self._pending_hosts) >= self.BATCH: self._flush()
+
+
+    def _previous_hosts(self) -> dict[int, str|None]:
+        if self._previous_scan is None: return dict()
+        rows = self._connection.execute('SELECT host, mac FROM hosts WHERE scan = ?', (self._previous_scan[0],))
+        return dict(rows.fetchall())
+
+
+    def _host_changes(self) -> tuple[list, list, list]:
+        previous = self._previous_hosts()
+        joined   = [host for host in self._current_hosts if host not in previous]
+        left     = [host for host in previous if host not in self._current_hosts]
+        changed  = [host for host, mac in self._current_hosts.items() if host in previous and mac != previous[host]]
+        return sorted(joined), sorted(left), sorted(changed)
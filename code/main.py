@@ -4,11 +4,8 @@
 # Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
 
 
-import sys
+import sys, importlib
 from arg_parser import Argument_Manager as ArgParser
-from pscan      import Port_Scanner
-from bgrab      import Banner_Grabbing
-from netmap     import Network_Mapper
 from display    import *
 
 
@@ -18,9 +15,10 @@ class Main:
         self._command:str    = None
         self._arguments:list = None
         self._commands_dict  = {
-            'pscan':  Port_Scanner,
-            'banner': Banner_Grabbing,
-            'netmap': Network_Mapper
+            'pscan':  ('pscan',  'Port_Scanner'),
+            'banner': ('bgrab',  'Banner_Grabbing'),
+            'netmap': ('netmap', 'Network_Mapper'),
+            'agent':  ('agent',  'Scan_Agent')
         }
 
 
@@ -52,7 +50,8 @@ class Main:
 
     def _run_command(self, arg_parser:ArgParser) -> None:
         try:
-            strategy_class = self._commands_dict.get(self._command)
+            module, class_name = self._commands_dict.get(self._command)
+            strategy_class     = getattr(importlib.import_module(module), class_name)
             with strategy_class(arg_parser) as strategy:
                 strategy._execute()
         except Exception as error:
@@ -67,6 +66,7 @@ class Main:
               f'{green("pscan")}....: Portscaning\n'
               f'{green("banner")}...: Banner Grabbing\n'
               f'{green("netmap")}...: Network Mapping\n'
+              f'{green("agent")}....: Scan agent of a distributed pscan/netmap\n'
               )
 
 
@@ -4,20 +4,27 @@
 # Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
 
 
-from scapy.all         import conf, get_if_addr, Packet
-from scapy.layers.l2   import Ether, ARP
-from scapy.layers.inet import IP, ICMP
-from scapy.sendrecv    import srp, sr
+import sys, time
 from arg_parser        import Argument_Manager as ArgParser
+from netmap_arp        import Arp_Sweep
+from netmap_ping       import Ping_Sweep
+from targets           import Target_Space, parse_targets, int_to_ip, ip_to_int
+from output            import Output_Sink, create_sink
+from history           import Scan_History, DEFAULT_PATH
+from telemetry         import METRICS, Stats_Reporter
+from transport         import current_transport, select_transport
 from network           import *
 from display           import *
 
 
 class Network_Mapper:
 
-    def __init__(self, parser_manager:ArgParser) -> None:
-        self._flags:dict = None
-        self._my_ip:str  = get_if_addr(conf.iface)
+    # An agent runs the sweep on the work units a coordinator hands it
+    def __init__(self, parser_manager:ArgParser, agent=None) -> None:
+        self._flags:dict       = None
+        self._sink:Output_Sink = None
+        self._history          = None
+        self._agent            = agent
         self._get_argument_and_flags(parser_manager)
 
 
@@ -30,72 +37,154 @@ class Network_Mapper:
 
     def _execute(self) -> None:
         try:
-            if self._flags['ping']: self._ping_sweep()
-            else:                   self._run_arp_methods()
+            select_transport(self._flags['simulate'])
+            self._sink    = create_sink(self._flags['output'], self._flags['write'])
+            self._history = self._open_history()
+            if self._flags['coordinate'] and not self._flags['ping']:
+                raise ValueError('Agents (-L) only run ping sweeps (-p)')
+            with Stats_Reporter('netmap', self._flags['stats'], self._flags['metrics']):
+                if self._flags['ping']: self._ping_sweep()
+                else:                   self._run_arp_methods()
+            if self._history: self._report_changes()
         except KeyboardInterrupt:   print(yellow("Process stopped"))
-        except ValueError as error: print(yellow(error))
+        except ValueError as error: print(yellow(str(error)))
         except Exception as error:  print(unexpected_error(error))
+        finally:
+            if self._sink:    self._sink._close()
+            if self._history: self._history._close()
 
 
     def _get_argument_and_flags(self, parser_manager:ArgParser) -> None:
-        self._flags = {'ping': parser_manager.ping}
-
-    # PACKETS -------------------------------------------------------------------------
-
-    def _get_arp_packet(self) -> Packet:
-        return Ether(dst="FF:FF:FF:FF:FF:FF") / ARP(op=1, pdst=self._my_ip)
-    
-    def _get_ping_packet(self, target_ip:ipaddress) -> Packet:
-        return IP(dst=target_ip) / ICMP()
+        self._flags = {
+            'ping':       parser_manager.ping,
+            'rate':       parser_manager.rate,
+            'target':     parser_manager.target,
+            'output':     parser_manager.output,
+            'write':      parser_manager.write,
+            'history':    parser_manager.history,
+            'diff':       parser_manager.diff,
+            'workers':    parser_manager.workers,
+            'coordinate': parser_manager.coordinate,
+            'key':        parser_manager.key,
+            'stats':      parser_manager.stats,
+            'metrics':    parser_manager.metrics,
+            'simulate':   parser_manager.simulate,
+        }
 
 
     # ARP -----------------------------------------------------------------------------
     def _run_arp_methods(self) -> None:
-        packet       = self._get_arp_packet()
-        responses, _ = srp(packet, timeout=2, verbose=False)
-        self._display_arp_result(responses)
+        with METRICS._phase('targets'):
+            interface = current_transport()._default_interface()
+            network   = self._local_network(interface)
+        responses = self._sweep(lambda rate, shard: self._arp_shard(interface, network, rate, shard))
+        self._display_arp_result(sorted(responses, key=lambda response: ip_to_int(response[0])))
 
 
     @staticmethod
-    def _display_arp_result(responses:list[Packet]) -> None:
-        for _, answered in responses:
-            print(f'{green("Active host")}: IP {answered.psrc:<15}, MAC {answered.hwsrc}')
+    def _arp_shard(interface:str, network:ipaddress.IPv4Network, rate:float, shard:tuple) -> list[tuple[str, str]]:
+        with Arp_Sweep(interface, network, rate, shard) as SWEEP:
+            return SWEEP._perform_arp_sweep()
+
+
+    def _display_arp_result(self, responses:list[tuple[str, str]]) -> None:
+        with METRICS._phase('output'):
+            for ip, mac in responses:
+                if self._write_host(ip, mac): continue
+                print(f'{green("Active host")}: IP {ip:<15}, MAC {mac}')
 
 
     # PING ---------------------------------------------------------------------------
 
     def _ping_sweep(self) -> None:
-        packets   = self._create_packets()
-        responses = list() 
-        for pkt_sublist in packets:
-            received, _ = sr(pkt_sublist, timeout=5, verbose=0)
-            responses.append(received[-1])
-        print('ok')
-        self._display_ping_result(responses)
+        with METRICS._phase('targets'):
+            space    = Target_Space(self._get_ping_targets(), [0])
+        active_hosts = self._sweep(lambda rate, shard: self._ping_shard(space, rate, shard))
+        self._display_ping_result(sorted(active_hosts, key=ip_to_int))
+
 
+    @staticmethod
+    def _ping_shard(space:Target_Space, rate:float, shard:tuple) -> list[str]:
+        with Ping_Sweep(space, rate, shard) as SWEEP:
+            return SWEEP._perform_ping_sweep()
 
-    def _create_packets(self) -> list[list[Packet]]:
-        packet_list = [self._get_ping_packet(str(ip)) for ip in self._get_ip_list()]
-        return self._calculate_max_packets(packet_list)
 
+    def _get_ping_targets(self) -> list[ipaddress.IPv4Network]:
+        if self._flags['target']: return parse_targets(self._flags['target'])
+        return [self._local_network()]
 
-    def _get_ip_list(self) -> list[ipaddress.IPv4Address]:
-        netmask = get_subnet_mask(str(conf.iface))
-        return get_ip_range(self._my_ip, netmask)
 
+    def _local_network(self, interface:str=None) -> ipaddress.IPv4Network:
+        return get_ip_range(current_transport()._ip_address(interface), current_transport()._subnet_mask(interface))
 
-    def _calculate_max_packets(self, packet_list:list[Packet]) -> list[list[Packet]]:
-        half_buffer_size = get_buffer_size() // 2
-        max_packets      = half_buffer_size // 84
-        packet_sublists  = list()
-        while packet_list:
-            packet_sublists.append(packet_list[:max_packets])
-            packet_list = packet_list[max_packets:]
-        return packet_sublists
 
+    def _display_ping_result(self, active_hosts:list) -> None:
+        with METRICS._phase('output'):
+            for ip in active_hosts:
+                if self._write_host(ip, None): continue
+                print(f'{green("Active host")}: {ip}')
 
-    @staticmethod
-    def _display_ping_result(active_hosts:list) -> None:
-        print('\n')
-        for ip in active_hosts:
-            print(f'{green("Active host")}: {ip}')
\ No newline at end of file
+
+    # WORKERS ------------------------------------------------------------------------
+
+    # sweep(rate, shard) runs one shard of the sweep. A given rate is shared by the workers
+    def _sweep(self, sweep) -> list:
+        if self._agent:               return self._agent._run_sweep(lambda unit, units: sweep(self._flags['rate'], (unit, units)))
+        if self._flags['coordinate']: return self._sweep_with_agents()
+        workers = self._flags['workers']
+        if not workers: return sweep(self._flags['rate'], (0, 1))
+        from workers import Worker_Pool
+        rate = self._flags['rate'] and self._flags['rate'] / workers
+        with Worker_Pool(workers) as POOL:
+            return POOL._gather(lambda worker: sweep(rate, (worker, workers)))
+
+
+    # AGENTS -------------------------------------------------------------------------
+
+    def _sweep_with_agents(self) -> list[str]:
+        from coordinator import Scan_Coordinator
+        notify = lambda message: print(message, file=sys.stderr if self._sink and self._sink._path is None else sys.stdout)
+        with Scan_Coordinator(self._flags['coordinate'], self._flags['key'], self._agent_job(), notify) as COORDINATOR:
+            notify(f'Waiting for agents on {self._flags["coordinate"]} (key {COORDINATOR._key})')
+            return COORDINATOR._gather()
+
+
+    # The agents sweep the targets of the coordinator, the local network included, at the given rate each
+    def _agent_job(self) -> dict:
+        local = ('output', 'write', 'history', 'diff', 'workers', 'coordinate', 'key', 'stats', 'metrics')
+        return {
+            'command': 'netmap',
+            'flags':   {**self._flags, **dict.fromkeys(local), 'target': ','.join(map(str, self._get_ping_targets()))},
+        }
+
+
+    # Returns True when the record replaces the colored output on stdout
+    def _write_host(self, ip:str, mac:str|None) -> bool:
+        METRICS._results += 1
+        if self._history:      self._history._record_host(ip_to_int(ip), mac)
+        if self._sink is None: return False
+        self._sink._write('host', {'host': ip, 'mac': mac})
+        return self._sink._path is None
+
+
+
+    # HISTORY ------------------------------------------------------------------------
+
+    # ARP and ping sweeps are kept apart, ping replies carry no MAC address to compare
+    def _open_history(self) -> Scan_History|None:
+        path = self._flags['history'] or (DEFAULT_PATH if self._flags['diff'] else None)
+        if path is None: return None
+        target = self._flags['target'] if self._flags['ping'] and self._flags['target'] else str(self._local_network())
+        return Scan_History(path, 'netmap-ping' if self._flags['ping'] else 'netmap-arp', target)
+
+
+    def _report_changes(self) -> None:
+        joined, left, changed = self._history._host_changes()
+        self._history._finish()
+        if not self._flags['diff'] or self._history._previous_scan is None: return
+        if self._sink and self._sink._path is None: return
+        since = time.strftime('%Y-%m-%d %H:%M', time.localtime(self._history._previous_scan[1]))
+        print(f'Changes since the sweep of {since}:' if joined or left or changed else f'No changes since the sweep of {since}')
+        for host in joined:  print(f'{green("New host")}: {int_to_ip(host)}')
+        for host in left:    print(f'{red("Host gone")}: {int_to_ip(host)}')
+        for host in changed: print(f'{yellow("MAC changed")}: {int_to_ip(host)} now {self._history._current_hosts[host]}')
@@ -0,0 +1,101 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import ipaddress, socket, threading, time
+from packets      import Arp_Template, Packet_Arena
+from pkt_sending  import Frame_Transmitter
+from rate_control import Rate_Limiter
+from receivers    import Arp_Receiver
+from targets      import host_bounds, int_to_ip
+from transport    import current_transport
+from timing       import Timing
+from telemetry    import METRICS
+
+
+class Arp_Sweep:
+
+    RATE    = 5000
+    RETRIES = 1
+    POLL    = 0.05
+
+    # A shard (worker, workers) requests every workers-th address of the network, starting from the worker-th
+    def __init__(self, interface:str, network:ipaddress.IPv4Network, rate:float=None, shard:tuple[int, int]=(0, 1)) -> None:
+        self._interface:str = interface
+        self._shard:tuple   = shard
+        self._my_ip:str     = current_transport()._ip_address(interface)
+        self._my_mac:bytes  = bytes.fromhex(current_transport()._mac_address(interface).replace(':', ''))
+        self._first, self._count = host_bounds(network)
+        self._replies:dict  = dict()
+        self._sent_at:dict  = dict()    # Send time of the first request of every address
+        self._resent:set    = set()     # Addresses requested again, their replies may answer either request
+        self._stop          = threading.Event()
+        self._rate_limiter  = Rate_Limiter(rate or self.RATE)
+        self._timing        = Timing(retries=self.RETRIES)
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        return False
+
+
+    def _perform_arp_sweep(self) -> list[tuple[str, str]]:
+        receiver = Arp_Receiver(self._interface, self._first, self._count, self._replies, self._stop, self._observe)
+        receiver._start()
+        with Frame_Transmitter(self._interface, rate_limiter=self._rate_limiter) as transmitter:
+            for attempt in range(self._timing._retries + 1):
+                if not (sent := self._send_requests(transmitter, attempt)): break
+                if attempt: METRICS._retransmits += sent
+                self._wait_for_replies(self._timing._timeout(attempt=attempt))
+        self._stop.set()
+        receiver._join()
+        return [(int_to_ip(address), mac.hex(':')) for address, mac in sorted(self._replies.items()) if self._in_shard(address)]
+
+
+    # Every receiver sees all the replies on the link, each worker only returns the ones of its own shard
+    def _in_shard(self, address:int) -> bool:
+        return (address - self._first) % self._shard[1] == self._shard[0]
+
+
+    def _pending_addresses(self):
+        my_ip = int.from_bytes(socket.inet_aton(self._my_ip), 'big')
+        for address in range(self._first + self._shard[0], self._first + self._count, self._shard[1]):
+            if address != my_ip and address not in self._replies: yield address
+
+
+    def _send_requests(self, transmitter:Frame_Transmitter, attempt:int) -> int:
+        template = Arp_Template(self._my_mac, self._my_ip)
+        arena    = Packet_Arena(Frame_Transmitter.BATCH_SIZE, Arp_Template.SIZE)
+        batch    = list()
+        sent     = 0
+        with METRICS._phase('build'):
+            for address in self._pending_addresses():
+                batch.append((template._render(arena._slot(len(batch)), address), None))
+                if attempt: self._resent.add(address)
+                else:       self._sent_at[address] = time.monotonic()
+                if len(batch) == len(arena):
+                    transmitter._send_batch(batch)
+                    sent, batch = sent + len(batch), list()
+            transmitter._send_batch(batch)
+        return sent + len(batch)
+
+
+
+    # Called from the receiver thread, ARP replies carry nothing to time them by so the send times are kept.
+    # Replies of re-requested addresses are not timed
+    def _observe(self, address:int) -> None:
+        METRICS._replies += 1
+        if address in self._resent or address not in self._sent_at: return
+        self._timing._observe(address, time.monotonic() - self._sent_at[address])
+
+
+    def _wait_for_replies(self, timeout:float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and len(self._replies) < self._count - 1:
+            with METRICS._phase('wait'):
+                time.sleep(self.POLL)
@@ -0,0 +1,89 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import itertools, threading, random, time
+from packets      import Icmp_Template, Packet_Arena
+from pkt_sending  import Icmp_Transmitter
+from rate_control import Rate_Limiter
+from receivers    import Icmp_Receiver
+from targets      import Target_Space, int_to_ip
+from timing       import Timing
+from telemetry    import METRICS
+
+
+class Ping_Sweep:
+
+    RATE = 1000
+    POLL = 0.05
+
+    # A shard (worker, workers) pings every workers-th host of the space, starting from the worker-th
+    def __init__(self, space:Target_Space, rate:float=None, shard:tuple[int, int]=(0, 1)) -> None:
+        self._space:Target_Space = space
+        self._shard:tuple        = shard
+        self._host_count:int     = len(range(shard[0], space._host_count, shard[1]))
+        self._identifier:int     = random.getrandbits(16)
+        self._replies:dict       = dict()
+        self._stop               = threading.Event()
+        self._rate_limiter       = Rate_Limiter(rate or self.RATE)
+        self._timing             = Timing()
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        return False
+
+
+    def _perform_ping_sweep(self) -> list[str]:
+        with Icmp_Transmitter(rate_limiter=self._rate_limiter) as transmitter:
+            receiver = Icmp_Receiver(self._space, self._identifier, self._replies, self._stop, self._observe)
+            receiver._start()
+            for attempt in range(self._timing._retries + 1):
+                if not (sent := self._send_echo_requests(transmitter)): break
+                if attempt: METRICS._retransmits += sent
+                self._wait_for_replies(self._timing._timeout(attempt=attempt))
+            self._stop.set()
+            receiver._join()
+        return [int_to_ip(address) for address in sorted(self._replies)]
+
+
+    # Every round resends only to the hosts that have not answered yet
+    def _send_echo_requests(self, transmitter:Icmp_Transmitter) -> int:
+        template = Icmp_Template(self._identifier)
+        arena    = Packet_Arena(Icmp_Transmitter.BATCH_SIZE, template._size)
+        batch    = list()
+        sent     = 0
+        with METRICS._phase('build'):
+            for address in itertools.islice(self._space._hosts(), self._shard[0], None, self._shard[1]):
+                if address in self._replies: continue
+                batch.append((template._render(arena._slot(len(batch)), self._timestamp()), int_to_ip(address)))
+                if len(batch) == len(arena):
+                    transmitter._send_batch(batch)
+                    self._rate_limiter._observe(transmitter._sent, len(self._replies))
+                    sent, batch = sent + len(batch), list()
+            transmitter._send_batch(batch)
+        return sent + len(batch)
+
+
+    # Echo requests carry their send time in units of 100 microseconds as the sequence number
+    @staticmethod
+    def _timestamp() -> int:
+        return time.monotonic_ns() // 100000 & 0xffff
+
+
+    # Called from the receiver thread with the sequence number echoed by the host
+    def _observe(self, address:int, sequence:int) -> None:
+        METRICS._replies += 1
+        self._timing._observe(address, (self._timestamp() - sequence & 0xffff) / 1e4)
+
+
+    def _wait_for_replies(self, timeout:float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and len(self._replies) < self._host_count:
+            with METRICS._phase('wait'):
+                time.sleep(self.POLL)
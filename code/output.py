@@ -0,0 +1,168 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import abc, csv, json, os, socket, struct, sys
+from packets import tcp_flags_from_str, tcp_flags_to_str
+
+
+class Output_Sink(abc.ABC):
+
+    BUFFER = 1024 * 1024
+
+    def __init__(self, path:str|None) -> None:
+        self._path:str    = path
+        self._file        = self._open()
+        self._closed:bool = False    # Set once the reader of stdout went away
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._close()
+        return False
+
+
+    def _open(self):
+        if self._path: return open(self._path, 'w', buffering=self.BUFFER, newline='')
+        return sys.stdout
+
+
+    def _close(self) -> None:
+        try:   self._file.flush()
+        except BrokenPipeError: self._stop_writing()
+        if self._path: self._file.close()
+
+
+    # A reader that stops early, like head, ends the output but not the scan
+    def _write(self, kind:str, record:dict) -> None:
+        if self._closed: return
+        try:   self._write_record(kind, record)
+        except BrokenPipeError: self._stop_writing()
+
+
+    # Stdout is pointed at /dev/null, so the flush at exit does not raise again
+    def _stop_writing(self) -> None:
+        self._closed = True
+        devnull      = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, self._file.fileno())
+        os.close(devnull)
+
+
+    @abc.abstractmethod
+    def _write_record(self, kind:str, record:dict) -> None: ...
+
+
+
+class Jsonl_Sink(Output_Sink):
+
+    def _write_record(self, kind:str, record:dict) -> None:
+        self._file.write(json.dumps({'type': kind, **record}, separators=(',', ':')) + '\n')
+
+
+
+class Csv_Sink(Output_Sink):
+
+    def __init__(self, path:str|None) -> None:
+        super().__init__(path)
+        self._writer  = csv.writer(self._file)
+        self._columns = None
+
+
+    def _write_record(self, kind:str, record:dict) -> None:
+        if self._columns is None:
+            self._columns = list(record)
+            self._writer.writerow(self._columns)
+        self._writer.writerow(self._cell(record[column]) for column in self._columns)
+
+
+    @staticmethod
+    def _cell(value) -> str:
+        if value is None:           return ''
+        if isinstance(value, list): return '\n'.join(value)
+        return value
+
+
+
+# Every record is "!HB" (payload length, kind) followed by the kind specific payload:
+#   port   -> !4sHHBHf host, port, TCP flags (0 = no reply), TTL, window, RTT
+#   host   -> !4s6s    host, MAC (zeros when unknown)
+#   banner -> !H port, then host, protocol, error and the banner lines joined by newlines, each as !H + UTF-8
+class Binary_Sink(Output_Sink):
+
+    HEADER = struct.Struct('!HB')
+    KINDS  = {'port': 1, 'host': 2, 'banner': 3}
+    PORT   = struct.Struct('!4sHHBHf')
+    HOST   = struct.Struct('!4s6s')
+
+    def _open(self):
+        if self._path: return open(self._path, 'wb', buffering=self.BUFFER)
+        return sys.stdout.buffer
+
+
+    def _write_record(self, kind:str, record:dict) -> None:
+        payload = self._encode(kind, record)
+        self._file.write(self.HEADER.pack(len(payload), self.KINDS[kind]) + payload)
+
+
+    def _encode(self, kind:str, record:dict) -> bytes:
+        match kind:
+            case 'port':
+                return self.PORT.pack(socket.inet_aton(record['host']), record['port'], tcp_flags_from_str(record['flags']),
+                                      record['ttl'], record['window'], record['rtt'])
+            case 'host':
+                mac = bytes.fromhex(record['mac'].replace(':', '')) if record['mac'] else bytes(6)
+                return self.HOST.pack(socket.inet_aton(record['host']), mac)
+            case _:
+                texts = (record['host'], record['protocol'], record['error'] or '', '\n'.join(record['lines'] or []))
+                return struct.pack('!H', record['port']) + b''.join(pack_text(text) for text in texts)
+
+
+
+# FUNCTIONS ==================================================================================================
+
+def create_sink(output_format:str|None, path:str|None) -> Output_Sink|None:
+    match output_format:
+        case 'jsonl':  return Jsonl_Sink(path)
+        case 'csv':    return Csv_Sink(path)
+        case 'binary': return Binary_Sink(path)
+        case _:        return None
+
+
+
+def pack_text(text:str) -> bytes:
+    data = text.encode(errors='replace')[:65535]
+    return struct.pack('!H', len(data)) + data
+
+
+
+def read_binary_records(path:str):
+    kinds = {code: kind for kind, code in Binary_Sink.KINDS.items()}
+    with open(path, 'rb', buffering=Output_Sink.BUFFER) as file:
+        while header := file.read(Binary_Sink.HEADER.size):
+            length, kind = Binary_Sink.HEADER.unpack(header)
+            yield kinds[kind], decode_binary_record(kinds[kind], file.read(length))
+
+
+
+def decode_binary_record(kind:str, payload:bytes) -> dict:
+    match kind:
+        case 'port':
+            host, port, flags, ttl, window, rtt = Binary_Sink.PORT.unpack(payload)
+            return {'host': socket.inet_ntoa(host), 'port': port, 'flags': tcp_flags_to_str(flags) if flags else None,
+                    'ttl': ttl, 'window': window, 'rtt': rtt}
+        case 'host':
+            host, mac = Binary_Sink.HOST.unpack(payload)
+            return {'host': socket.inet_ntoa(host), 'mac': mac.hex(':') if any(mac) else None}
+        case _:
+            texts, offset = list(), 2
+            for _ in range(4):
+                length  = struct.unpack_from('!H', payload, offset)[0]
+                texts.append(payload[offset + 2:offset + 2 + length].decode(errors='replace'))
+                offset += 2 + length
+            host, protocol, error, lines = texts
+            return {'host': host, 'port': struct.unpack_from('!H', payload)[0], 'protocol': protocol,
+                    'lines': lines.split('\n') if lines else None, 'error': error or None}
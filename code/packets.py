@@ -4,27 +4,44 @@
 # Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
 
 
-import socket, struct, random
+import socket, struct, random, array, sys
 from display import RawPacket
 
 
+ETH_P_ARP     = 0x0806
+BROADCAST_MAC = b'\xff' * 6
+TCP_ACK       = 0x10
+TCP_SYN_ACK   = 0x12
+TCP_RST_ACK   = 0x14
+
+# UDP results share the flags column with TCP replies, above the nine TCP flag bits
+UDP_REPLY        = 0x8000
+ICMP_UNREACHABLE = 0x4000    # Plus the code of the destination unreachable message
+
+
 # PACKET BUILDERS --------------------------------------------------------------------------------------------
 
-def create_tcp_packet(dst_ip:str, port:int, src_ip:str) -> RawPacket:
+def create_tcp_packet(dst_ip:str, port:int, src_ip:str, src_port:int=None) -> RawPacket:
     ip_header  = IP(dst_ip, src_ip, socket.IPPROTO_TCP)
-    tcp_header = TCP(dst_ip, port, src_ip)
+    tcp_header = TCP(dst_ip, port, src_ip, src_port=src_port)
     return ip_header + tcp_header
 
 
 
+def create_arp_request(src_mac:bytes, src_ip:str, dst_ip:str) -> RawPacket:
+    return Ether(BROADCAST_MAC, src_mac, ETH_P_ARP) + ARP(src_mac, src_ip, dst_ip)
+
+
+
 # LAYERS -----------------------------------------------------------------------------------------------------
 
-def IP(dst_ip:str, src_ip:str, protocol) -> bytes:
+def IP(dst_ip:str, src_ip:str, protocol, ip_id:int=None) -> bytes:
+    ip_id = random.randint(10000, 65535) if ip_id is None else ip_id
     return struct.pack('!BBHHHBBH4s4s',
                        (4 << 4) + 5, #...................: IP version and IHL (Internet Header Length)
                        0, #..............................: TOS (Type of Service)
                        40, #.............................: Total length
-                       random.randint(10000, 65535), #...: IP ID
+                       ip_id, #..........................: IP ID
                        0, #..............................: Flags and Fragment offset
                        64, #.............................: TLL (Time to Live)
                        protocol, #.......................: Protocol
@@ -35,9 +52,9 @@ def IP(dst_ip:str, src_ip:str, protocol) -> bytes:
 
 
 
-def TCP(dst_ip:str, dst_port:int, src_ip:str, seq=0, ack_seq=0, syn_flag=True) -> bytes:
-    src_port   = random.randint(10000, 65535)
-    tcp_header = struct.pack('!HHLLBBHHH',
+def TCP(dst_ip:str, dst_port:int, src_ip:str, seq=0, ack_seq=0, syn_flag=True, src_port:int=None) -> bytes:
+    src_port   = src_port or random.randint(10000, 65535)
+    tcp_header = bytearray(struct.pack('!HHLLBBHHH',
                              src_port, #.............: Source port
                              dst_port, #.............: Destiny port
                              seq, #..................: Sequence
@@ -47,12 +64,43 @@ def TCP(dst_ip:str, dst_port:int, src_ip:str, seq=0, ack_seq=0, syn_flag=True) -
                              socket.htons(5840), #...: Window size
                              0, #....................: Checksum (will be calculated)
                              0 #.....................: Urgent pointer
-                             )
-    pseudo_hdr   = pseudo_header(src_ip, dst_ip, len(tcp_header))
-    tcp_checksum = checksum(pseudo_hdr + tcp_header)
+                             ))
+    pseudo_hdr = pseudo_header(src_ip, dst_ip, len(tcp_header))
+    struct.pack_into('!H', tcp_header, 16, checksum(pseudo_hdr + tcp_header))
+    return bytes(tcp_header)
+
+
+
+def Ether(dst_mac:bytes, src_mac:bytes, ether_type:int) -> bytes:
+    return struct.pack('!6s6sH', dst_mac, src_mac, ether_type)
+
+
+
+def ARP(src_mac:bytes, src_ip:str, dst_ip:str, operation:int=1) -> bytes:
+    return struct.pack('!HHBBH6s4s6s4s',
+                       1, #..........................: Hardware type (Ethernet)
+                       0x0800, #.....................: Protocol type (IPv4)
+                       6, #..........................: Hardware address length
+                       4, #..........................: Protocol address length
+                       operation, #..................: Operation (1 = request, 2 = reply)
+                       src_mac, #....................: Sender MAC
+                       socket.inet_aton(src_ip), #...: Sender IP
+                       b'\x00' * 6, #................: Target MAC
+                       socket.inet_aton(dst_ip) #....: Target IP
+                       )
+
 
-    return struct.pack('!HHLLBBHHH', src_port, dst_port, seq, ack_seq, (5 << 4),
-                       (syn_flag << 1), socket.htons(5840), tcp_checksum, 0)
+
+def ICMP_Echo(identifier:int, sequence:int, payload:bytes=b'') -> bytes:
+    header = bytearray(struct.pack('!BBHHH',
+                       8, #.............: Type (Echo request)
+                       0, #.............: Code
+                       0, #.............: Checksum (will be calculated)
+                       identifier, #....: Identifier
+                       sequence #.......: Sequence number
+                       ) + payload)
+    struct.pack_into('!H', header, 2, checksum(header))
+    return bytes(header)
 
 
 
@@ -67,11 +115,229 @@ def pseudo_header(dst_ip:str, src_ip:str, tcp_length:int) -> bytes:
 
 
 
-def checksum(msg):
-    s = 0
-    for i in range(0, len(msg), 2):
-        w = (msg[i] << 8) + (msg[i+1] if i+1 < len(msg) else 0)
-        s += w
-    s = (s >> 16) + (s & 0xffff)
-    s += (s >> 16)
-    return ~s & 0xffff
\ No newline at end of file
+def checksum(msg) -> int:
+    return fold_checksum(sum_words(msg))
+
+
+
+def sum_words(msg) -> int:
+    if len(msg) % 2: msg = bytes(msg) + b'\x00'
+    words = array.array('H')
+    words.frombytes(msg)
+    if sys.byteorder == 'little': words.byteswap()
+    return sum(words)
+
+
+
+def fold_checksum(total:int) -> int:
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+
+def update_checksum(old_checksum:int, old_word:int, new_word:int) -> int:
+    # RFC 1624, eqn. 3: HC' = ~(~HC + ~m + m')
+    total = (~old_checksum & 0xffff) + (~old_word & 0xffff) + new_word
+    return fold_checksum(total)
+
+
+
+# TEMPLATES --------------------------------------------------------------------------------------------------
+
+class Tcp_Template:
+
+    SIZE = 40
+
+    def __init__(self, dst_ip:str, src_ip:str, src_port:int, syn_flag=True) -> None:
+        self._header:bytearray = bytearray(IP(dst_ip, src_ip, socket.IPPROTO_TCP, ip_id=0) +
+                                           TCP(dst_ip, 0, src_ip, syn_flag=syn_flag, src_port=src_port))
+        self._dst_ip:int       = int.from_bytes(socket.inet_aton(dst_ip), 'big')
+        self._src_port:int     = src_port
+        self._pseudo_sum:int   = sum_words(pseudo_header(src_ip, dst_ip, self.SIZE - 20))
+        struct.pack_into('!H', self._header, 10, checksum(self._header[:20]))
+        self._ip_checksum:int  = struct.unpack_from('!H', self._header, 10)[0]
+        self._tcp_checksum:int = struct.unpack_from('!H', self._header, 36)[0]
+
+
+    def _render(self, slot:memoryview, dst_port:int, ip_id:int=0, src_port:int=None, dst_ip:int=None, seq:int=0) -> memoryview:
+        slot[:] = self._header
+        ip_checksum  = update_checksum(self._ip_checksum, 0, ip_id)
+        tcp_checksum = update_checksum(self._tcp_checksum, 0, dst_port)
+        if seq:
+            tcp_checksum = update_checksum(update_checksum(tcp_checksum, 0, seq >> 16), 0, seq & 0xffff)
+            struct.pack_into('!I', slot, 24, seq)
+        if src_port is not None:
+            tcp_checksum = update_checksum(tcp_checksum, self._src_port, src_port)
+            struct.pack_into('!H', slot, 20, src_port)
+        if dst_ip is not None and dst_ip != self._dst_ip:
+            for old_word, new_word in ((self._dst_ip >> 16, dst_ip >> 16), (self._dst_ip & 0xffff, dst_ip & 0xffff)):
+                ip_checksum  = update_checksum(ip_checksum, old_word, new_word)
+                tcp_checksum = update_checksum(tcp_checksum, old_word, new_word)
+            struct.pack_into('!I', slot, 16, dst_ip)
+        struct.pack_into('!H', slot, 4, ip_id)
+        struct.pack_into('!H', slot, 10, ip_checksum)
+        struct.pack_into('!H', slot, 22, dst_port)
+        struct.pack_into('!H', slot, 36, tcp_checksum)
+        return slot
+
+
+
+# The payload depends on the port, so the checksums are summed for every packet from cached partial sums
+class Udp_Template:
+
+    HEADER = 28
+
+    def __init__(self, src_ip:str, src_port:int) -> None:
+        self._header:bytearray  = bytearray(IP('0.0.0.0', src_ip, socket.IPPROTO_UDP, ip_id=0))
+        self._header[2:4]       = b'\x00\x00'    # Total length, added per packet like the ID and the destination
+        self._src_port:int      = src_port
+        self._ip_sum:int        = sum_words(self._header)
+        self._udp_sum:int       = sum_words(socket.inet_aton(src_ip)) + socket.IPPROTO_UDP + src_port
+        self._payload_sums:dict = dict()
+
+
+    def _render(self, slot:memoryview, dst_ip:int, dst_port:int, payload:bytes, ip_id:int=0) -> memoryview:
+        size    = self.HEADER + len(payload)
+        length  = size - 20
+        dst_sum = (dst_ip >> 16) + (dst_ip & 0xffff)
+        packet  = slot[:size]
+        packet[:20] = self._header
+        packet[28:] = payload
+        struct.pack_into('!HH', packet, 2, size, ip_id)
+        struct.pack_into('!H', packet, 10, fold_checksum(self._ip_sum + size + ip_id + dst_sum))
+        struct.pack_into('!I', packet, 16, dst_ip)
+        udp_checksum = fold_checksum(self._udp_sum + dst_sum + dst_port + 2 * length + self._payload_sum(payload))
+        struct.pack_into('!HHHH', packet, 20, self._src_port, dst_port, length, udp_checksum or 0xffff)
+        return packet
+
+
+    def _payload_sum(self, payload:bytes) -> int:
+        total = self._payload_sums.get(payload)
+        if total is None: total = self._payload_sums[payload] = sum_words(payload)
+        return total
+
+
+
+class Arp_Template:
+
+    SIZE = 42
+
+    def __init__(self, src_mac:bytes, src_ip:str) -> None:
+        self._header:bytes = create_arp_request(src_mac, src_ip, '0.0.0.0')
+
+
+    def _render(self, slot:memoryview, dst_ip:int) -> memoryview:
+        slot[:] = self._header
+        struct.pack_into('!I', slot, 38, dst_ip)
+        return slot
+
+
+
+class Icmp_Template:
+
+    def __init__(self, identifier:int, payload:bytes=b'') -> None:
+        self._header:bytes = ICMP_Echo(identifier, 0, payload)
+        self._checksum:int = struct.unpack_from('!H', self._header, 2)[0]
+        self._size:int     = len(self._header)
+
+
+    def _render(self, slot:memoryview, sequence:int) -> memoryview:
+        slot[:] = self._header
+        struct.pack_into('!H', slot, 2, update_checksum(self._checksum, 0, sequence))
+        struct.pack_into('!H', slot, 6, sequence)
+        return slot
+
+
+
+class Packet_Arena:
+
+    def __init__(self, count:int, packet_size:int=Tcp_Template.SIZE) -> None:
+        self._packet_size:int  = packet_size
+        self._buffer:bytearray = bytearray(count * packet_size)
+        self._view:memoryview  = memoryview(self._buffer)
+        self._slots:list       = [self._view[i * packet_size:(i + 1) * packet_size] for i in range(count)]
+
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+    def _slot(self, index:int) -> memoryview:
+        return self._slots[index]
+
+
+    def _recompute_tcp_checksums(self, pseudo_sum:int, count:int=None) -> None:
+        count = len(self._slots) if count is None else count
+        size  = self._packet_size
+        for index in range(count):
+            struct.pack_into('!H', self._buffer, index * size + 10, 0)
+            struct.pack_into('!H', self._buffer, index * size + 36, 0)
+        words = array.array('H')
+        words.frombytes(self._view[:count * size])
+        if sys.byteorder == 'little': words.byteswap()
+        half  = size // 2
+        for index in range(count):
+            base = index * half
+            struct.pack_into('!H', self._buffer, index * size + 10, fold_checksum(sum(words[base:base + 10])))
+            struct.pack_into('!H', self._buffer, index * size + 36, fold_checksum(pseudo_sum + sum(words[base + 10:base + half])))
+
+
+
+# PARSERS ----------------------------------------------------------------------------------------------------
+
+def parse_tcp_reply(data:bytes) -> tuple[bytes, int, int, int, int, int, int]|None:
+    ihl = (data[0] & 0x0F) * 4
+    if len(data) < ihl + 16 or data[9] != socket.IPPROTO_TCP: return None
+    src_port, dst_port, _, ack, _, flags, window = struct.unpack_from('!HHIIBBH', data, ihl)
+    return data[12:16], src_port, dst_port, flags, ack, data[8], window
+
+
+
+def parse_icmp_reply(data:bytes) -> tuple[bytes, int, int, int, int]|None:
+    ihl = (data[0] & 0x0F) * 4
+    if len(data) < ihl + 8 or data[9] != socket.IPPROTO_ICMP: return None
+    icmp_type, code, _, identifier, sequence = struct.unpack_from('!BBHHH', data, ihl)
+    return data[12:16], icmp_type, code, identifier, sequence
+
+
+
+def parse_udp_reply(data:bytes) -> tuple[bytes, int, int, int]|None:
+    ihl = (data[0] & 0x0F) * 4
+    if len(data) < ihl + 8 or data[9] != socket.IPPROTO_UDP: return None
+    src_port, dst_port = struct.unpack_from('!HH', data, ihl)
+    return data[12:16], src_port, dst_port, data[8]
+
+
+
+# Destination unreachable messages quote the IP header and the first 8 bytes of the UDP datagram that caused them
+def parse_udp_unreachable(data:bytes) -> tuple[bytes, int, int, int, int]|None:
+    ihl = (data[0] & 0x0F) * 4
+    if len(data) < ihl + 28 or data[9] != socket.IPPROTO_ICMP or data[ihl] != 3: return None
+    quoted = ihl + 8
+    start  = quoted + (data[quoted] & 0x0F) * 4
+    if len(data) < start + 4 or data[quoted + 9] != socket.IPPROTO_UDP: return None
+    src_port, dst_port = struct.unpack_from('!HH', data, start)
+    return data[quoted + 16:quoted + 20], src_port, dst_port, data[ihl + 1], data[8]
+
+
+
+def parse_arp_reply(frame:bytes) -> tuple[bytes, bytes]|None:
+    if len(frame) < 42 or struct.unpack_from('!HH', frame, 12) != (ETH_P_ARP, 1) or frame[21] != 2: return None
+    return frame[28:32], frame[22:28]
+
+
+
+# UDP results are written "UDP" for a reply and "ICMP<code>" for a destination unreachable message
+def tcp_flags_to_str(flags:int) -> str:
+    if flags & UDP_REPLY:        return 'UDP'
+    if flags & ICMP_UNREACHABLE: return f'ICMP{flags & 0xff}'
+    return ''.join(letter for bit, letter in enumerate('FSRPAUECN') if flags >> bit & 1)
+
+
+
+def tcp_flags_from_str(flags:str|None) -> int:
+    if not flags:                return 0
+    if flags == 'UDP':           return UDP_REPLY
+    if flags.startswith('ICMP'): return ICMP_UNREACHABLE | int(flags[4:])
+    return sum(1 << 'FSRPAUECN'.index(letter) for letter in flags)
@@ -4,11 +4,233 @@
 # Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
 
 
-import socket
-from display import RawPacket
+import socket, ctypes, ctypes.util, errno, time
+from rate_control import Rate_Limiter
+from telemetry    import METRICS
+from transport    import current_transport
+from display      import RawPacket
 
 
+SO_SNDBUFFORCE = getattr(socket, 'SO_SNDBUFFORCE', 32)
+
+
+
+class Raw_Transmitter:
+
+    BATCH_SIZE    = 256
+    SEND_BUFFER   = 4 * 1024 * 1024
+    ADDRESS_CACHE = 4096
+
+    def __init__(self, buffer_size:int=SEND_BUFFER, rate_limiter:Rate_Limiter=None) -> None:
+        self._sock         = self._create_socket()
+        self._fd:int       = self._sock.fileno()
+        self._addresses    = dict()
+        self._sendmmsg     = load_sendmmsg() if self._fd >= 0 else None    # Virtual sockets have no descriptor
+        self._sent:int     = 0
+        self._rate_limiter = rate_limiter
+        self._tune_send_buffer(buffer_size)
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._close()
+        return False
+
+
+    def _create_socket(self) -> socket.socket:
+        sock = current_transport()._socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_HDRINCL, 1)
+        return sock
+
+
+    def _tune_send_buffer(self, size:int) -> None:
+        try:   self._sock.setsockopt(socket.SOL_SOCKET, SO_SNDBUFFORCE, size)
+        except PermissionError: self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, size)
+
+
+    def _close(self) -> None:
+        self._sock.close()
+
+
+    # SINGLE PACKET ------------------------------------------------------------------------------------------
+
+    def _send(self, packet:RawPacket, target_ip:str) -> None:
+        with METRICS._phase('send'):
+            if self._rate_limiter: self._rate_limiter._acquire()
+            self._send_unpaced(packet, target_ip)
+
+
+    def _send_unpaced(self, packet:RawPacket, target_ip:str) -> None:
+        while True:
+            try:
+                self._write(packet, target_ip)
+                self._sent   += 1
+                METRICS._sent += 1
+                return
+            except OSError as error:
+                if error.errno != errno.ENOBUFS: raise
+                self._handle_congestion()
+
+
+    def _write(self, packet:RawPacket, target_ip:str) -> None:
+        self._sock.sendto(packet, (target_ip, 0))
+
+
+    def _handle_congestion(self) -> None:
+        METRICS._congestion += 1
+        if self._rate_limiter: self._rate_limiter._report_congestion()
+        time.sleep(0.001)
+
+
+    # BATCHES ------------------------------------------------------------------------------------------------
+
+    def _send_batch(self, batch:list[tuple[RawPacket, str]]) -> None:
+        start = 0
+        with METRICS._phase('send'):
+            while start < len(batch):
+                chunk  = batch[start:start + self._chunk_size()]
+                start += len(chunk)
+                if self._rate_limiter: self._rate_limiter._acquire(len(chunk))
+                if self._sendmmsg: self._send_chunk_with_sendmmsg(chunk)
+                else:              self._send_chunk_with_sendto(chunk)
+
+
+    def _chunk_size(self) -> int:
+        if self._rate_limiter: return min(self.BATCH_SIZE, self._rate_limiter._burst_size())
+        return self.BATCH_SIZE
+
+
+    def _send_chunk_with_sendto(self, chunk:list[tuple[RawPacket, str]]) -> None:
+        for packet, target_ip in chunk:
+            self._send_unpaced(packet, target_ip)
+
+
+    def _send_chunk_with_sendmmsg(self, chunk:list[tuple[RawPacket, str]]) -> None:
+        count    = len(chunk)
+        messages = (Mmsghdr * count)()
+        vectors  = (Iovec * count)()
+        buffers  = list()
+        for index, (packet, target_ip) in enumerate(chunk):
+            buffer = packet_buffer(packet)
+            buffers.append(buffer)
+            vectors[index].iov_base  = ctypes.cast(buffer, ctypes.c_void_p)
+            vectors[index].iov_len   = len(packet)
+            header                   = messages[index].msg_hdr
+            header.msg_iov           = ctypes.pointer(vectors[index])
+            header.msg_iovlen        = 1
+            self._set_message_address(header, target_ip)
+        self._submit_messages(messages, count)
+
+
+    def _set_message_address(self, header:'Msghdr', target_ip:str) -> None:
+        address            = self._get_address(target_ip)
+        header.msg_name    = ctypes.cast(ctypes.pointer(address), ctypes.c_void_p)
+        header.msg_namelen = ctypes.sizeof(address)
+
+
+    def _submit_messages(self, messages:ctypes.Array, count:int) -> None:
+        offset = 0
+        while offset < count:
+            pointer = ctypes.byref(messages, offset * ctypes.sizeof(Mmsghdr))
+            sent    = self._sendmmsg(self._fd, pointer, count - offset, 0)
+            if sent < 0:
+                code = ctypes.get_errno()
+                if code not in (errno.ENOBUFS, errno.EAGAIN): raise OSError(code, errno.errorcode.get(code, 'sendmmsg failed'))
+                self._handle_congestion()
+                continue
+            offset        += sent
+            self._sent    += sent
+            METRICS._sent += sent
+
+
+    def _get_address(self, target_ip:str) -> 'Sockaddr_In':
+        address = self._addresses.get(target_ip)
+        if address is None:
+            if len(self._addresses) >= self.ADDRESS_CACHE: self._addresses.clear()
+            address = Sockaddr_In(socket.AF_INET, 0, (ctypes.c_ubyte * 4)(*socket.inet_aton(target_ip)))
+            self._addresses[target_ip] = address
+        return address
+
+
+
+class Icmp_Transmitter(Raw_Transmitter):
+
+    def _create_socket(self) -> socket.socket:
+        return current_transport()._socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+
+
+
+class Frame_Transmitter(Raw_Transmitter):
+
+    def __init__(self, interface:str, buffer_size:int=Raw_Transmitter.SEND_BUFFER, rate_limiter:Rate_Limiter=None) -> None:
+        self._interface:str = interface
+        super().__init__(buffer_size, rate_limiter)
+
+
+    def _create_socket(self) -> socket.socket:
+        sock = current_transport()._socket(socket.AF_PACKET, socket.SOCK_RAW)
+        sock.bind((self._interface, 0))
+        return sock
+
+
+    def _write(self, frame:RawPacket, _) -> None:
+        self._sock.send(frame)
+
+
+    def _set_message_address(self, header:'Msghdr', _) -> None:
+        pass
+
+
+
+# SENDMMSG STRUCTURES ========================================================================================
+
+class Iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class Sockaddr_In(ctypes.Structure):
+    _fields_ = [('sin_family', ctypes.c_ushort), ('sin_port', ctypes.c_uint16),
+                ('sin_addr', ctypes.c_ubyte * 4), ('sin_zero', ctypes.c_ubyte * 8)]
+
+
+class Msghdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(Iovec)), ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class Mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', Msghdr), ('msg_len', ctypes.c_uint)]
+
+
+
+# FUNCTIONS ==================================================================================================
+
+def load_sendmmsg():
+    try:
+        libc     = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype  = ctypes.c_int
+    return sendmmsg
+
+
+
+def packet_buffer(packet:RawPacket|bytearray|memoryview) -> ctypes.Array|ctypes.c_char_p:
+    if isinstance(packet, bytes): return ctypes.c_char_p(packet)
+    return (ctypes.c_char * len(packet)).from_buffer(packet)
+
+
+
+_shared_transmitter:Raw_Transmitter = None
+
 def send_layer_3_packet(packet:RawPacket, target_ip:str, port:int) -> None:
-    sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW)
-    sock.setsockopt(socket.IPPROTO_IP, socket.IP_HDRINCL, 1)
-    sock.sendto(packet, (target_ip, port))
\ No newline at end of file
+    global _shared_transmitter
+    if _shared_transmitter is None:
+        _shared_transmitter = Raw_Transmitter()
+    _shared_transmitter._send(packet, target_ip)
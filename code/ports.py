@@ -0,0 +1,240 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import bisect, mmap, re
+
+
+SERVICE_FILES   = ('/usr/share/nmap/nmap-services', '/usr/local/share/nmap/nmap-services', '/etc/services')
+SERVICE_PATTERN = re.compile(rb'^([^\s#]+)[ \t]+(\d+)/tcp\b[^\n#]*(?:#[ \t]*([^\n]*))?', re.MULTILINE)
+UNKNOWN_SERVICE = 'Ephemeral Port / Dynamic Port'
+
+
+class Port_Set:
+
+    def __init__(self, ranges:list[tuple[int, int]]) -> None:
+        self._starts:list  = list()
+        self._ends:list    = list()
+        self._offsets:list = list()
+        self._size:int     = 0
+        self._add_ranges(ranges)
+
+
+    def _add_ranges(self, ranges:list[tuple[int, int]]) -> None:
+        for start, end in sorted(ranges):
+            if not 0 <= start <= end <= 65535: raise ValueError(f'Invalid port range: {start}-{end}')
+            if self._ends and start <= self._ends[-1] + 1:
+                self._size        += max(0, end - self._ends[-1])
+                self._ends[-1]     = max(self._ends[-1], end)
+                continue
+            self._starts.append(start)
+            self._ends.append(end)
+            self._offsets.append(self._size)
+            self._size += end - start + 1
+
+
+    def __len__(self) -> int:
+        return self._size
+
+
+    def __iter__(self):
+        for start, end in zip(self._starts, self._ends):
+            yield from range(start, end + 1)
+
+
+    def __contains__(self, port:int) -> bool:
+        index = bisect.bisect_right(self._starts, port) - 1
+        return index >= 0 and port <= self._ends[index]
+
+
+    def __getitem__(self, index:int) -> int:
+        if not 0 <= index < self._size: raise IndexError('Port index out of range')
+        run = bisect.bisect_right(self._offsets, index) - 1
+        return self._starts[run] + index - self._offsets[run]
+
+
+    def _index(self, port:int) -> int|None:
+        run = bisect.bisect_right(self._starts, port) - 1
+        if run < 0 or port > self._ends[run]: return None
+        return self._offsets[run] + port - self._starts[run]
+
+
+    def _ranges(self) -> list[tuple[int, int]]:
+        return list(zip(self._starts, self._ends))
+
+
+
+class Service_Database:
+
+    _services:dict = None
+
+    @classmethod
+    def _describe(cls, port:int) -> str:
+        if port in COMMON_PORTS:   return COMMON_PORTS[port]
+        if port in UNCOMMON_PORTS: return UNCOMMON_PORTS[port]
+        if cls._services is None:  cls._services = cls._load()
+        return cls._services.get(port, UNKNOWN_SERVICE)
+
+
+    # The file is mapped and indexed in a single pass the first time a port without a built-in entry is shown
+    @staticmethod
+    def _load() -> dict:
+        for path in SERVICE_FILES:
+            try:
+                with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return Service_Database._index(data)
+            except (OSError, ValueError):
+                continue
+        return dict()
+
+
+    @staticmethod
+    def _index(data:mmap.mmap) -> dict:
+        services = dict()
+        for match in SERVICE_PATTERN.finditer(data):
+            port = int(match.group(2))
+            if port in services: continue
+            name, comment = match.group(1).decode(errors='ignore'), match.group(3)
+            services[port] = f'{name} - {comment.decode(errors="ignore").strip()}' if comment else name
+        return services
+
+
+
+# FUNCTIONS ==================================================================================================
+
+def get_ports(port_type:str='all') -> Port_Set:
+    match port_type:
+        case 'common':   return Port_Set([(port, port) for port in COMMON_PORTS])
+        case 'uncommon': return Port_Set([(port, port) for port in UNCOMMON_PORTS])
+        case 'udp':      return Port_Set([(port, port) for port in UDP_PAYLOADS])
+        case 'all':      return Port_Set([(port, port) for port in {**COMMON_PORTS, **UNCOMMON_PORTS}])
+        case _:          return parse_ports(port_type)
+
+
+
+def parse_ports(spec:str) -> Port_Set:
+    ranges = list()
+    for part in spec.split(','):
+        if '-' in part:
+            start, end = map(int, part.split('-'))
+            if start > end: raise ValueError(f'Invalid range: {start}-{end}')
+            ranges.append((start, end))
+        else:
+            ranges.append((int(part), int(part)))
+    return Port_Set(ranges)
+
+
+
+def describe_port(port:int) -> str:
+    return Service_Database._describe(port)
+
+
+
+# Ports without a known protocol get an empty datagram
+def udp_payload(port:int) -> bytes:
+    return UDP_PAYLOADS.get(port, b'')
+
+
+
+# PORT DESCRIPTIONS ==========================================================================================
+
+COMMON_PORTS = {
+    20   : 'FTP - File Transfer Protocol (Data Transfer)',
+    21   : 'FTP - File Transfer Protocol (Command)',
+    22   : 'SSH - Secure Shell',
+    23   : 'Telnet',
+    25   : 'SMTP - Simple Mail Transfer Protocol',
+    53   : 'DNS - Domain Name System',
+    67   : 'DHCP - Dynamic Host Configuration Protocol (Server)',
+    68   : 'DHCP - Dynamic Host Configuration Protocol (Client)',
+    80   : 'HTTP - HyperText Transfer Protocol',
+    110  : 'POP3 - Post Office Protocol version 3',
+    143  : 'IMAP - Internet Message Access Protocol',
+    161  : 'SNMP - Simple Network Management Protocol',
+    443  : 'HTTPS - HTTP Protocol over TLS/SSL',
+    445  : 'SMB - Server Message Block',
+    587  : 'SMTP - Submission',
+    993  : 'IMAPS - IMAP over SSL',
+    995  : 'POP3S - POP3 over SSL',
+    3306 : 'MySQL/MariaDB',
+    3389 : 'RDP - Remote Desktop Protocol',
+    5432 : 'PostgreSQL',
+    5900 : 'VNC - Virtual Network Computing',
+    8080 : 'HTTP Alternative - Jakarta Tomcat',
+    8443 : 'HTTPS Alternative - Tomcat SSL',
+    8888 : 'HTTP Alternative',
+    11211: 'Memcached',
+    27017: 'MongoDB'
+}
+
+
+
+UNCOMMON_PORTS = {
+    69   : 'TFTP - Trivial File Transfer Protocol',
+    179  : 'BGP - Border Gateway Protocol',
+    194  : 'IRC - Internet Relay Chat',
+    465  : 'SMTPS - SMTP Secure (SSL)',
+    514  : 'Syslog - System Logging Protocol',
+    531  : 'RPC - Remote Procedure Call',
+    543  : 'Klogin - Kerberos Login',
+    550  : 'Kshell - Kerberos Shell',
+    631  : 'IPP - Internet Printing Protocol',
+    636  : 'LDAPS - Lightweight Directory Access Protocol over SSL',
+    1080 : 'SOCKS Proxy',
+    1433 : 'Microsoft SQL Server',
+    1434 : 'Microsoft SQL Server Resolution',
+    1500 : 'Radmin - Remote Administrator',
+    1521 : 'Oracle DB - Oracle Database Listener',
+    1723 : 'PPTP - Point to Point Tunneling Protocol',
+    1883 : 'MQTT - Message Queuing Telemetry Transport',
+    2049 : 'NFS - Network File System',
+    2181 : 'Zookeeper',
+    3690 : 'SVN - Subversion',
+    3372 : 'NAT-T - Network Address Translation Traversal (IPsec)',
+    4500 : 'NAT-T - Network Address Translation Traversal (IPsec)',
+    5000 : 'UPnP - Universal Plug and Play',
+    5001 : 'Synology NAS',
+    5800 : 'VNC - Virtual Network Computing',
+    6379 : 'Redis',
+    7070 : 'RealServer',
+    7777 : 'IIS - Microsoft Internet Information Services',
+    7778 : 'IIS - Microsoft Internet Information Services',
+    8000 : 'HTTP Alternate',
+    10000: 'Webmin',
+    20000: 'Webmin',
+    50000: 'SAP',
+    52000: 'Apple Remote Desktop',
+    54321: 'Back Orifice',
+}
+
+
+
+# UDP PAYLOADS ===============================================================================================
+
+# Most UDP services stay silent unless the datagram is a valid request of their protocol
+UDP_PAYLOADS = {
+    53   : b'\x4e\x58\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x00\x00\x02\x00\x01',       # DNS: NS query for the root
+    69   : b'\x00\x01netxplorer\x00octet\x00',                                            # TFTP: read request
+    111  : b'\x4e\x58\x50\x4d\x00\x00\x00\x00\x00\x00\x00\x02\x00\x01\x86\xa0'            # RPC: portmapper NULL call
+           b'\x00\x00\x00\x02\x00\x00\x00\x00' + b'\x00' * 16,
+    123  : b'\x23' + b'\x00' * 47,                                                        # NTP: version 4 client request
+    137  : b'\x4e\x58\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x20'                        # NetBIOS: node status request
+           b'CKAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA\x00\x00\x21\x00\x01',
+    161  : b'\x30\x29\x02\x01\x00\x04\x06public\xa0\x1c\x02\x04\x4e\x58\x00\x01'          # SNMP: v1 get of sysDescr.0
+           b'\x02\x01\x00\x02\x01\x00\x30\x0e\x30\x0c\x06\x08\x2b\x06\x01\x02\x01\x01\x01\x00\x05\x00',
+    623  : b'\x06\x00\xff\x06\x00\x00\x11\xbe\x80\x00\x00\x00',                           # IPMI: RMCP presence ping
+    1434 : b'\x02',                                                                       # SQL Server Browser: instance list
+    1900 : b'M-SEARCH * HTTP/1.1\r\nHOST: 239.255.255.250:1900\r\n'                       # SSDP: discovery
+           b'MAN: "ssdp:discover"\r\nMX: 1\r\nST: ssdp:all\r\n\r\n',
+    3478 : b'\x00\x01\x00\x00\x21\x12\xa4\x42netxplorer\x00\x00',                         # STUN: binding request
+    5060 : b'OPTIONS sip:netxplorer SIP/2.0\r\n'                                          # SIP: OPTIONS request
+           b'Via: SIP/2.0/UDP netxplorer;branch=z9hG4bK-nx\r\nFrom: <sip:netxplorer@netxplorer>;tag=nx\r\n'
+           b'To: <sip:netxplorer@netxplorer>\r\nCall-ID: netxplorer\r\nCSeq: 1 OPTIONS\r\n'
+           b'Max-Forwards: 70\r\nContent-Length: 0\r\n\r\n',
+    5351 : b'\x00\x00',                                                                   # NAT-PMP: external address request
+    5353 : b'\x00\x00\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00\x09_services\x07_dns-sd'    # mDNS: service enumeration
+           b'\x04_udp\x05local\x00\x00\x0c\x00\x01',
+    11211: b'\x00\x01\x00\x00\x00\x01\x00\x00stats\r\n',                                  # Memcached: stats over the UDP frame
+}
@@ -4,23 +4,40 @@
 # Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
 
 
-import random, socket
-from scapy.layers.inet import TCP
-from scapy.all         import conf, Packet
+import math, random, sys, time
+from typing            import Iterable
 from arg_parser        import Argument_Manager as ArgParser
-from pscan_normal      import Normal_Scan
-from pscan_decoy       import Decoy
-from network           import get_ports
+from ports             import Port_Set, get_ports, describe_port
+from packets           import tcp_flags_from_str, TCP_SYN_ACK, UDP_REPLY
+from output            import Output_Sink, create_sink
+from targets           import Target_Space, Cyclic_Permutation, Sequential_Order, Listed_Order
+from targets           import parse_targets, parse_shard, int_to_ip, ip_to_int
+from checkpoint        import Scan_Progress, Checkpoint_Writer, load_checkpoint
+from history           import Scan_History, DEFAULT_PATH
+from telemetry         import METRICS, Stats_Reporter
+from transport         import select_transport
 from display           import *
 
 
 class Port_Scanner:
 
-    def __init__(self, parser_manager:ArgParser) -> None:
-        self._target_ip:str    = None
+    STATES    = {'SA': 'open', 'S': 'potentially-open', 'RA': 'closed', 'F': 'connection-closed', 'R': 'reset', None: 'filtered',
+                 'UDP': 'open', 'ICMP3': 'closed'}
+    RESUMABLE = ('show', 'port', 'all', 'random', 'stealth', 'fast', 'seed', 'shard', 'rate', 'connect', 'concurrency',
+                 'timeout', 'retries', 'udp')
+    TUNABLE   = ('rate', 'concurrency', 'timeout', 'retries')    # May be changed on the command line when resuming
+    SAMPLE    = 0.1                                              # Share of the other probes a differential run reprobes
+
+    # An agent runs the scan on the work units a coordinator hands it instead of on the whole probe space
+    def __init__(self, parser_manager:ArgParser, agent=None) -> None:
+        self._host:str         = None
+        self._targets:list     = None
         self._flags:dict       = None
-        self._ports:dict       = None
-        self._responses:Packet = None
+        self._ports:Port_Set   = None
+        self._sink:Output_Sink = None
+        self._resume:tuple     = None
+        self._history          = None
+        self._agent            = agent
         self._get_argument_and_flags(parser_manager)
 
 
@@ -33,72 +50,373 @@ class Port_Scanner:
 
     def _execute(self) -> None:
         try:
-            conf.verb = 0
-            self._get_result_by_transmission_method()
-            self._process_responses()
-        except KeyboardInterrupt:   print(f'\n{red("Process stopped")}')
+            self._load_targets()
+            select_transport(self._flags['simulate'])
+            self._sink    = create_sink(self._flags['output'], self._flags['write'])
+            self._history = self._open_history()
+            with Stats_Reporter('pscan', self._flags['stats'], self._flags['metrics']):
+                self._get_result_by_transmission_method()
+            if self._history: self._report_changes()
+        except KeyboardInterrupt:   print(f'\n{red("Process stopped")}{self._resume_hint()}')
         except ValueError as error: print(f'{yellow("Error")}: {error}')
         except Exception as error:  print(unexpected_error(error))
+        finally:
+            if self._sink:    self._sink._close()
+            if self._history: self._history._close()
 
 
     def _get_argument_and_flags(self, parser_manager:ArgParser) -> None:
-        self._target_ip  = socket.gethostbyname(parser_manager.host)
+        self._host  = parser_manager.host
         self._flags = {
-            'show':    parser_manager.show,
-            'port':    parser_manager.port,
-            'all':     parser_manager.all,
-            'random':  parser_manager.random,
-            'delay':   parser_manager.delay,
-            'stealth': parser_manager.stealth,
-            'decoy':   parser_manager.decoy,
+            'show':        parser_manager.show,
+            'port':        parser_manager.port,
+            'all':         parser_manager.all,
+            'random':      parser_manager.random,
+            'delay':       parser_manager.delay,
+            'stealth':     parser_manager.stealth,
+            'decoy':       parser_manager.decoy,
+            'fast':        parser_manager.fast,
+            'seed':        parser_manager.seed,
+            'shard':       parser_manager.shard,
+            'rate':        parser_manager.rate,
+            'connect':     parser_manager.connect,
+            'udp':         parser_manager.udp,
+            'concurrency': parser_manager.concurrency,
+            'timeout':     parser_manager.timeout,
+            'retries':     parser_manager.retries,
+            'output':      parser_manager.output,
+            'write':       parser_manager.write,
+            'checkpoint':  parser_manager.checkpoint,
+            'resume':      parser_manager.resume,
+            'history':     parser_manager.history,
+            'diff':        parser_manager.diff,
+            'sample':      parser_manager.sample,
+            'workers':     parser_manager.workers,
+            'coordinate':  parser_manager.coordinate,
+            'key':         parser_manager.key,
+            'stats':       parser_manager.stats,
+            'metrics':     parser_manager.metrics,
+            'simulate':    parser_manager.simulate,
         }
 
 
-    def _get_result_by_transmission_method(self) -> list:
-        if self._flags['decoy']: self._perform_decoy_scan()
-        else:                    self._perform_normal_scan()
+    # A resumed scan takes its targets and scan options from the checkpoint, not from the command line
+    def _load_targets(self) -> None:
+        if self._flags['resume']:
+            self._resume = load_checkpoint(self._flags['resume'])
+            meta         = self._resume[0]
+            self._host   = meta['host']
+            self._flags.update(self._resumed_flags(meta['flags']))
+            self._flags['checkpoint'] = self._flags['checkpoint'] or self._flags['resume']
+        if not self._host: raise ValueError('No targets were given')
+        if self._flags['checkpoint'] and (self._flags['decoy'] or self._flags['delay']):
+            raise ValueError('Checkpoints are not supported by the decoy (-D) and delay (-d) modes')
+        if self._flags['diff'] and (self._flags['checkpoint'] or self._flags['shard']):
+            raise ValueError('The differential mode (-x) cannot be combined with checkpoints or shards')
+        if self._flags['udp'] and (self._flags['fast'] or self._flags['connect'] or self._flags['decoy'] or self._flags['delay']):
+            raise ValueError('The UDP scan (-U) cannot be combined with the TCP engines')
+        if self._flags['workers'] and (self._flags['checkpoint'] or self._flags['decoy'] or not self._scans_any_space()):
+            raise ValueError('Worker processes (-W) are only supported by the fast (-F), connect (-C) and UDP (-U) engines, '
+                             'without checkpoints')
+        if self._flags['coordinate'] and (self._flags['checkpoint'] or self._flags['diff'] or self._flags['workers']
+                                          or self._flags['decoy'] or not self._scans_any_space()):
+            raise ValueError('Agents (-L) only run fast (-F), connect (-C) and UDP (-U) scans, without checkpoints, diff or workers')
+        if (self._flags['random'] or self._flags['diff']) and self._flags['seed'] is None:
+            self._flags['seed'] = random.getrandbits(32)
+        with METRICS._phase('targets'):
+            self._targets = parse_targets(self._host)
+
+
+    # Engines able to scan any part of a probe space, which worker processes and agents need
+    def _scans_any_space(self) -> bool:
+        return bool(self._flags['fast'] or self._flags['connect'] or self._flags['udp'])
+
+
+    def _resumed_flags(self, saved:dict) -> dict:
+        return {flag: value for flag, value in saved.items() if flag not in self.TUNABLE or self._flags[flag] is None}
+
+
+    def _get_result_by_transmission_method(self) -> None:
+        if   self._flags['decoy']:   self._perform_decoy_scan()
+        elif self._flags['udp']:     self._perform_udp_scan()
+        elif self._flags['fast']:    self._perform_fast_scan()
+        elif self._flags['connect']: self._perform_connect_scan()
+        elif self._flags['delay']:   self._perform_delayed_scan()
+        else:                        self._perform_normal_scan()
 
     
+    # Engines are imported on demand so each mode only loads what it uses (Scapy, asyncio)
     def _perform_normal_scan(self) -> None:
+        from pscan_normal import Normal_Scan
         self._prepare_ports()
-        with Normal_Scan(self._target_ip, list(self._ports.keys()), self._flags) as SCAN:
-            self._responses = SCAN._perform_normal_methods()
+        target   = self._single_target()
+        ports    = self._port_order()
+        progress = self._create_progress(len(ports), lambda position: Sequential_Order(len(ports), position=position))
+        with Normal_Scan(target, ports, self._flags, progress) as SCAN:
+            self._run_engine(progress, SCAN._perform_normal_methods)
 
     
     def _perform_decoy_scan(self) -> None:
+        from pscan_decoy import Decoy_Scan
+        self._prepare_ports()
+        self._single_target()
+        self._flags['show'] = True
+        space    = Target_Space(self._targets, self._ports)
+        progress = self._create_progress(len(space), lambda position: self._create_probe_order(space, position))
+        with Decoy_Scan(space, progress, self._flags) as SCAN:
+            if self._is_displayed(): print(f'{yellow("Decoys")}: {", ".join(SCAN._decoy_ips)}')
+            self._run_engine(progress, SCAN._perform_decoy_scan)
+
+
+    def _perform_fast_scan(self) -> None:
+        from pscan_syn import Syn_Scan
         self._prepare_ports()
-        with Decoy(self._target_ip, list(self._ports.keys())) as DECOY:
-            self._responses     = DECOY._perform_decoy_methods()
-            self._flags['show'] = True
+        self._scan_space(Target_Space(self._targets, self._ports), Syn_Scan, lambda SCAN: SCAN._perform_syn_scan())
+
+
+    def _perform_connect_scan(self) -> None:
+        from pscan_connect import Connect_Scan
+        self._prepare_ports()
+        self._scan_space(Target_Space(self._targets, self._ports), Connect_Scan, lambda SCAN: SCAN._perform_connect_scan())
+
+
+    def _perform_udp_scan(self) -> None:
+        from pscan_udp import Udp_Scan
+        self._prepare_ports()
+        self._scan_space(Target_Space(self._targets, self._ports), Udp_Scan, lambda SCAN: SCAN._perform_udp_scan())
+
+
+    def _perform_delayed_scan(self) -> None:
+        from pscan_delay import Delayed_Scan
+        self._prepare_ports()
+        self._single_target()
+        self._scan_space(Target_Space(self._targets, self._ports), Delayed_Scan, lambda SCAN: SCAN._perform_delayed_scan())
+
+
+    def _scan_space(self, space:Target_Space, engine:type, start) -> None:
+        if self._agent:
+            self._agent._run_scan(lambda unit, units: engine(space, self._unit_progress(space, unit, units), self._flags), start)
+            return
+        if self._flags['coordinate']:
+            self._scan_with_agents(space)
+            return
+        if self._flags['workers']:
+            self._scan_with_workers(space, engine, start)
+            return
+        progress = self._create_progress(len(space), lambda position: self._create_probe_order(space, position))
+        with engine(space, progress, self._flags) as SCAN:
+            self._run_engine(progress, lambda: start(SCAN))
+
+
+    def _single_target(self) -> str:
+        if self._has_multiple_hosts():
+            raise ValueError('Multiple targets are only supported by the fast (-F), connect (-C) and UDP (-U) engines')
+        return str(self._targets[0].network_address)
+
+
+    def _has_multiple_hosts(self) -> bool:
+        return len(self._targets) > 1 or self._targets[0].num_addresses > 1
+
+
+    # Worker processes split the shard of this run further, each one taking every workers-th element of it
+    def _create_probe_order(self, space:Target_Space, position:int=0, worker:int=0,
+                            workers:int=1) -> Cyclic_Permutation|Sequential_Order|Listed_Order:
+        shard, shards = parse_shard(self._flags['shard'])
+        shard, shards = shard + shards * worker, shards * workers
+        if self._is_differential():
+            return Listed_Order(len(space), self._differential_probes(space)[worker::workers], position)
+        if self._flags['random']:   return Cyclic_Permutation(len(space), self._flags['seed'], shard, shards, position)
+        return Sequential_Order(len(space), shard, shards, position)
+
+
+    # WORKERS ------------------------------------------------------------------------------------------------
+
+    # Every worker process scans its own part of the probe space with its own sockets. A rate or concurrency
+    # given on the command line is split between them, the engine defaults apply to each worker
+    def _scan_with_workers(self, space:Target_Space, engine:type, start) -> None:
+        from workers import Worker_Pool
+        workers  = self._flags['workers']
+        flags    = {**self._flags, **self._worker_limits(workers)}
+        progress = Scan_Progress(self._create_probe_order(space))
+        create   = lambda worker, done: engine(space, Scan_Progress(self._create_probe_order(space, 0, worker, workers), done), flags)
+        with Worker_Pool(workers, len(space)) as POOL:
+            self._run_engine(progress, lambda: POOL._stream(create, start, progress))
+
+
+    def _worker_limits(self, workers:int) -> dict:
+        rate, concurrency = self._flags['rate'], self._flags['concurrency']
+        return {'rate': rate and rate / workers, 'concurrency': concurrency and max(1, concurrency // workers)}
+
+
+    # AGENTS -------------------------------------------------------------------------------------------------
+
+    # Work units split the shard of this run like worker processes do, the agents scan them with their own engines
+    def _scan_with_agents(self, space:Target_Space) -> None:
+        from coordinator import Scan_Coordinator
+        progress = Scan_Progress(self._create_probe_order(space))
+        notify   = print if self._is_displayed() else lambda message: print(message, file=sys.stderr)    # The key must reach the user
+        with Scan_Coordinator(self._flags['coordinate'], self._flags['key'], self._agent_job(), notify) as COORDINATOR:
+            notify(f'Waiting for agents on {self._flags["coordinate"]} (key {COORDINATOR._key})')
+            self._run_engine(progress, lambda: COORDINATOR._stream(space, progress))
+
+
+    # Outputs, history and processes stay with the coordinator, a given rate applies to every agent
+    def _agent_job(self) -> dict:
+        local = ('output', 'write', 'checkpoint', 'resume', 'history', 'workers', 'coordinate', 'key', 'stats', 'metrics')
+        return {
+            'command': 'pscan',
+            'host':    self._host,
+            'flags':   {**self._flags, **dict.fromkeys(local), 'diff': False},
+        }
+
+
+    def _unit_progress(self, space:Target_Space, unit:int, units:int) -> Scan_Progress:
+        return Scan_Progress(self._create_probe_order(space, 0, unit, units))
+
+
+    # CHECKPOINTS --------------------------------------------------------------------------------------------
+
+    def _create_progress(self, size:int, create_order) -> Scan_Progress:
+        if self._resume is None: return Scan_Progress(create_order(0))
+        meta, done, outstanding, table = self._resume
+        if meta['size'] != size: raise ValueError('The checkpoint does not match the probe space of this scan')
+        return Scan_Progress(create_order(meta['position']), done, outstanding, table)
+
+
+    # Results restored from a checkpoint are shown before the scan continues
+    def _run_engine(self, progress:Scan_Progress, start) -> None:
+        self._process_responses(iter(progress._table))
+        with Checkpoint_Writer(self._flags['checkpoint'], self._checkpoint_meta(progress), progress):
+            self._process_responses(start())
+
+
+    def _checkpoint_meta(self, progress:Scan_Progress) -> dict:
+        return {
+            'host':  self._host,
+            'size':  progress._order._size,
+            'flags': {flag: self._flags[flag] for flag in self.RESUMABLE},
+        }
+
+
+    def _resume_hint(self) -> str:
+        if not self._flags['checkpoint']: return ''
+        return f'\nResume with: pscan --resume {self._flags["checkpoint"]}'
 
     
+    # HISTORY ------------------------------------------------------------------------------------------------
+
+    def _open_history(self) -> Scan_History|None:
+        path = self._flags['history'] or (DEFAULT_PATH if self._flags['diff'] else None)
+        if path is None: return None
+        history = Scan_History(path, 'pscan-udp' if self._flags['udp'] else 'pscan', self._host,
+                               UDP_REPLY if self._flags['udp'] else TCP_SYN_ACK)
+        if self._flags['diff'] and history._previous_scan is None and self._is_displayed():
+            print(yellow(f'No earlier scan of {self._host} in the history, running a full scan'))
+        return history
+
+
+    def _is_differential(self) -> bool:
+        return bool(self._flags['diff']) and self._history._previous_scan is not None
+
+
+    # Probes found open by earlier runs come first, then a random sample of the rest of the space
+    def _differential_probes(self, space:Target_Space) -> list[int]:
+        previous = dict.fromkeys(index for index in (space._index(*probe) for probe in self._history._previous_open())
+                                 if index is not None)
+        share    = self.SAMPLE if self._flags['sample'] is None else self._flags['sample']
+        count    = math.ceil((len(space) - len(previous)) * share)
+        sample   = random.Random(self._flags['seed']).sample(range(len(space)), min(len(space), count + len(previous)))
+        return [*previous, *[index for index in sample if index not in previous][:count]]
+
+
+    # Sharded runs do not reach every probe of the space, so they cannot tell that an open port was closed
+    def _report_changes(self) -> None:
+        space          = Target_Space(self._targets, self._ports)
+        probed         = lambda host, port: not self._flags['shard'] and space._index(host, port) is not None
+        opened, closed = self._history._port_changes(self._history._previous_open(), probed)
+        self._history._finish()
+        if not self._is_differential() or not self._is_displayed(): return
+        since = time.strftime('%Y-%m-%d %H:%M', time.localtime(self._history._previous_scan[1]))
+        print(f'Changes since the scan of {since}:' if opened or closed else f'No changes since the scan of {since}')
+        for host, port in opened: print(f'{green("Opened")} -> {int_to_ip(host)}:{port} - {describe_port(port)}')
+        for host, port in closed: print(f'{red("Closed")} -> {int_to_ip(host)}:{port} - {describe_port(port)}')
+
+
     def _prepare_ports(self) -> None:
-        if   self._flags['decoy']: self._ports = get_ports(self._flags['decoy'])
-        elif self._flags['port']:  self._ports = get_ports(self._flags['port'])
-        elif self._flags['all']:   self._ports = get_ports()
-        else:                      self._ports = get_ports('common')
+        with METRICS._phase('targets'):
+            if   self._flags['decoy']: self._ports = get_ports(self._flags['decoy'])
+            elif self._flags['port']:  self._ports = get_ports(self._flags['port'])
+            elif self._flags['all']:   self._ports = get_ports()
+            elif self._flags['udp']:   self._ports = get_ports('udp')
+            else:                      self._ports = get_ports('common')
+
+
+    def _port_order(self) -> list[int]:
+        if self._is_differential():
+            return [self._ports[index] for index in self._differential_probes(Target_Space(self._targets, self._ports))]
+        if not self._flags['random']: return list(self._ports)
+        return [self._ports[index] for index in Cyclic_Permutation(len(self._ports), self._flags['seed'])]
 
-        if self._flags['random']:
-            random_list = random.sample(list(self._ports.items()), len(self._ports))
-            self._ports = dict(random_list)
 
+    # Results are displayed as the engine publishes them instead of after the whole scan. The output phase
+    # leaves out the wait for the next result
+    def _process_responses(self, responses:Iterable[tuple[str, int, str|None, int, int, float]]) -> None:
+        multiple_hosts = self._has_multiple_hosts()
+        display        = self._is_displayed()
+        for host, port, flag, ttl, window, rtt in responses:
+            start = time.perf_counter()
+            if self._history and flag:
+                self._history._record_port(ip_to_int(host), port, tcp_flags_from_str(flag), ttl, window, rtt)
+            if self._is_open(flag) or self._flags['show']:
+                description = describe_port(port)
+                if self._sink: self._sink._write('port', self._port_record(host, port, flag, ttl, window, rtt, description))
+                if display:    self._display_result(flag, f'{host}:{port}' if multiple_hosts else port, description)
+                METRICS._results += 1
+            METRICS._add_time('output', time.perf_counter() - start)
 
-    def _process_responses(self) -> None:
-        for sent, received in self._responses:
-            port        = sent[TCP].dport if not isinstance(sent[TCP].dport, list) else sent[TCP].dport[0]
-            flag        = received[TCP].flags if received else None
-            description = self._ports[port]
-            self._display_result(flag, port, description)
+
+    @staticmethod
+    def _is_open(flag:str|None) -> bool:
+        return flag in ('SA', 'UDP')
+
+
+    # Unreachable messages other than port unreachable come from a filter, silence from an open or filtered UDP port
+    def _state(self, flag:str|None) -> str:
+        if flag is None and self._flags['udp']: return 'open|filtered'
+        if flag and flag.startswith('ICMP'):    return self.STATES.get(flag, 'filtered')
+        return self.STATES.get(flag, 'unknown')
+
+
+    # Returns False when the machine-readable records replace the colored output on stdout
+    def _is_displayed(self) -> bool:
+        return self._sink is None or self._sink._path is not None
+
+
+    def _port_record(self, host:str, port:int, flag:str|None, ttl:int, window:int, rtt:float, description:str) -> dict:
+        return {
+            'host':    host,
+            'port':    port,
+            'state':   self._state(flag),
+            'flags':   flag,
+            'ttl':     ttl,
+            'window':  window,
+            'rtt':     round(rtt, 6),
+            'service': description,
+        }
 
 
-    def _display_result(self, flag:str|None, port:int, description:str) -> None:
+    def _display_result(self, flag:str|None, port:int|str, description:str) -> None:
         match flag:
-            case "SA": status = green('Opened')
-            case "S":  status = yellow('Potentially Open')
-            case "RA": status = red('Closed')
-            case "F":  status = red('Connection Closed')
-            case "R":  status = red('Reset')
-            case None: status = red('Filtered')
-            case _:    status = red('Unknown Status')
-        if flag == 'SA' or self._flags['show']:
+            case "SA":                         status = green('Opened')
+            case "S":                          status = yellow('Potentially Open')
+            case "RA":                         status = red('Closed')
+            case "F":                          status = red('Connection Closed')
+            case "R":                          status = red('Reset')
+            case "UDP":                        status = green('Opened')
+            case "ICMP3":                      status = red('Closed')
+            case None if self._flags['udp']:   status = yellow('Open|Filtered')
+            case None:                         status = red('Filtered')
+            case _ if flag.startswith('ICMP'): status = red('Filtered')
+            case _:                            status = red('Unknown Status')
+        if self._is_open(flag) or self._flags['show']:
             print(f'Status: {status:>17} -> {port:>5} - {description}')
\ No newline at end of file
@@ -0,0 +1,89 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import asyncio, resource, time
+from targets    import Target_Space, int_to_ip
+from results    import Result_Stream
+from checkpoint import Scan_Progress
+from timing     import Timing
+from telemetry  import METRICS
+from transport  import current_transport
+
+
+class Connect_Scan:
+
+    CONCURRENCY = 1000
+    TIMEOUT     = 1.0
+
+    def __init__(self, space:Target_Space, progress:Scan_Progress, arg_flags:dict) -> None:
+        self._space:Target_Space     = space
+        self._progress:Scan_Progress = progress
+        self._arg_flags:dict         = arg_flags
+        self._timing                 = Timing(arg_flags.get('timeout') or self.TIMEOUT, arg_flags.get('retries'))
+        self._concurrency:int        = self._limit_concurrency(arg_flags.get('concurrency') or self.CONCURRENCY)
+        self._stream                 = Result_Stream(progress._table)
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+    @staticmethod
+    def _limit_concurrency(concurrency:int) -> int:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard and soft < concurrency + 64:
+            soft = hard if hard != resource.RLIM_INFINITY else concurrency + 64
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+        return max(1, min(concurrency, soft - 64))
+
+
+    def _perform_connect_scan(self) -> Result_Stream:
+        return self._stream._produce(lambda: asyncio.run(self._scan()))
+
+
+    async def _scan(self) -> None:
+        probes  = self._progress._probes()
+        workers = [asyncio.create_task(self._worker(probes)) for _ in range(min(self._concurrency, len(self._space)))]
+        METRICS._watch('pending', self._in_flight)
+        try:     await asyncio.gather(*workers)
+        finally: METRICS._unwatch('pending', self._in_flight)
+
+
+    def _in_flight(self) -> int:
+        return len(self._progress._in_flight)
+
+
+    async def _worker(self, probes) -> None:
+        for index in probes:
+            host, port = self._space._probe(index)
+            flags, rtt = await self._probe(host, port)
+            self._progress._complete_probe(index, lambda: self._publish(host, port, flags, rtt))
+
+
+    # A connection that times out is attempted again with a backed off timeout, the handshake time of an
+    # answered one feeds the RTT estimate of its host
+    async def _probe(self, host:int, port:int) -> tuple[int, float]:
+        for attempt in range(self._timing._retries + 1):
+            if attempt: METRICS._retransmits += 1
+            start = time.monotonic()
+            flags = await current_transport()._connect(int_to_ip(host), port, self._timing._timeout(host, attempt))
+            METRICS._sent += 1
+            if flags:
+                rtt = time.monotonic() - start
+                METRICS._replies += 1
+                self._timing._observe(host, rtt)
+                return flags, rtt
+        METRICS._timeouts += 1
+        return 0, 0.0
+
+
+    def _publish(self, host:int, port:int, flags:int, rtt:float) -> None:
+        if flags or self._arg_flags.get('show'):
+            self._stream._put(host, port, flags, rtt=rtt)
+
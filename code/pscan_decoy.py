@@ -5,74 +5,115 @@
 
 
 import random, threading, time
-from scapy.all         import conf, get_if_addr
-from scapy.layers.inet import IP, TCP
-from scapy.sendrecv    import sr1, send
-from scapy.packet      import Packet
-from network           import *
-
-
-class Decoy:
-
-    def __init__(self, target_ip, port):
-        self._target_ip:str   = target_ip
-        self._port:int        = port
-        self._netmask:str     = get_subnet_mask(conf.iface)
-        self._my_ip:str       = get_if_addr(conf.iface)
-        self._decoy_ips:list  = None
-        self._response:Packet = None
+from network      import get_ip_range
+from packets      import Tcp_Template, Packet_Arena
+from targets      import Target_Space, host_bounds, int_to_ip, ip_to_int
+from pkt_sending  import Raw_Transmitter
+from rate_control import Rate_Limiter
+from receivers    import Tcp_Receiver
+from results      import Result_Stream
+from checkpoint   import Scan_Progress
+from timing       import Timing
+from telemetry    import METRICS
+from transport    import current_transport
+
+
+class Decoy_Scan:
+
+    RATE   = 5.0       # Packets per second, decoys included
+    DECOYS = (4, 6)
+    POLL   = 0.05
+
+    def __init__(self, space:Target_Space, progress:Scan_Progress, arg_flags:dict) -> None:
+        self._space:Target_Space     = space
+        self._progress:Scan_Progress = progress
+        self._target_ip:str          = int_to_ip(space._host(0))
+        self._my_ip:str              = current_transport()._route_source_ip(self._target_ip)
+        self._src_port:int           = random.randint(10000, 65535)
+        self._decoy_ips:list         = self._sample_decoys(random.randint(*self.DECOYS))
+        self._templates:dict         = self._create_templates()
+        self._timing                 = Timing(arg_flags.get('timeout'), arg_flags.get('retries'))
+        self._rate_limiter           = Rate_Limiter(arg_flags.get('rate') or self.RATE, burst=1)
+        self._stream                 = Result_Stream(progress._table)
+        self._stop                   = threading.Event()
+        self._probed:list            = list()
 
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
         return False
 
 
-    def _perform_decoy_methods(self) -> Packet:
-        self._generate_random_ip_in_subnet()
-        self._add_real_packet()        
-        self._send_decoy_and_real_packets()
-        return self._response
+    # Decoys are drawn from the local network without listing its hosts
+    def _sample_decoys(self, count:int) -> list[str]:
+        first, size = host_bounds(get_ip_range(self._my_ip, current_transport()._subnet_mask()))
+        excluded    = (ip_to_int(self._my_ip), ip_to_int(self._target_ip))
+        candidates  = random.sample(range(first, first + size), min(size, count + len(excluded)))
+        return [int_to_ip(address) for address in candidates if address not in excluded][:count]
+
+
+    # Every source address gets its own template, so a probe costs only the per-port patching
+    def _create_templates(self) -> dict[str, Tcp_Template]:
+        return {address: Tcp_Template(self._target_ip, address, self._src_port) for address in (*self._decoy_ips, self._my_ip)}
+
+
+    def _perform_decoy_scan(self) -> Result_Stream:
+        return self._stream._produce(self._scan)
+
+
+    def _scan(self) -> None:
+        receiver = Tcp_Receiver(self._space, self._src_port, self._progress._done, self._record, self._stop)
+        receiver._start()
+        with METRICS._phase('build'), Raw_Transmitter(rate_limiter=self._rate_limiter) as transmitter:
+            self._send_probes(transmitter)
+        self._wait_for_replies()
+        self._stop.set()
+        receiver._join()
+        self._report_unanswered()
 
 
-    def _generate_random_ip_in_subnet(self, count = random.randint(4, 6)) -> None:
-        network         = ipaddress.IPv4Network(f"{self._my_ip}/{self._netmask}", strict=False)
-        hosts           = list(network.hosts())
-        random_ips      = random.sample(hosts, count)
-        self._decoy_ips = [str(ip) for ip in random_ips]
+    # The real probe of each port hides among the decoys, placed at a random position in the second half
+    def _send_probes(self, transmitter:Raw_Transmitter) -> None:
+        arena = Packet_Arena(len(self._templates))
+        for index in self._progress._probes(track=False):
+            _, port  = self._space._probe(index)
+            sources  = list(self._decoy_ips)
+            sources.insert(random.randint(len(sources) // 2, len(sources)), self._my_ip)
+            transmitter._send_batch([(self._render(arena._slot(slot), source, port), self._target_ip)
+                                     for slot, source in enumerate(sources)])
+            self._probed.append(index)
 
 
-    def _add_real_packet(self) -> list:
-        packet_number = len(self._decoy_ips)
-        real_ip_index = random.randint(packet_number // 2, packet_number - 1)
-        self._decoy_ips.insert(real_ip_index, self._my_ip)
+    def _render(self, slot:memoryview, source:str, port:int) -> memoryview:
+        return self._templates[source]._render(slot, port, random.getrandbits(16), seq=self._timestamp())
 
 
-    def _send_decoy_and_real_packets(self) -> None:
-        for ip in self._decoy_ips:
-            delay = random.uniform(1, 3)
-            if ip == self._my_ip:
-                print(f'{green("Real packet")}: {ip:<15}, Delay: {delay:.2}')
-                thread = threading.Thread(target=self._send_real_packet)
-                thread.start()
-            else:
-                print(f'{red("Decoy packet")}: {ip:<15}, Delay: {delay:.2}')
-                self._send_decoy_packet(ip)
-            time.sleep(delay)
+    # Called from the receiver thread, only replies to the real source address reach it
+    def _record(self, index:int, host:int, port:int, flags:int, ttl:int, window:int, sent_at:int|None) -> None:
+        rtt = (self._timestamp() - sent_at & 0xffffffff) / 1e6 if sent_at is not None else 0.0
+        METRICS._replies += 1
+        self._timing._observe(host, rtt)
+        self._progress._complete_probe(index, lambda: self._stream._put(host, port, flags, ttl, window, rtt))
 
 
-    def _send_real_packet(self) -> None:
-        real_packet    = self._create_tcp_packet(self._my_ip)
-        response       = sr1(real_packet, timeout=3, verbose=0)
-        self._response = [(real_packet, response)]
+    @staticmethod
+    def _timestamp() -> int:
+        return time.monotonic_ns() // 1000 & 0xffffffff
 
 
-    def _send_decoy_packet(self, decoy_ip:str) -> None:
-        decoy_packet = self._create_tcp_packet(decoy_ip)
-        send(decoy_packet, verbose=0)
+    def _wait_for_replies(self) -> None:
+        deadline = time.monotonic() + self._timing._timeout()
+        while time.monotonic() < deadline and not all(self._progress._is_done(index) for index in self._probed):
+            with METRICS._phase('wait'):
+                time.sleep(self.POLL)
 
 
-    def _create_tcp_packet(self, source_ip:str) -> Packet:
-        return IP(dst=self._target_ip, src=source_ip) / TCP(dport=self._port, flags="S")
\ No newline at end of file
+    def _report_unanswered(self) -> None:
+        for index in self._probed:
+            if self._progress._is_done(index): continue
+            METRICS._timeouts += 1
+            host, port = self._space._probe(index)
+            self._progress._complete_probe(index, lambda: self._stream._put(host, port, 0))
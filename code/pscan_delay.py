@@ -0,0 +1,138 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import collections, random, sys, threading, time
+from packets      import Tcp_Template, Packet_Arena
+from transport    import current_transport
+from targets      import Target_Space, int_to_ip
+from pkt_sending  import Raw_Transmitter
+from receivers    import Tcp_Receiver
+from results      import Result_Stream
+from checkpoint   import Scan_Progress
+from timing       import Timing, Retransmit_Timer
+from telemetry    import METRICS
+
+
+class Delayed_Scan:
+
+    DELAY = (1.0, 3.0)    # Seconds between probes when --delay is given without a value
+
+    def __init__(self, space:Target_Space, progress:Scan_Progress, arg_flags:dict) -> None:
+        self._space:Target_Space     = space
+        self._progress:Scan_Progress = progress
+        self._arg_flags:dict         = arg_flags
+        self._delay:tuple            = parse_delay(arg_flags['delay'], self.DELAY)
+        self._src_ip:str             = current_transport()._route_source_ip(int_to_ip(space._host(0)))
+        self._src_port:int           = random.randint(10000, 65535)
+        self._template               = Tcp_Template(int_to_ip(space._host(0)), self._src_ip, self._src_port)
+        self._slot                   = Packet_Arena(1)._slot(0)
+        self._timing                 = Timing(arg_flags.get('timeout'), arg_flags.get('retries'))
+        self._timer                  = Retransmit_Timer()
+        self._due                    = collections.deque()
+        self._sent:int               = 0
+        self._stream                 = Result_Stream(progress._table)
+        self._stop                   = threading.Event()
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        return False
+
+
+    def _perform_delayed_scan(self) -> Result_Stream:
+        return self._stream._produce(self._scan)
+
+
+    # One thread sends every probe and one receiver matches every reply, whatever the number of ports
+    def _scan(self) -> None:
+        receiver = Tcp_Receiver(self._space, self._src_port, self._progress._done, self._record, self._stop)
+        receiver._start()
+        METRICS._watch('pending', self._timer.__len__)
+        with Raw_Transmitter() as transmitter:
+            self._run_schedule(transmitter, self._progress._probes(track=False))
+        METRICS._unwatch('pending', self._timer.__len__)
+        self._stop.set()
+        receiver._join()
+        if not self._arg_flags.get('stats'): sys.stderr.write('\n')
+
+
+    # Probes fire at jittered times, each send time following the previous one. A retransmission that fell
+    # due takes the next send time before any new probe does, so the spacing stays randomized throughout
+    def _run_schedule(self, transmitter:Raw_Transmitter, probes) -> None:
+        next_send = time.monotonic()
+        probe     = next(probes, None)
+        while probe is not None or self._due or self._timer:
+            now = time.monotonic()
+            self._expire_probes(now)
+            if now >= next_send and (self._due or probe is not None):
+                if self._due:
+                    self._send(transmitter, *self._due.popleft())
+                else:
+                    self._send(transmitter, probe, 0)
+                    probe = next(probes, None)
+                delay      = random.uniform(*self._delay)
+                next_send += delay
+                self._display_progress(delay)
+                continue
+            wake = self._timer._next_deadline() or next_send
+            if self._due or probe is not None: wake = min(wake, next_send)
+            with METRICS._phase('wait'):
+                time.sleep(max(0.0, wake - time.monotonic()))
+
+
+    def _send(self, transmitter:Raw_Transmitter, index:int, attempt:int) -> None:
+        host, port = self._space._probe(index)
+        with METRICS._phase('build'):
+            packet = self._template._render(self._slot, port, random.getrandbits(16), dst_ip=host, seq=self._timestamp())
+        transmitter._send(packet, int_to_ip(host))
+        self._timer._schedule(time.monotonic() + self._timing._timeout(host, attempt), index, attempt)
+        if attempt == 0: self._sent += 1
+
+
+    # Unanswered probes wait for a send time to be retransmitted, the ones out of attempts are reported as filtered
+    def _expire_probes(self, now:float) -> None:
+        for index, attempt in self._timer._expired(now):
+            if self._progress._is_done(index): continue
+            if attempt < self._timing._retries:
+                METRICS._retransmits += 1
+                self._due.append((index, attempt + 1))
+                continue
+            METRICS._timeouts += 1
+            host, port = self._space._probe(index)
+            self._progress._complete_probe(index, lambda: self._stream._put(host, port, 0))
+
+
+    # Called from the receiver thread as soon as a reply is classified
+    def _record(self, index:int, host:int, port:int, flags:int, ttl:int, window:int, sent_at:int|None) -> None:
+        rtt = (self._timestamp() - sent_at & 0xffffffff) / 1e6 if sent_at is not None else 0.0
+        METRICS._replies += 1
+        self._timing._observe(host, rtt)
+        self._progress._complete_probe(index, lambda: self._stream._put(host, port, flags, ttl, window, rtt))
+
+
+    @staticmethod
+    def _timestamp() -> int:
+        return time.monotonic_ns() // 1000 & 0xffffffff
+
+
+    # Written to stderr like the live status line of --stats, which replaces it, so records on stdout stay intact
+    def _display_progress(self, delay:float) -> None:
+        if self._arg_flags.get('stats'): return
+        sys.stderr.write(f'\rPacket sent: {self._sent}/{len(self._space)} - {delay:.2}s')
+        sys.stderr.flush()
+
+
+
+# FUNCTIONS ==================================================================================================
+
+# The delay is True for the default range, a single number of seconds or a "min-max" range
+def parse_delay(delay:str|bool, default:tuple[float, float]) -> tuple[float, float]:
+    if delay is True: return default
+    values = [float(value) for value in delay.split('-')]
+    return values[0], values[-1]
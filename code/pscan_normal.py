@@ -4,22 +4,31 @@
 # Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
 
 
-import threading, sys, time, random
+import socket, time
+from scapy.all         import conf
 from scapy.layers.inet import IP, TCP, UDP
-from scapy.sendrecv    import sr1, sr, send
 from scapy.packet      import Packet
+from rate_control      import Rate_Limiter
+from results           import Result_Stream
+from checkpoint        import Scan_Progress
+from timing            import Timing
+from telemetry         import METRICS
+from transport         import current_transport
 
 
 class Normal_Scan:
 
-    def __init__(self, target_ip, ports, arg_flags) -> None:
-        self._target_ip:str   = target_ip
-        self._ports:list|int  = ports
-        self._arg_flags:dict  = arg_flags
-        self._packets:list    = [self._create_tcp_syn_packet(port) for port in self._ports]
-        self._delay:int|float = None
-        self._lock            = threading.Lock()
-        self._responses:list  = list()
+    RATE = 10
+
+    def __init__(self, target_ip, ports, arg_flags, progress:Scan_Progress) -> None:
+        self._target_ip:str          = target_ip
+        self._ports:list|int         = ports
+        self._arg_flags:dict         = arg_flags
+        self._progress:Scan_Progress = progress
+        self._rate_limiter           = Rate_Limiter(arg_flags.get('rate') or self.RATE)
+        self._timing                 = Timing(arg_flags.get('timeout'), arg_flags.get('retries'))
+        conf.verb                    = 0
+        self._stream                 = Result_Stream(progress._table)
 
 
     def __enter__(self):
@@ -29,11 +38,8 @@ class Normal_Scan:
         return False
 
 
-    def _perform_normal_methods(self) -> None:
-        if   self._arg_flags['delay']:   self._sendings_with_delay()
-        elif self._arg_flags['stealth']: self._responses = self._send_packets()
-        else:                            self._send_tcp_handshake_packets()
-        return self._responses
+    def _perform_normal_methods(self) -> Result_Stream:
+        return self._stream._produce(self._send_packets)
 
 
     # PACKETS ------------------------------------------------------------------------------------------------
@@ -53,52 +59,56 @@ class Normal_Scan:
     
     # NORMAL SENDING -----------------------------------------------------------------------------------------
 
-    def _send_packets(self) -> list[Packet]:
-        responses, _ = sr(self._packets, inter=0.1, timeout=3, verbose=0)
-        return responses
+    # Probes are sent one at a time, every sr1() call captures on its own, so scans of many ports belong to the
+    # fast engine (-F). A result is published as soon as its reply arrives, the connections are closed at the end
+    def _send_packets(self) -> None:
+        fin_packets = list()
+        for index in self._progress._probes():
+            self._rate_limiter._acquire()
+            response = self._probe_port(index)
+            if response is not None and not self._arg_flags['stealth']:
+                fin_packets.append(self._acknowledge(response))
+        self._close_connections(fin_packets)
+
+
+    def _probe_port(self, index:int) -> Packet|None:
+        with METRICS._phase('build'):
+            packet = self._create_tcp_syn_packet(self._ports[index])
+        response = self._exchange(packet)
+        self._progress._complete_probe(index, lambda: self._stream._put(*convert_scapy_response(packet, response)))
+        return response
 
     
-    def _send_tcp_handshake_packets(self) -> None:
-        responses   = self._send_packets()
-        ack_packets = [self._create_tcp_ack_packet(pkt[TCP].sport, pkt.seq, pkt.ack) for _, pkt in responses]
-        fin_packets = [self._create_tcp_fin_packet(pkt[TCP].sport) for _, pkt in responses]
-        send(ack_packets, verbose=0)
-        time.sleep(1)
-        send(fin_packets, verbose=0)
-        self._responses = responses
-
-
-    # DELAY METHODS ------------------------------------------------------------------------------------------
-
-    def _sendings_with_delay(self) -> None:
-        self._get_delay_time_list()
-        threads     = []
-        for index ,packet in enumerate(self._packets):
-            thread = threading.Thread(target=self._async_send_packet, args=(packet,))
-            threads.append(thread)
-            thread.start()
-            sys.stdout.write(f'\rPacket sent: {index}/{len(self._packets)} - {self._delay[index]:.2}s')
-            sys.stdout.flush()
-            time.sleep(self._delay[index])
-        for thread in threads:
-            thread.join()
-        print('\n')
+    # Unanswered probes are sent again with a backed off timeout, replies feed the RTT estimate of the target
+    def _exchange(self, packet:Packet) -> Packet|None:
+        for attempt in range(self._timing._retries + 1):
+            if attempt: METRICS._retransmits += 1
+            response = current_transport()._exchange(packet, self._timing._timeout(self._target_ip, attempt))
+            METRICS._sent += 1
+            if response is not None:
+                METRICS._replies += 1
+                self._timing._observe(self._target_ip, response.time - packet.sent_time)
+                return response
+        METRICS._timeouts += 1
+        return None
 
+    
+    def _acknowledge(self, response:Packet) -> Packet:
+        current_transport()._send_packet(self._create_tcp_ack_packet(response[TCP].sport, response.seq, response.ack))
+        return self._create_tcp_fin_packet(response[TCP].sport)
 
-    def _get_delay_time_list(self) -> None:
-        match self._arg_flags['delay']:
-            case True: delay = [random.uniform(1, 3) for _ in range(len(self._packets))]
-            case _:    delay = self._create_delay_time_list()
-        self._delay = delay
 
+    def _close_connections(self, fin_packets:list[Packet]) -> None:
+        if not fin_packets: return
+        time.sleep(1)
+        for packet in fin_packets:
+            current_transport()._send_packet(packet)
 
-    def _create_delay_time_list(self) -> list:
-        values = [float(value) for value in self._arg_flags['delay'].split('-')]
-        if len(values) > 1: return [random.uniform(values[0], values[1]) for _ in range(len(self._packets))]
-        return [values[0] for _ in range(len(self._packets))]
 
 
-    def _async_send_packet(self, packet:Packet) -> None:
-        response = sr1(packet, timeout=3, verbose=0)
-        with self._lock:
-            self._responses.append((packet, response))
+# Only the fields kept by the result table are extracted, the packets themselves are not retained
+def convert_scapy_response(sent:Packet, received:Packet|None) -> tuple[int, int, int, int, int, float]:
+    host = int.from_bytes(socket.inet_aton(sent[IP].dst), 'big')
+    port = sent[TCP].dport
+    if received is None or TCP not in received: return host, port, 0, 0, 0, 0.0
+    return host, port, int(received[TCP].flags), received[IP].ttl, received[TCP].window, received.time - sent.sent_time
@@ -0,0 +1,154 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import collections, threading, random, time
+from packets      import Tcp_Template, Packet_Arena
+from transport    import current_transport
+from targets      import Target_Space, int_to_ip
+from pkt_sending  import Raw_Transmitter
+from rate_control import Rate_Limiter
+from receivers    import Tcp_Receiver
+from results      import Result_Stream
+from checkpoint   import Scan_Progress
+from timing       import Timing, Retransmit_Timer
+from telemetry    import METRICS
+
+
+class Syn_Scan:
+
+    RATE = 20000
+    POLL = 0.05
+
+    def __init__(self, space:Target_Space, progress:Scan_Progress, arg_flags:dict) -> None:
+        self._space:Target_Space     = space
+        self._progress:Scan_Progress = progress
+        self._arg_flags:dict         = arg_flags
+        self._src_ip:str             = current_transport()._route_source_ip(int_to_ip(space._host(0)))
+        self._src_port:int           = random.randint(10000, 65535)
+        self._answered:bytearray     = progress._done
+        self._previous_replies:int   = progress._done_count()
+        self._replies:int            = 0
+        self._sent_marks             = collections.deque()
+        self._stream                 = Result_Stream(progress._table)
+        self._rate_limiter           = Rate_Limiter(arg_flags.get('rate') or self.RATE)
+        self._timing                 = Timing(arg_flags.get('timeout'), arg_flags.get('retries'))
+        self._timer                  = Retransmit_Timer()
+        self._stop                   = threading.Event()
+        self._receiver:Tcp_Receiver  = None
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        return False
+
+
+    def _perform_syn_scan(self) -> Result_Stream:
+        return self._stream._produce(self._scan)
+
+
+    def _scan(self) -> None:
+        self._receiver = Tcp_Receiver(self._space, self._src_port, self._answered, self._record, self._stop)
+        self._receiver._start()
+        self._progress._settle(self._progress._order._position)
+        METRICS._watch('pending', self._timer.__len__)
+        try:     self._transmit()
+        finally: METRICS._unwatch('pending', self._timer.__len__)
+        self._stop.set()
+        self._receiver._join()
+        self._progress._settle(self._progress._order._position)
+
+
+    # Called from the receiver thread as soon as a reply is classified
+    def _record(self, index:int, host:int, port:int, flags:int, ttl:int, window:int, sent_at:int|None) -> None:
+        self._replies   += 1
+        METRICS._replies += 1
+        rtt = (self._timestamp() - sent_at & 0xffffffff) / 1e6 if sent_at is not None else 0.0
+        self._timing._observe(host, rtt)
+        self._progress._complete_probe(index, lambda: self._stream._put(host, port, flags, ttl, window, rtt))
+
+
+    # Probes carry their send time in microseconds as the sequence number, the reply acknowledges it plus one
+    @staticmethod
+    def _timestamp() -> int:
+        return time.monotonic_ns() // 1000 & 0xffffffff
+
+
+    def _is_answered(self, index:int) -> bool:
+        return self._answered[index >> 3] & (1 << (index & 7))
+
+
+    # TRANSMISSION -------------------------------------------------------------------------------------------
+
+    # Every probe is scheduled with the timeout of its target when rendered, the transmission ends once
+    # nothing is left waiting for a reply
+    def _transmit(self) -> None:
+        template = Tcp_Template(int_to_ip(self._space._host(0)), self._src_ip, self._src_port)
+        arena    = Packet_Arena(Raw_Transmitter.BATCH_SIZE)
+        with METRICS._phase('build'), Raw_Transmitter(rate_limiter=self._rate_limiter) as transmitter:
+            batch = list()
+            for probe in self._schedule(self._progress._probes(track=False)):
+                if probe is None:
+                    self._send_batch(transmitter, batch)
+                    batch = list()
+                    continue
+                index, attempt = probe
+                host, port     = self._space._probe(index)
+                packet         = template._render(arena._slot(len(batch)), port, random.getrandbits(16), dst_ip=host,
+                                                  seq=self._timestamp())
+                batch.append((packet, int_to_ip(host)))
+                self._timer._schedule(time.monotonic() + self._timing._timeout(host, attempt), index, attempt)
+                if len(batch) == len(arena):
+                    self._send_batch(transmitter, batch)
+                    batch = list()
+            self._send_batch(transmitter, batch)
+
+
+    def _send_batch(self, transmitter:Raw_Transmitter, batch:list) -> None:
+        transmitter._send_batch(batch)
+        self._rate_limiter._observe(transmitter._sent, self._replies)
+        self._mark_sent()
+
+
+    # New probes interleaved with the retransmissions that fell due, then the retransmissions alone.
+    # None asks the caller to flush its batch before waiting for the next deadline
+    def _schedule(self, probes):
+        for index in probes:
+            yield from self._due_retransmissions()
+            yield index, 0
+        while self._timer and self._previous_replies + self._replies < len(self._space):
+            yield None
+            with METRICS._phase('wait'):
+                time.sleep(min(self.POLL, max(0.0, self._timer._next_deadline() - time.monotonic())))
+            yield from self._due_retransmissions()
+
+
+    # A probe out of attempts is done and, with --show, reported as filtered
+    def _due_retransmissions(self):
+        for index, attempt in self._timer._expired(time.monotonic()):
+            if self._is_answered(index): continue
+            if attempt < self._timing._retries:
+                METRICS._retransmits += 1
+                yield index, attempt + 1
+                continue
+            METRICS._timeouts += 1
+            self._progress._complete_probe(index, self._filtered_publisher(index))
+
+
+    def _filtered_publisher(self, index:int):
+        if not self._arg_flags.get('show'): return None
+        host, port = self._space._probe(index)
+        return lambda: self._stream._put(host, port, 0)
+
+
+    # Everything sent before a mark older than the longest probe lifetime has had its chance to answer
+    def _mark_sent(self) -> None:
+        now = time.monotonic()
+        self._sent_marks.append((now, self._progress._order._position))
+        while self._sent_marks[0][0] < now - self._timing._lifetime():
+            self._progress._settle(self._sent_marks.popleft()[1])
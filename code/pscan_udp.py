@@ -0,0 +1,206 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import collections, socket, threading, random, time
+from packets      import Udp_Template, Packet_Arena, ICMP_UNREACHABLE
+from ports        import UDP_PAYLOADS, udp_payload
+from transport    import current_transport
+from targets      import Target_Space, int_to_ip
+from pkt_sending  import Raw_Transmitter
+from rate_control import Rate_Limiter, Icmp_Pacer
+from receivers    import Udp_Receiver, Udp_Unreachable_Receiver
+from results      import Result_Stream
+from checkpoint   import Scan_Progress
+from timing       import Timing, Retransmit_Timer
+from telemetry    import METRICS
+
+
+class Udp_Scan:
+
+    RATE    = 5000
+    POLL    = 0.05
+    BUDGET  = 30.0    # Seconds of paced retransmissions a rate-limiting target gets, what stays silent is open|filtered
+
+    def __init__(self, space:Target_Space, progress:Scan_Progress, arg_flags:dict) -> None:
+        self._space:Target_Space     = space
+        self._progress:Scan_Progress = progress
+        self._arg_flags:dict         = arg_flags
+        self._src_ip:str             = current_transport()._route_source_ip(int_to_ip(space._host(0)))
+        self._port_sock              = self._reserve_port()
+        self._src_port:int           = self._port_sock.getsockname()[1]
+        self._answered:bytearray     = progress._done
+        self._previous_replies:int   = progress._done_count()
+        self._replies:int            = 0
+        self._attempts:dict          = dict()    # Attempt and send time of every probe waiting for an answer
+        self._pacers:dict            = dict()    # Targets that sent destination unreachable messages
+        self._paced:set              = set()     # Pacers holding retransmissions
+        self._sent_marks             = collections.deque()
+        self._stream                 = Result_Stream(progress._table)
+        self._rate_limiter           = Rate_Limiter(arg_flags.get('rate') or self.RATE)
+        self._timing                 = Timing(arg_flags.get('timeout'), arg_flags.get('retries'))
+        self._timer                  = Retransmit_Timer()
+        self._stop                   = threading.Event()
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._port_sock.close()
+        return False
+
+
+    # Holding the source port keeps the kernel from answering the replies with port unreachable messages
+    @staticmethod
+    def _reserve_port() -> socket.socket:
+        sock = current_transport()._socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1)
+        sock.bind(('', 0))
+        return sock
+
+
+    def _perform_udp_scan(self) -> Result_Stream:
+        return self._stream._produce(self._scan)
+
+
+    def _scan(self) -> None:
+        receivers = [receiver(self._space, self._src_port, self._answered, self._record, self._stop)
+                     for receiver in (Udp_Receiver, Udp_Unreachable_Receiver)]
+        for receiver in receivers: receiver._start()
+        self._progress._settle(self._progress._order._position)
+        METRICS._watch('pending', self._timer.__len__)
+        try:     self._transmit()
+        finally: METRICS._unwatch('pending', self._timer.__len__)
+        self._stop.set()
+        for receiver in receivers: receiver._join()
+        self._progress._settle(self._progress._order._position)
+
+
+    # Called from both receiver threads as soon as a reply is classified. Replies to retransmissions are not timed,
+    # they may answer an earlier attempt
+    def _record(self, index:int, host:int, port:int, flags:int, ttl:int, window:int, _) -> None:
+        now              = time.monotonic()
+        attempt, sent_at = self._attempts.pop(index, (0, None))
+        rtt              = now - sent_at if sent_at is not None else 0.0
+        if attempt == 0: self._timing._observe(host, rtt)
+        if flags & ICMP_UNREACHABLE: self._pacer(host)._observe(now, attempt > 0)
+        self._replies   += 1
+        METRICS._replies += 1
+        self._progress._complete_probe(index, lambda: self._stream._put(host, port, flags, ttl, window, rtt))
+
+
+    def _pacer(self, host:int) -> Icmp_Pacer:
+        pacer = self._pacers.get(host)
+        if pacer is None: pacer = self._pacers.setdefault(host, Icmp_Pacer())
+        return pacer
+
+
+    def _is_answered(self, index:int) -> bool:
+        return self._answered[index >> 3] & (1 << (index & 7))
+
+
+    # TRANSMISSION -------------------------------------------------------------------------------------------
+
+    def _transmit(self) -> None:
+        template = Udp_Template(self._src_ip, self._src_port)
+        arena    = Packet_Arena(Raw_Transmitter.BATCH_SIZE, Udp_Template.HEADER + max(map(len, UDP_PAYLOADS.values())))
+        with METRICS._phase('build'), Raw_Transmitter(rate_limiter=self._rate_limiter) as transmitter:
+            batch = list()
+            for probe in self._schedule(self._progress._probes(track=False)):
+                if probe is None:
+                    self._send_batch(transmitter, batch)
+                    batch = list()
+                    continue
+                index, attempt = probe
+                host, port     = self._space._probe(index)
+                packet         = template._render(arena._slot(len(batch)), host, port, udp_payload(port), random.getrandbits(16))
+                batch.append((packet, int_to_ip(host)))
+                now = time.monotonic()
+                self._attempts[index] = (attempt, now)
+                self._timer._schedule(now + self._timing._timeout(host, attempt), index, attempt)
+                if len(batch) == len(arena):
+                    self._send_batch(transmitter, batch)
+                    batch = list()
+            self._send_batch(transmitter, batch)
+
+
+    # The reply ratio is not fed to the rate limiter: closed ports of a rate-limiting target go silent whatever
+    # the scan rate, backing off would only slow the scan down
+    def _send_batch(self, transmitter:Raw_Transmitter, batch:list) -> None:
+        transmitter._send_batch(batch)
+        self._mark_sent()
+
+
+    def _schedule(self, probes):
+        for index in probes:
+            yield from self._due_retransmissions()
+            yield index, 0
+        while (self._timer or self._paced) and self._previous_replies + self._replies < len(self._space):
+            yield None
+            with METRICS._phase('wait'):
+                time.sleep(self._idle_time())
+            yield from self._due_retransmissions()
+
+
+    def _idle_time(self) -> float:
+        wakes = [pacer._next_send for pacer in self._paced]
+        if self._timer: wakes.append(self._timer._next_deadline())
+        return min(self.POLL, max(0.0, min(wakes) - time.monotonic()))
+
+
+    # Retransmissions to a target that rate-limits its unreachable messages are spaced at the rate it answers,
+    # new probes to the other targets go on meanwhile. Its silence says nothing about the port, so only the
+    # budget of the target bounds them, the retries count the probes to the other targets
+    def _due_retransmissions(self):
+        now = time.monotonic()
+        for index, attempt in self._timer._expired(now):
+            if self._is_answered(index): continue
+            pacer   = self._pacers.get(self._space._probe(index)[0])
+            limited = pacer is not None and pacer._is_limited()
+            if self._is_out_of_budget(pacer, now) if limited else attempt >= self._timing._retries:
+                self._give_up(index)
+            elif limited:
+                pacer._queue.append((index, attempt + 1))
+                self._paced.add(pacer)
+            else:
+                METRICS._retransmits += 1
+                yield index, attempt + 1
+        if self._paced: yield from self._paced_retransmissions(now)
+
+
+    def _paced_retransmissions(self, now:float):
+        for pacer in list(self._paced):
+            if self._is_out_of_budget(pacer, now):
+                while pacer._queue: self._give_up(pacer._queue.popleft()[0])
+            probe = pacer._next(now)
+            if not pacer._queue: self._paced.discard(pacer)
+            if probe is not None and not self._is_answered(probe[0]):
+                METRICS._retransmits += 1
+                yield probe
+
+
+    def _is_out_of_budget(self, pacer:Icmp_Pacer, now:float) -> bool:
+        return pacer._is_limited() and now >= pacer._limited_since + self.BUDGET
+
+
+    # Silence is all a UDP port that is open or filtered gives, with --show it is reported as such
+    def _give_up(self, index:int) -> None:
+        METRICS._timeouts += 1
+        self._attempts.pop(index, None)
+        publish = None
+        if self._arg_flags.get('show'):
+            host, port = self._space._probe(index)
+            publish    = lambda: self._stream._put(host, port, 0)
+        self._progress._complete_probe(index, publish)
+
+
+    # Everything sent before a mark older than the longest probe lifetime has had its chance to answer
+    def _mark_sent(self) -> None:
+        now = time.monotonic()
+        self._sent_marks.append((now, self._progress._order._position))
+        while self._sent_marks[0][0] < now - self._timing._lifetime() - self.BUDGET:
+            self._progress._settle(self._sent_marks.popleft()[1])
@@ -0,0 +1,134 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import collections, time
+from telemetry import METRICS
+
+
+class Rate_Limiter:
+
+    WINDOW     = 0.5   # Seconds between reply-ratio evaluations
+    MIN_SAMPLE = 50    # Probes needed in a window before the ratio is trusted
+    RATIO_DROP = 0.5   # Back off when the ratio falls below half of the best one seen
+    DECREASE   = 0.5
+    INCREASE   = 0.05  # Additive recovery, as a fraction of the target rate
+
+    def __init__(self, rate:float, burst:int=None, min_rate:float=None) -> None:
+        self._target_rate:float  = float(rate)
+        self._rate:float         = float(rate)
+        self._min_rate:float     = min_rate or min(1.0, self._target_rate)
+        self._burst:int          = burst or max(1, int(rate / 100))
+        self._tokens:float       = self._burst
+        self._last:float         = time.monotonic()
+        self._window_start       = self._last
+        self._window_sent:int    = 0
+        self._window_replies:int = 0
+        self._best_ratio:float   = 0.0
+        self._congested_at:float = float('-inf')
+
+
+    # TOKEN BUCKET -------------------------------------------------------------------------------------------
+
+    def _acquire(self, count:int=1) -> None:
+        self._refill()
+        self._tokens -= count
+        if self._tokens < 0:
+            with METRICS._phase('wait'):
+                time.sleep(-self._tokens / self._rate)
+
+
+    def _refill(self) -> None:
+        now          = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._last) * self._rate)
+        self._last   = now
+
+
+    def _interval(self) -> float:
+        return 1 / self._rate
+
+
+    # Packets sent at once, never more than a second's worth at the current rate so a chunk cannot stall the scan
+    def _burst_size(self) -> int:
+        return max(1, min(self._burst, int(self._rate)))
+
+
+    # ADAPTATION ---------------------------------------------------------------------------------------------
+
+    # A stall of the send buffer is reported on every retry, the rate only backs off once per window
+    def _report_congestion(self) -> None:
+        now = time.monotonic()
+        if now - self._congested_at < self.WINDOW: return
+        self._congested_at = now
+        self._decrease()
+
+
+    def _observe(self, sent:int, replies:int) -> None:
+        now = time.monotonic()
+        if now - self._window_start < self.WINDOW: return
+        window_sent, window_replies = sent - self._window_sent, replies - self._window_replies
+        self._window_start, self._window_sent, self._window_replies = now, sent, replies
+        if window_sent < self.MIN_SAMPLE: return
+        ratio = window_replies / window_sent
+        if ratio < self._best_ratio * self.RATIO_DROP: self._decrease()
+        else:                                          self._increase()
+        self._best_ratio = max(ratio, self._best_ratio)
+
+
+    def _decrease(self) -> None:
+        self._rate = max(self._min_rate, self._rate * self.DECREASE)
+
+
+    def _increase(self) -> None:
+        self._rate = min(self._target_rate, self._rate + self._target_rate * self.INCREASE)
+
+
+
+# Destination unreachable messages of one target. Most stacks only send a few per second after a short burst,
+# which shows when a retransmission draws a message its first probe did not
+class Icmp_Pacer:
+
+    MIN_RATE = 1.0    # Retransmissions per second to a target that answers hardly at all
+    WINDOW   = 1.0    # Seconds between rate evaluations
+    ANSWERED = 0.9    # Share of the retransmissions of a window that must be answered for the rate to double
+
+    __slots__ = ('_limited_since', '_rate', '_window_start', '_window_sent', '_window_messages', '_next_send', '_queue')
+
+    def __init__(self) -> None:
+        self._limited_since:float = None
+        self._rate:float          = self.MIN_RATE
+        self._window_start:float  = 0.0
+        self._window_sent:int     = 0
+        self._window_messages:int = 0
+        self._next_send:float     = 0.0
+        self._queue               = collections.deque()    # Retransmissions waiting for the target to answer again
+
+
+    # Called from the receiver threads
+    def _observe(self, now:float, retransmitted:bool) -> None:
+        if retransmitted and self._limited_since is None: self._limited_since = now
+        self._window_messages += 1
+
+
+    def _is_limited(self) -> bool:
+        return self._limited_since is not None
+
+
+    def _next(self, now:float) -> tuple[int, int]|None:
+        self._adapt(now)
+        if not self._queue or now < self._next_send: return None
+        self._next_send    = now + 1 / self._rate
+        self._window_sent += 1
+        return self._queue.popleft()
+
+
+    # The rate doubles while the target answers the retransmissions and falls back to the rate it answered at
+    # once it stops keeping up
+    def _adapt(self, now:float) -> None:
+        elapsed = now - self._window_start
+        if elapsed < self.WINDOW: return
+        if self._window_sent and self._window_messages >= self._window_sent * self.ANSWERED: self._rate *= 2
+        elif self._window_sent: self._rate = max(self.MIN_RATE, self._window_messages / elapsed)
+        self._window_start, self._window_sent, self._window_messages = now, 0, 0
@@ -0,0 +1,216 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import abc, ctypes, socket, struct, threading, time
+from packets   import parse_tcp_reply, parse_udp_reply, parse_udp_unreachable, parse_icmp_reply, parse_arp_reply
+from packets   import ETH_P_ARP, TCP_ACK, UDP_REPLY, ICMP_UNREACHABLE
+from targets   import Target_Space
+from telemetry import METRICS, Socket_Stats
+from transport import current_transport
+
+
+SO_RCVBUFFORCE   = getattr(socket, 'SO_RCVBUFFORCE', 33)
+SO_ATTACH_FILTER = getattr(socket, 'SO_ATTACH_FILTER', 26)
+
+
+class Raw_Receiver(abc.ABC):
+
+    RECEIVE_BUFFER = 32 * 1024 * 1024
+
+    def __init__(self, stop:threading.Event) -> None:
+        self._stop   = stop
+        self._thread = threading.Thread(target=self._receive, daemon=True)
+        self._sock   = self._create_socket()
+        self._stats  = Socket_Stats(self._sock)
+        self._set_receive_buffer(self.RECEIVE_BUFFER)
+        self._sock.settimeout(0.1)
+
+
+    @abc.abstractmethod
+    def _create_socket(self) -> socket.socket: ...
+
+
+    def _set_receive_buffer(self, size:int) -> None:
+        try:   self._sock.setsockopt(socket.SOL_SOCKET, SO_RCVBUFFORCE, size)
+        except PermissionError: self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+
+
+    def _start(self) -> None:
+        METRICS._watch('socket_drops', self._stats._read_drops)
+        METRICS._watch('socket', self._stats._read_queued)
+        self._thread.start()
+
+
+    # The drops counted by the kernel are kept before the socket is closed
+    def _join(self) -> None:
+        self._thread.join()
+        METRICS._unwatch('socket_drops', self._stats._read_drops)
+        METRICS._unwatch('socket', self._stats._read_queued)
+        METRICS._drops += self._stats._read_drops()
+        self._sock.close()
+
+
+    # Only the time spent on the packets counts towards the receive phase, not the wait for them
+    def _receive(self) -> None:
+        while not self._stop.is_set():
+            try:   data = self._sock.recv(65535)
+            except socket.timeout: continue
+            start = time.perf_counter()
+            self._match_reply(data)
+            METRICS._received += 1
+            METRICS._add_time('receive', time.perf_counter() - start)
+
+
+    @abc.abstractmethod
+    def _match_reply(self, data:bytes) -> None: ...
+
+
+
+class Tcp_Receiver(Raw_Receiver):
+
+    def __init__(self, space:Target_Space, src_port:int, answered:bytearray, emit, stop:threading.Event) -> None:
+        self._space:Target_Space = space
+        self._src_port:int       = src_port
+        self._answered:bytearray = answered
+        self._emit               = emit
+        super().__init__(stop)
+        self._attach_port_filter()
+
+
+    def _create_socket(self) -> socket.socket:
+        return current_transport()._socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+
+
+    # The kernel drops the replies meant for other scans, parallel workers included, before they are queued here
+    def _attach_port_filter(self) -> None:
+        program, instructions = destination_port_filter(self._src_port)
+        try:   self._sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, program)
+        except OSError: pass
+
+
+    def _match_reply(self, data:bytes) -> None:
+        reply = parse_tcp_reply(data)
+        if reply is None: return
+        src_ip, src_port, dst_port, flags, ack, ttl, window = reply
+        if dst_port != self._src_port or src_port == self._src_port: return
+        address = int.from_bytes(src_ip, 'big')
+        index   = self._space._index(address, src_port)
+        if index is None or self._answered[index >> 3] & (1 << (index & 7)): return
+        self._emit(index, address, src_port, flags, ttl, window, ack - 1 if flags & TCP_ACK else None)
+
+
+
+# The UDP header starts with the ports like the TCP one, so the same port filter applies
+class Udp_Receiver(Tcp_Receiver):
+
+    def _create_socket(self) -> socket.socket:
+        return current_transport()._socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_UDP)
+
+
+    def _match_reply(self, data:bytes) -> None:
+        reply = parse_udp_reply(data)
+        if reply is None: return
+        src_ip, src_port, dst_port, ttl = reply
+        if dst_port != self._src_port or src_port == self._src_port: return
+        self._emit_probe(int.from_bytes(src_ip, 'big'), src_port, UDP_REPLY, ttl)
+
+
+    def _emit_probe(self, address:int, port:int, flags:int, ttl:int) -> None:
+        index = self._space._index(address, port)
+        if index is None or self._answered[index >> 3] & (1 << (index & 7)): return
+        self._emit(index, address, port, flags, ttl, 0, None)
+
+
+
+# Port unreachable messages tell closed UDP ports, the other codes a filter on the way
+class Udp_Unreachable_Receiver(Udp_Receiver):
+
+    def _create_socket(self) -> socket.socket:
+        return current_transport()._socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+
+
+    def _attach_port_filter(self) -> None:
+        pass
+
+
+    def _match_reply(self, data:bytes) -> None:
+        reply = parse_udp_unreachable(data)
+        if reply is None: return
+        dst_ip, src_port, dst_port, code, ttl = reply
+        if src_port != self._src_port: return
+        self._emit_probe(int.from_bytes(dst_ip, 'big'), dst_port, ICMP_UNREACHABLE | code, ttl)
+
+
+
+# Every raw ICMP socket gets a copy of the replies, so the receiver has its own and leaves the sending one alone
+class Icmp_Receiver(Raw_Receiver):
+
+    def __init__(self, space:Target_Space, identifier:int, replies:dict, stop:threading.Event, observe=None) -> None:
+        self._space:Target_Space = space
+        self._identifier:int     = identifier
+        self._replies:dict       = replies
+        self._observe            = observe
+        super().__init__(stop)
+
+
+    def _create_socket(self) -> socket.socket:
+        return current_transport()._socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+
+
+    def _match_reply(self, data:bytes) -> None:
+        reply = parse_icmp_reply(data)
+        if reply is None: return
+        src_ip, icmp_type, _, identifier, sequence = reply
+        if icmp_type != 0 or identifier != self._identifier: return
+        address = int.from_bytes(src_ip, 'big')
+        if address not in self._replies and self._space._contains(address):
+            self._replies[address] = sequence
+            if self._observe: self._observe(address, sequence)
+
+
+
+class Arp_Receiver(Raw_Receiver):
+
+    def __init__(self, interface:str, first:int, count:int, replies:dict, stop:threading.Event, observe=None) -> None:
+        self._interface:str = interface
+        self._first:int     = first
+        self._count:int     = count
+        self._replies:dict  = replies
+        self._observe       = observe
+        super().__init__(stop)
+
+
+    def _create_socket(self) -> socket.socket:
+        sock = current_transport()._socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        sock.bind((self._interface, ETH_P_ARP))
+        return sock
+
+
+    def _match_reply(self, data:bytes) -> None:
+        reply = parse_arp_reply(data)
+        if reply is None: return
+        sender_ip, sender_mac = reply
+        address = int.from_bytes(sender_ip, 'big')
+        if self._first <= address < self._first + self._count and address not in self._replies:
+            self._replies[address] = sender_mac
+            if self._observe: self._observe(address)
+
+
+
+# FUNCTIONS ==================================================================================================
+
+# Classic BPF program accepting TCP segments sent to the given port. The instructions must stay alive until
+# the program is attached, so they are returned with it
+def destination_port_filter(port:int) -> tuple[bytes, ctypes.Array]:
+    program = (
+        (0xb1, 0, 0, 0),         # x = 4 * (ip[0] & 0x0f), the length of the IP header
+        (0x48, 0, 0, 2),         # a = the destination port of the TCP header
+        (0x15, 0, 1, port),
+        (0x06, 0, 0, 0xffff),    # Accept
+        (0x06, 0, 0, 0),         # Drop
+    )
+    instructions = ctypes.create_string_buffer(b''.join(struct.pack('HBBI', *instruction) for instruction in program))
+    return struct.pack('HL', len(program), ctypes.addressof(instructions)), instructions
@@ -0,0 +1,140 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import array, queue, threading
+from packets   import tcp_flags_to_str
+from targets   import int_to_ip
+from telemetry import METRICS
+
+
+class Result_Table:
+
+    RECYCLE = 65536    # Rows that are dropped at once when the table recycles the rows already read
+
+    def __init__(self) -> None:
+        self._hosts        = array.array('I')    # IPv4 address as an integer
+        self._ports        = array.array('H')
+        self._flags        = array.array('H')    # TCP flags of the reply, 0 when nothing answered
+        self._ttls         = array.array('B')
+        self._windows      = array.array('H')
+        self._rtts         = array.array('f')    # Seconds, 0 when unknown
+        self._base:int     = 0                   # Index of the first row still held
+        self._recycle:bool = True                # Rows are dropped once read, unless something needs all of them
+        self._lock         = threading.Lock()
+
+
+    # The RTT column is appended last, so every column holds at least this many rows even while a row is being added.
+    # Indexes are absolute, they stay valid when the rows before them are dropped
+    def __len__(self) -> int:
+        return self._base + len(self._rtts)
+
+
+    def __iter__(self):
+        for index in range(self._base, len(self)):
+            yield self._row(index)
+
+
+    def _append(self, host:int, port:int, flags:int, ttl:int=0, window:int=0, rtt:float=0.0) -> int:
+        self._hosts.append(host)
+        self._ports.append(port)
+        self._flags.append(flags)
+        self._ttls.append(ttl)
+        self._windows.append(window)
+        self._rtts.append(rtt)
+        return len(self) - 1
+
+
+    # Appends rows given as the raw bytes of each column, in the order of _columns()
+    def _extend(self, columns:tuple[bytes, ...]) -> range:
+        start = len(self)
+        for column, data in zip(self._columns(), columns):
+            column.frombytes(data)
+        return range(start, len(self))
+
+
+    def _row(self, index:int) -> tuple[str, int, str|None, int, int, float]:
+        index -= self._base
+        flags  = self._flags[index]
+        return (int_to_ip(self._hosts[index]), self._ports[index], tcp_flags_to_str(flags) if flags else None,
+                self._ttls[index], self._windows[index], self._rtts[index])
+
+
+    def _columns(self) -> tuple[array.array, ...]:
+        return self._hosts, self._ports, self._flags, self._ttls, self._windows, self._rtts
+
+
+    # Drops the rows before the end index in large chunks, so a long scan keeps only the rows not read yet
+    def _release(self, end:int) -> None:
+        if end - self._base < self.RECYCLE: return
+        with self._lock:
+            for column in self._columns():
+                del column[:end - self._base]
+            self._base = end
+
+
+    def _sort(self) -> None:
+        order = sorted(range(len(self._hosts)), key=lambda index: (self._hosts[index], self._ports[index]))
+        for column in self._columns():
+            column[:] = array.array(column.typecode, (column[index] for index in order))
+
+
+    def _where(self, flags:int) -> list[int]:
+        return [self._base + index for index, value in enumerate(self._flags) if value == flags]
+
+
+
+class Result_Stream:
+
+    _END = object()
+
+    def __init__(self, table:Result_Table=None) -> None:
+        self._table           = table if table is not None else Result_Table()
+        self._queue           = queue.SimpleQueue()
+        self._error:Exception = None
+        self._thread          = None
+
+
+    # The row is stored in the table and only its index travels through the queue. Indexes are queued in the
+    # order of the rows, so every row before a consumed one has been consumed too
+    def _put(self, host:int, port:int, flags:int, ttl:int=0, window:int=0, rtt:float=0.0) -> None:
+        with self._table._lock:
+            self._queue.put(self._table._append(host, port, flags, ttl, window, rtt))
+
+
+    def _put_rows(self, columns:tuple[bytes, ...]) -> None:
+        with self._table._lock:
+            for index in self._table._extend(columns):
+                self._queue.put(index)
+
+
+    def _fail(self, error:BaseException) -> None:
+        if self._error is None: self._error = error
+
+
+    def _close(self) -> None:
+        self._queue.put(self._END)
+
+
+    # The producer runs in the background so results can be consumed while probes are still being sent
+    def _produce(self, target) -> 'Result_Stream':
+        METRICS._watch('results', self._queue.qsize)
+        self._thread = threading.Thread(target=self._run_producer, args=(target,), daemon=True)
+        self._thread.start()
+        return self
+
+
+    def _run_producer(self, target) -> None:
+        try:     target()
+        except BaseException as error: self._fail(error)
+        finally: self._close()
+
+
+    def __iter__(self):
+        while (index := self._queue.get()) is not self._END:
+            yield self._table._row(index)
+            if self._table._recycle: self._table._release(index + 1)
+        METRICS._unwatch('results', self._queue.qsize)
+        if self._error is not None: raise self._error
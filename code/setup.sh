@@ -43,17 +43,39 @@ printf "\r${OK} Wrapper script created\n"
 # Define script source and target directories
 SCRIPTS_DIR=$(dirname "$(realpath "$0")")        # Directory containing the current script
 SOURCE_DIR=${SCRIPTS_DIR%/*}                     # Parent directory of the script's directory
-FILES=("arg_parser.py"                           # List of required Python scripts
+FILES=("agent.py"                                # List of required Python scripts
+       "arg_parser.py"
        "bgrab.py"
+       "bgrab_bulk.py"
+       "checkpoint.py"
+       "coordinator.py"
        "display.py"
+       "history.py"
        "main.py"
        "netmap.py"
+       "netmap_arp.py"
+       "netmap_ping.py"
        "network.py"
+       "output.py"
        "packets.py"
        "pkt_sending.py"
+       "ports.py"
        "pscan.py"
+       "pscan_connect.py"
        "pscan_decoy.py"
+       "pscan_delay.py"
        "pscan_normal.py"
+       "pscan_syn.py"
+       "pscan_udp.py"
+       "rate_control.py"
+       "receivers.py"
+       "results.py"
+       "simulation.py"
+       "targets.py"
+       "telemetry.py"
+       "timing.py"
+       "transport.py"
+       "workers.py"
        )
 
 
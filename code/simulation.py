@@ -0,0 +1,393 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import heapq, ipaddress, itertools, json, random, socket, struct, threading, time
+from packets   import create_tcp_packet, parse_tcp_reply, Ether, ARP, ETH_P_ARP, TCP_SYN_ACK, TCP_RST_ACK
+from ports     import Port_Set, parse_ports
+from transport import Kernel_Transport
+
+
+# What a host of the virtual network answers. Unset timings and losses are taken from the network:
+#   {"local": "10.0.0.1/24", "latency": 0.002, "jitter": 0.001, "loss": 0.0, "seed": 1,
+#    "hosts": {"10.0.0.0/24": {"tcp": "22,80", "udp": "53"}, "10.0.0.9": {"tcp": "1-1024", "rate": 100}}}
+class Host_Profile:
+
+    TTL    = 64
+    WINDOW = 64240
+
+    __slots__ = ('_tcp', '_udp', '_ping', '_filtered', '_latency', '_jitter', '_loss', '_rate', '_burst',
+                 '_icmp_rate', '_icmp_burst', '_ttl', '_window')
+
+    def __init__(self, spec:dict, defaults:dict) -> None:
+        self._tcp:Port_Set       = port_spec(spec.get('tcp'))
+        self._udp:Port_Set       = port_spec(spec.get('udp'))
+        self._ping:bool          = spec.get('ping', True)
+        self._filtered:bool      = spec.get('filtered', False)    # Closed ports stay silent instead of refusing
+        self._latency:float      = spec.get('latency', defaults.get('latency', 0.0))
+        self._jitter:float       = spec.get('jitter', defaults.get('jitter', 0.0))
+        self._loss:float         = spec.get('loss', defaults.get('loss', 0.0))
+        self._rate:float         = spec.get('rate')                  # Probes per second the host answers, the rest is dropped
+        self._burst:int          = spec.get('burst', 1 + int((self._rate or 0) / 10))
+        self._icmp_rate:float    = spec.get('icmp_rate')             # Destination unreachable messages per second
+        self._icmp_burst:int     = spec.get('icmp_burst', 6)
+        self._ttl:int            = spec.get('ttl', self.TTL)
+        self._window:int         = spec.get('window', self.WINDOW)
+
+
+
+class Token_Bucket:
+
+    __slots__ = ('_rate', '_burst', '_tokens', '_last')
+
+    def __init__(self, rate:float, burst:int, now:float) -> None:
+        self._rate:float   = rate
+        self._burst:int    = burst
+        self._tokens:float = burst
+        self._last:float   = now
+
+
+    def _take(self, now:float) -> bool:
+        self._tokens = min(self._burst, self._tokens + (now - self._last) * self._rate)
+        self._last   = now
+        if self._tokens < 1: return False
+        self._tokens -= 1
+        return True
+
+
+
+# Answers the probes in-process the way the hosts of the description would. Outcomes are drawn from a seeded
+# generator, replies reach the virtual sockets once their latency has passed
+class Virtual_Network:
+
+    INTERFACE       = 'sim0'
+    LOOKUP_CACHE    = 65536
+    EPHEMERAL_PORTS = (32768, 60999)
+
+    def __init__(self, spec:dict) -> None:
+        local                  = ipaddress.IPv4Interface(spec.get('local', '10.0.0.1/24'))
+        self._local_ip:str     = str(local.ip)
+        self._local_mask:str   = str(local.netmask)
+        self._local_net        = local.network
+        self._profiles:list    = self._load_profiles(spec.get('hosts', {}), spec)
+        self._lookups:dict     = dict()    # Address and its profile, None for addresses without a host
+        self._buckets:dict     = dict()    # Policers of the hosts, created on their first probe
+        self._random           = random.Random(spec.get('seed'))
+        self._lock             = threading.Lock()
+        self._sockets:dict     = dict()    # Protocol, or 'arp', and the sockets receiving it
+
+
+    # The most specific network wins, so single hosts can be carved out of a subnet
+    @staticmethod
+    def _load_profiles(hosts:dict, defaults:dict) -> list:
+        profiles = [(ipaddress.IPv4Network(network, strict=False), Host_Profile(spec, defaults)) for network, spec in hosts.items()]
+        profiles.sort(key=lambda item: item[0].prefixlen, reverse=True)
+        return [(int(network.network_address), int(network.netmask), profile) for network, profile in profiles]
+
+
+    def _profile(self, address:int) -> Host_Profile|None:
+        if address in self._lookups: return self._lookups[address]
+        if len(self._lookups) >= self.LOOKUP_CACHE: self._lookups.clear()
+        profile = next((profile for network, mask, profile in self._profiles if address & mask == network), None)
+        self._lookups[address] = profile
+        return profile
+
+
+    # SOCKETS ------------------------------------------------------------------------------------------------
+
+    def _register(self, channel, sock:'Virtual_Socket') -> None:
+        with self._lock:
+            self._sockets[channel] = (*self._sockets.get(channel, ()), sock)
+
+
+    def _unregister(self, channel, sock:'Virtual_Socket') -> None:
+        with self._lock:
+            self._sockets[channel] = tuple(other for other in self._sockets.get(channel, ()) if other is not sock)
+
+
+    # Every socket of the protocol gets a copy, like raw sockets do
+    def _post(self, channel, data:bytes, delay:float) -> None:
+        due = time.monotonic() + delay
+        for sock in self._sockets.get(channel, ()): sock._queue_packet(due, data)
+
+
+    def _deliver(self, packet:bytes) -> None:
+        if reply := self._respond(packet): self._post(*reply)
+
+
+    def _deliver_frame(self, frame:bytes) -> None:
+        if reply := self._respond_to_arp(frame): self._post('arp', *reply)
+
+
+    # REPLIES ------------------------------------------------------------------------------------------------
+
+    # Returns the protocol of the reply, the reply and its round-trip time, None when the probe goes unanswered
+    def _respond(self, packet:bytes) -> tuple[int, bytes, float]|None:
+        if len(packet) < 28: return None
+        address = int.from_bytes(packet[16:20], 'big')
+        with self._lock:
+            profile = self._profile(address)
+            if profile is None or not self._admits(profile, address): return None
+            match packet[9]:
+                case socket.IPPROTO_TCP:  reply = self._tcp_reply(profile, packet)
+                case socket.IPPROTO_UDP:  reply = self._udp_reply(profile, address, packet)
+                case socket.IPPROTO_ICMP: reply = self._echo_reply(profile, packet)
+                case _:                   reply = None
+            if reply is None: return None
+            protocol, message = reply
+            return protocol, ip_packet(packet[16:20], packet[12:16], protocol, message, profile._ttl), self._delay(profile)
+
+
+    def _admits(self, profile:Host_Profile, address:int) -> bool:
+        if profile._rate and not self._bucket(('rate', address), profile._rate, profile._burst)._take(time.monotonic()):
+            return False
+        return not profile._loss or self._random.random() >= profile._loss
+
+
+    def _ephemeral_port(self) -> int:
+        with self._lock:
+            return self._random.randint(*self.EPHEMERAL_PORTS)
+
+
+    def _bucket(self, key:tuple, rate:float, burst:int) -> Token_Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None: bucket = self._buckets[key] = Token_Bucket(rate, burst, time.monotonic())
+        return bucket
+
+
+    def _delay(self, profile:Host_Profile) -> float:
+        return profile._latency + (self._random.uniform(0, profile._jitter) if profile._jitter else 0.0)
+
+
+    # Only connection attempts are answered, open ports with a SYN-ACK and closed ones with a RST-ACK
+    def _tcp_reply(self, profile:Host_Profile, packet:bytes) -> tuple[int, bytes]|None:
+        ihl = (packet[0] & 0x0F) * 4
+        if len(packet) < ihl + 14 or packet[ihl + 13] & 0x12 != 0x02: return None
+        src_port, dst_port, seq = struct.unpack_from('!HHI', packet, ihl)
+        if dst_port in profile._tcp: flags, window = TCP_SYN_ACK, profile._window
+        elif profile._filtered:      return None
+        else:                        flags, window = TCP_RST_ACK, 0
+        segment = struct.pack('!HHIIBBHHH', dst_port, src_port, self._random.getrandbits(32), seq + 1 & 0xffffffff,
+                              0x50, flags, window, 0, 0)
+        return socket.IPPROTO_TCP, segment
+
+
+    # Open ports echo the payload, closed ones draw a port unreachable message while the host's ICMP rate allows
+    def _udp_reply(self, profile:Host_Profile, address:int, packet:bytes) -> tuple[int, bytes]|None:
+        ihl                = (packet[0] & 0x0F) * 4
+        src_port, dst_port = struct.unpack_from('!HH', packet, ihl)
+        if dst_port in profile._udp:
+            payload = packet[ihl + 8:]
+            return socket.IPPROTO_UDP, struct.pack('!HHHH', dst_port, src_port, 8 + len(payload), 0) + payload
+        if profile._filtered: return None
+        if profile._icmp_rate and not self._bucket(('icmp', address), profile._icmp_rate, profile._icmp_burst)._take(time.monotonic()):
+            return None
+        return socket.IPPROTO_ICMP, struct.pack('!BBHI', 3, 3, 0, 0) + packet[:ihl + 8]
+
+
+    @staticmethod
+    def _echo_reply(profile:Host_Profile, packet:bytes) -> tuple[int, bytes]|None:
+        ihl = (packet[0] & 0x0F) * 4
+        if not profile._ping or packet[ihl] != 8: return None
+        return socket.IPPROTO_ICMP, b'\x00\x00\x00\x00' + packet[ihl + 4:]
+
+
+    # Hosts of the local network answer the ARP requests for their addresses
+    def _respond_to_arp(self, frame:bytes) -> tuple[bytes, float]|None:
+        if len(frame) < 42 or struct.unpack_from('!HH', frame, 12) != (ETH_P_ARP, 1) or frame[21] != 1: return None
+        address = int.from_bytes(frame[38:42], 'big')
+        if ipaddress.IPv4Address(address) not in self._local_net: return None
+        with self._lock:
+            profile = self._profile(address)
+            if profile is None or not self._admits(profile, address): return None
+            delay = self._delay(profile)
+        mac   = virtual_mac(frame[38:42])
+        reply = Ether(frame[6:12], mac, ETH_P_ARP) + ARP(mac, socket.inet_ntoa(frame[38:42]), socket.inet_ntoa(frame[28:32]), operation=2)
+        return reply, delay
+
+
+
+# Stands in for the raw and packet sockets of the engines. It has no file descriptor, so the transmitters
+# fall back to sending packet by packet
+class Virtual_Socket:
+
+    QUEUE = 1 << 20    # Replies held before new ones are dropped, like a full receive buffer
+
+    def __init__(self, network:Virtual_Network, family:int, kind:int, protocol:int) -> None:
+        self.family:int                = family
+        self.type:int                  = kind
+        self.proto:int                 = protocol
+        self._network:Virtual_Network  = network
+        self._channel                  = self._receive_channel()
+        self._queue:list               = list()    # Due time, arrival order and packet
+        self._order                    = itertools.count()
+        self._ready                    = threading.Condition()
+        self._timeout:float|None       = None
+        self._drops:int                = 0
+        self._address:tuple            = (network._local_ip, 0)
+        if self._channel is not None: network._register(self._channel, self)
+
+
+    def _receive_channel(self):
+        if self.family == socket.AF_INET:
+            return self.proto if self.proto in (socket.IPPROTO_TCP, socket.IPPROTO_UDP, socket.IPPROTO_ICMP) else None
+        return 'arp' if self.proto == socket.htons(ETH_P_ARP) else None
+
+
+    def fileno(self) -> int:
+        return -1
+
+
+    def setsockopt(self, *options) -> None:
+        pass
+
+
+    def getsockopt(self, level:int, name:int, size:int=0) -> int|bytes:
+        return bytes(size) if size else 0
+
+
+    # Port 0 draws an ephemeral port, the address stays the one of the virtual interface
+    def bind(self, address:tuple) -> None:
+        self._address = (self._network._local_ip, address[1] or self._network._ephemeral_port())
+
+
+    def getsockname(self) -> tuple[str, int]:
+        return self._address
+
+
+    def settimeout(self, timeout:float|None) -> None:
+        self._timeout = timeout
+
+
+    def close(self) -> None:
+        if self._channel is not None: self._network._unregister(self._channel, self)
+
+
+    # ICMP sockets are given the message alone, the kernel would add the IP header
+    def sendto(self, packet, address:tuple) -> int:
+        data = bytes(packet)
+        if self.proto == socket.IPPROTO_ICMP:
+            data = ip_packet(socket.inet_aton(self._network._local_ip), socket.inet_aton(address[0]), socket.IPPROTO_ICMP,
+                             data, Host_Profile.TTL)
+        self._network._deliver(data)
+        return len(packet)
+
+
+    def send(self, frame) -> int:
+        self._network._deliver_frame(bytes(frame))
+        return len(frame)
+
+
+    def recv(self, size:int) -> bytes:
+        deadline = None if self._timeout is None else time.monotonic() + self._timeout
+        with self._ready:
+            while True:
+                now = time.monotonic()
+                if self._queue and self._queue[0][0] <= now: return heapq.heappop(self._queue)[2][:size]
+                wake = self._queue[0][0] if self._queue else None
+                if deadline is not None:
+                    if now >= deadline: raise socket.timeout('timed out')
+                    wake = deadline if wake is None else min(wake, deadline)
+                self._ready.wait(None if wake is None else wake - now)
+
+
+    def _queue_packet(self, due:float, data:bytes) -> None:
+        with self._ready:
+            if len(self._queue) >= self.QUEUE:
+                self._drops += 1
+                return
+            heapq.heappush(self._queue, (due, next(self._order), data))
+            self._ready.notify()
+
+
+
+class Simulated_Transport(Kernel_Transport):
+
+    def __init__(self, network:Virtual_Network) -> None:
+        self._network:Virtual_Network = network
+
+
+    def _socket(self, family:int, kind:int, protocol:int=0) -> Virtual_Socket:
+        return Virtual_Socket(self._network, family, kind, protocol)
+
+
+    def _default_interface(self) -> str:
+        return Virtual_Network.INTERFACE
+
+
+    def _ip_address(self, interface:str=None) -> str:
+        return self._network._local_ip
+
+
+    def _subnet_mask(self, interface:str=None) -> str:
+        return self._network._local_mask
+
+
+    def _mac_address(self, interface:str=None) -> str:
+        return virtual_mac(socket.inet_aton(self._network._local_ip)).hex(':')
+
+
+    def _route_source_ip(self, target_ip:str) -> str:
+        return self._network._local_ip
+
+
+    # The handshake takes the round-trip time of the reply, or the whole timeout when nothing answers
+    async def _connect(self, host:str, port:int, timeout:float) -> int:
+        import asyncio
+        reply = self._network._respond(bytes(create_tcp_packet(host, port, self._network._local_ip)))
+        if reply is None or reply[2] > timeout:
+            await asyncio.sleep(timeout)
+            return 0
+        await asyncio.sleep(reply[2])
+        return parse_tcp_reply(reply[1])[3]
+
+
+    def _exchange(self, packet, timeout:float):
+        from scapy.layers.inet import IP
+        packet.sent_time = time.time()
+        reply            = self._network._respond(bytes(packet))
+        if reply is None or reply[2] > timeout:
+            time.sleep(timeout)
+            return None
+        time.sleep(reply[2])
+        response      = IP(reply[1])
+        response.time = time.time()
+        return response
+
+
+    def _send_packet(self, packet) -> None:
+        self._network._deliver(bytes(packet))
+
+
+
+# FUNCTIONS ==================================================================================================
+
+def load_virtual_network(path:str) -> Virtual_Network:
+    try:
+        with open(path) as file:
+            spec = json.load(file)
+    except OSError as error:
+        raise ValueError(f'Cannot read the virtual network {path}: {error.strerror}')
+    except json.JSONDecodeError as error:
+        raise ValueError(f'Invalid virtual network {path}: {error}')
+    return Virtual_Network(spec)
+
+
+
+def port_spec(spec:str|int|list|None) -> Port_Set:
+    if spec is None or spec == '': return Port_Set([])
+    if isinstance(spec, list): spec = ','.join(map(str, spec))
+    return parse_ports(str(spec))
+
+
+
+def ip_packet(src_ip:bytes, dst_ip:bytes, protocol:int, payload:bytes, ttl:int) -> bytes:
+    return struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(payload), 0, 0, ttl, protocol, 0, src_ip, dst_ip) + payload
+
+
+
+# Locally administered MAC address carrying the IP address of the host
+def virtual_mac(ip:bytes) -> bytes:
+    return b'\x02\x00' + ip
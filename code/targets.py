@@ -0,0 +1,227 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import socket, ipaddress, bisect, random
+from ports import Port_Set
+
+
+class Target_Space:
+
+    def __init__(self, networks:list[ipaddress.IPv4Network], ports:Port_Set) -> None:
+        self._first_hosts:list = list()
+        self._offsets:list     = list()
+        self._counts:list      = list()
+        self._host_count:int   = 0
+        self._ports:Port_Set   = ports
+        self._add_networks(networks)
+
+
+    def __len__(self) -> int:
+        return self._host_count * len(self._ports)
+
+
+    def _add_networks(self, networks:list[ipaddress.IPv4Network]) -> None:
+        for network in networks:
+            first, count = host_bounds(network)
+            self._offsets.append(self._host_count)
+            self._first_hosts.append(first)
+            self._counts.append(count)
+            self._host_count += count
+
+
+    def _host(self, host_index:int) -> int:
+        network = bisect.bisect_right(self._offsets, host_index) - 1
+        return self._first_hosts[network] + host_index - self._offsets[network]
+
+
+    def _probe(self, index:int) -> tuple[int, int]:
+        host_index, port_index = index % self._host_count, index // self._host_count
+        return self._host(host_index), self._ports[port_index]
+
+
+    def _index(self, address:int, port:int) -> int|None:
+        port_index = self._ports._index(port)
+        if port_index is None: return None
+        for first, count, offset in zip(self._first_hosts, self._counts, self._offsets):
+            if first <= address < first + count: return port_index * self._host_count + offset + address - first
+        return None
+
+
+    def _hosts(self):
+        for first, count in zip(self._first_hosts, self._counts):
+            yield from range(first, first + count)
+
+
+    def _contains(self, address:int) -> bool:
+        for first, count in zip(self._first_hosts, self._counts):
+            if first <= address < first + count: return True
+        return False
+
+
+
+# PROBE ORDER ================================================================================================
+
+class Sequential_Order:
+
+    def __init__(self, size:int, shard:int=0, shards:int=1, position:int=0) -> None:
+        self._size:int     = size
+        self._shard:int    = shard
+        self._shards:int   = shards
+        self._position:int = position
+
+
+    def __iter__(self):
+        for index in range(self._shard + self._position * self._shards, self._size, self._shards):
+            self._position += 1
+            yield index
+
+
+
+class Cyclic_Permutation:
+
+    def __init__(self, size:int, seed:int=None, shard:int=0, shards:int=1, position:int=0) -> None:
+        self._size:int      = size
+        self._seed:int      = random.getrandbits(32) if seed is None else seed
+        self._shard:int     = shard
+        self._shards:int    = shards
+        self._position:int  = position
+        self._prime:int     = next_prime(size + 1)
+        self._generator:int = None
+        self._first:int     = None
+        self._choose_cycle()
+
+
+    def _choose_cycle(self) -> None:
+        rng             = random.Random(self._seed)
+        self._generator = primitive_root(self._prime, rng)
+        self._first     = rng.randrange(1, self._prime)
+
+
+    def __iter__(self):
+        prime, size = self._prime, self._size
+        step        = pow(self._generator, self._shards, prime)
+        cycle_index = self._shard + self._position * self._shards
+        element     = self._first * pow(self._generator, cycle_index, prime) % prime
+        while cycle_index < prime - 1:
+            self._position += 1
+            if element <= size: yield element - 1
+            element      = element * step % prime
+            cycle_index += self._shards
+
+
+
+# An explicit list of probe indices, used when only part of the space is worth probing
+class Listed_Order:
+
+    def __init__(self, size:int, indices:list[int], position:int=0) -> None:
+        self._size:int     = size
+        self._indices:list = indices
+        self._position:int = position
+
+
+    def __iter__(self):
+        while self._position < len(self._indices):
+            self._position += 1
+            yield self._indices[self._position - 1]
+
+
+
+# FUNCTIONS ==================================================================================================
+
+def parse_targets(spec:str) -> list[ipaddress.IPv4Network]:
+    networks = list()
+    for item in expand_target_list(spec):
+        if '/' in item: networks.append(ipaddress.IPv4Network(item, strict=False))
+        else:           networks.append(ipaddress.IPv4Network(socket.gethostbyname(item)))
+    if not networks: raise ValueError('No targets were given')
+    return networks
+
+
+
+def expand_target_list(spec:str) -> list[str]:
+    items = list()
+    for item in spec.split(','):
+        item = item.strip()
+        if item.startswith('@'):
+            with open(item[1:]) as file:
+                items.extend(line.strip() for line in file if line.strip() and not line.startswith('#'))
+        elif item:
+            items.append(item)
+    return items
+
+
+
+def host_bounds(network:ipaddress.IPv4Network) -> tuple[int, int]:
+    first = int(network.network_address)
+    if network.prefixlen >= 31: return first, network.num_addresses
+    return first + 1, network.num_addresses - 2
+
+
+
+def int_to_ip(address:int) -> str:
+    return socket.inet_ntoa(address.to_bytes(4, 'big'))
+
+
+
+def ip_to_int(address:str) -> int:
+    return int.from_bytes(socket.inet_aton(address), 'big')
+
+
+
+def parse_shard(spec:str|None) -> tuple[int, int]:
+    if not spec: return 0, 1
+    shard, shards = map(int, spec.split('/'))
+    if not 0 < shard <= shards: raise ValueError(f'Invalid shard: {spec}')
+    return shard - 1, shards
+
+
+
+def is_prime(number:int) -> bool:
+    if number < 2: return False
+    for prime in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37):
+        if number % prime == 0: return number == prime
+    d, r = number - 1, 0
+    while d % 2 == 0:
+        d, r = d // 2, r + 1
+    for base in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37):
+        x = pow(base, d, number)
+        if x in (1, number - 1): continue
+        for _ in range(r - 1):
+            x = x * x % number
+            if x == number - 1: break
+        else:
+            return False
+    return True
+
+
+
+def next_prime(number:int) -> int:
+    number = max(number, 2)
+    while not is_prime(number):
+        number += 1
+    return number
+
+
+
+def prime_factors(number:int) -> set[int]:
+    factors, divisor = set(), 2
+    while divisor * divisor <= number:
+        while number % divisor == 0:
+            factors.add(divisor)
+            number //= divisor
+        divisor += 1 if divisor == 2 else 2
+    if number > 1: factors.add(number)
+    return factors
+
+
+
+def primitive_root(prime:int, rng:random.Random) -> int:
+    if prime == 2: return 1
+    factors = prime_factors(prime - 1)
+    while True:
+        candidate = rng.randrange(2, prime)
+        if all(pow(candidate, (prime - 1) // factor, prime) != 1 for factor in factors):
+            return candidate
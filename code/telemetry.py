@@ -0,0 +1,294 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import bisect, os, socket, struct, sys, threading, time
+
+
+SOL_PACKET        = getattr(socket, 'SOL_PACKET', 263)
+PACKET_STATISTICS = 6
+
+
+# Counters are bumped without a lock from the engine threads. A lost increment only blurs a rate, a lock on
+# every packet would cost more than the counters themselves
+class Scan_Metrics:
+
+    COUNTERS = {
+        'sent':        'Packets sent, connection attempts for the connect engines',
+        'received':    'Packets read from the receive sockets',
+        'replies':     'Probes answered',
+        'retransmits': 'Probes sent again after their timeout',
+        'timeouts':    'Probes given up without an answer',
+        'congestion':  'Sends refused by the kernel for lack of buffer space',
+        'drops':       'Packets dropped by the kernel from full receive buffers',
+        'results':     'Results displayed or written',
+    }
+    PHASES   = ('targets', 'build', 'send', 'wait', 'receive', 'output')
+    BUCKETS  = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)    # RTT, seconds
+
+    def __init__(self) -> None:
+        self._gauges:dict = dict()    # Name and the functions whose values are added up for it
+        self._local       = threading.local()
+        self._reset()
+
+
+    def _reset(self) -> None:
+        for name in self.COUNTERS: setattr(self, f'_{name}', 0)
+        self._rtt_counts:list = [0] * (len(self.BUCKETS) + 1)
+        self._rtt_sum:float   = 0.0
+        self._phases:dict     = dict.fromkeys(self.PHASES, 0.0)
+
+
+    def _observe_rtt(self, rtt:float) -> None:
+        self._rtt_counts[bisect.bisect_left(self.BUCKETS, rtt)] += 1
+        self._rtt_sum += rtt
+
+
+    # Upper bound of the bucket holding the quantile, None before any reply was timed
+    def _rtt_quantile(self, quantile:float) -> float|None:
+        total, rank = sum(self._rtt_counts), 0
+        if not total: return None
+        for bound, count in zip((*self.BUCKETS, float('inf')), self._rtt_counts):
+            rank += count
+            if rank >= quantile * total: return bound
+
+
+    # PHASES -------------------------------------------------------------------------------------------------
+
+    # Phases nest, the time of an inner phase is taken off the one around it
+    def _phase(self, name:str) -> 'Phase_Timer':
+        return Phase_Timer(self, name)
+
+
+    def _add_time(self, name:str, seconds:float) -> None:
+        self._phases[name] += seconds
+
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None: stack = self._local.stack = list()
+        return stack
+
+
+    # GAUGES -------------------------------------------------------------------------------------------------
+
+    def _watch(self, name:str, read) -> None:
+        self._gauges.setdefault(name, list()).append(read)
+
+
+    def _unwatch(self, name:str, read) -> None:
+        readers = self._gauges.get(name, list())
+        if read in readers: readers.remove(read)
+
+
+    def _gauge(self, name:str) -> int:
+        return sum(read() for read in list(self._gauges.get(name, ())))
+
+
+    # Drops are counted by the kernel while a socket is open and added to the counter once it is closed
+    def _total(self, name:str) -> int:
+        return getattr(self, f'_{name}') + (self._gauge('socket_drops') if name == 'drops' else 0)
+
+
+    # PROCESSES ----------------------------------------------------------------------------------------------
+
+    # Worker processes and agents send what they counted to the process that reports it
+    def _snapshot(self) -> dict:
+        return {
+            'counters': {name: self._total(name) for name in self.COUNTERS},
+            'rtt':      (list(self._rtt_counts), self._rtt_sum),
+            'phases':   dict(self._phases),
+        }
+
+
+    def _take(self) -> dict:
+        snapshot = self._snapshot()
+        self._reset()
+        return snapshot
+
+
+    def _merge(self, snapshot:dict) -> None:
+        for name, value in snapshot['counters'].items():
+            setattr(self, f'_{name}', getattr(self, f'_{name}') + value)
+        counts, total = snapshot['rtt']
+        self._rtt_counts = [mine + theirs for mine, theirs in zip(self._rtt_counts, counts)]
+        self._rtt_sum   += total
+        for name, seconds in snapshot['phases'].items():
+            self._phases[name] += seconds
+
+
+
+class Phase_Timer:
+
+    __slots__ = ('_metrics', '_name', '_start')
+
+    def __init__(self, metrics:Scan_Metrics, name:str) -> None:
+        self._metrics:Scan_Metrics = metrics
+        self._name:str             = name
+        self._start:float          = 0.0
+
+
+    def __enter__(self):
+        self._metrics._stack().append(0.0)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self._start
+        stack   = self._metrics._stack()
+        nested  = stack.pop()
+        self._metrics._add_time(self._name, elapsed - nested)
+        if stack: stack[-1] += elapsed
+        return False
+
+
+
+METRICS = Scan_Metrics()
+
+
+
+# Kernel statistics of a receive socket: packets dropped from its full buffer and bytes waiting in it
+class Socket_Stats:
+
+    def __init__(self, sock:socket.socket) -> None:
+        self._sock       = sock
+        self._inode:str  = str(os.fstat(sock.fileno()).st_ino) if sock.fileno() >= 0 else None    # None for virtual sockets
+        self._is_packet  = sock.family == getattr(socket, 'AF_PACKET', None)
+        self._drops:int  = 0
+        self._queued:int = 0
+
+
+    def _read_drops(self) -> int:
+        if self._is_packet: self._read_packet_drops()
+        else:               self._read_proc('/proc/net/raw')
+        return self._drops
+
+
+    def _read_queued(self) -> int:
+        self._read_proc('/proc/net/packet' if self._is_packet else '/proc/net/raw')
+        return self._queued
+
+
+    # The packet statistics are reset by every read, so they are added up
+    def _read_packet_drops(self) -> None:
+        try:   self._drops += struct.unpack('II', self._sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))[1]
+        except OSError: pass
+
+
+    # The last values are kept once the socket is closed
+    def _read_proc(self, path:str) -> None:
+        try:
+            with open(path) as file:
+                for line in file:
+                    fields = line.split()
+                    if self._is_packet and fields[8] == self._inode:
+                        self._queued = int(fields[6])
+                    elif not self._is_packet and fields[9] == self._inode:
+                        self._queued, self._drops = int(fields[4].split(':')[1], 16), int(fields[-1])
+        except (OSError, IndexError, ValueError): pass
+
+
+
+# Shows the live status line on stderr, so it does not mix with the machine-readable output, and keeps the
+# metrics file up to date
+class Stats_Reporter:
+
+    INTERVAL = 1.0
+
+    def __init__(self, command:str, live:bool, path:str|None, metrics:Scan_Metrics=METRICS) -> None:
+        self._command:str          = command
+        self._live:bool            = live
+        self._path:str             = path
+        self._metrics:Scan_Metrics = metrics
+        self._start:float          = time.monotonic()
+        self._last:tuple           = (self._start, 0, 0)
+        self._stop                 = threading.Event()
+        self._thread               = threading.Thread(target=self._run, daemon=True)
+
+
+    def __enter__(self):
+        if self._live or self._path: self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._live and not self._path: return False
+        self._stop.set()
+        self._thread.join()
+        self._report()
+        if self._live: sys.stderr.write('\n')
+        return False
+
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.INTERVAL):
+            self._report()
+
+
+    def _report(self) -> None:
+        if self._live: self._show_status()
+        if self._path: self._export()
+
+
+    def _show_status(self) -> None:
+        metrics    = self._metrics
+        now        = time.monotonic()
+        last, sent, replies = self._last
+        elapsed    = max(now - last, 1e-9)
+        self._last = (now, metrics._sent, metrics._replies)
+        status     = (f'{now - self._start:7.1f}s | sent {metrics._sent:,} ({(metrics._sent - sent) / elapsed:,.0f}/s)'
+                      f' | replies {metrics._replies:,} ({(metrics._replies - replies) / elapsed:,.0f}/s)'
+                      f' | retransmits {metrics._retransmits:,} | timeouts {metrics._timeouts:,}'
+                      f' | drops {metrics._total("drops"):,}'
+                      f' | rtt p50 {format_seconds(metrics._rtt_quantile(0.5))} p99 {format_seconds(metrics._rtt_quantile(0.99))}'
+                      f' | queued {metrics._gauge("results"):,}')
+        sys.stderr.write(f'\r{status}\033[K')
+        sys.stderr.flush()
+
+
+    def _export(self) -> None:
+        temporary = self._path + '.tmp'
+        with open(temporary, 'w') as file:
+            file.write(prometheus_text(self._metrics, self._command, time.monotonic() - self._start))
+        os.replace(temporary, self._path)
+
+
+
+# FUNCTIONS ==================================================================================================
+
+def format_seconds(seconds:float|None) -> str:
+    if seconds is None:         return '-'
+    if seconds == float('inf'): return f'>{Scan_Metrics.BUCKETS[-1]:g}s'
+    if seconds < 1:             return f'{seconds * 1000:g}ms'
+    return f'{seconds:g}s'
+
+
+
+# Prometheus text exposition format, version 0.0.4
+def prometheus_text(metrics:Scan_Metrics, command:str, elapsed:float) -> str:
+    label = f'command="{command}"'
+    lines = ['# HELP netxplorer_elapsed_seconds Time since the command started',
+             '# TYPE netxplorer_elapsed_seconds gauge',
+             f'netxplorer_elapsed_seconds{{{label}}} {elapsed:.6f}']
+    for name, description in metrics.COUNTERS.items():
+        lines.extend((f'# HELP netxplorer_{name}_total {description}', f'# TYPE netxplorer_{name}_total counter',
+                      f'netxplorer_{name}_total{{{label}}} {metrics._total(name)}'))
+    lines.extend(('# HELP netxplorer_phase_seconds_total Time spent in each phase of the command',
+                  '# TYPE netxplorer_phase_seconds_total counter'))
+    lines.extend(f'netxplorer_phase_seconds_total{{{label},phase="{phase}"}} {seconds:.6f}'
+                 for phase, seconds in metrics._phases.items())
+    lines.extend(('# HELP netxplorer_queue_depth Results waiting to be displayed, probes waiting for a reply and bytes '
+                  'waiting in the receive sockets',
+                  '# TYPE netxplorer_queue_depth gauge'))
+    lines.extend(f'netxplorer_queue_depth{{{label},queue="{queue}"}} {metrics._gauge(queue)}'
+                 for queue in ('results', 'pending', 'socket'))
+    lines.extend(('# HELP netxplorer_rtt_seconds Round-trip time of the answered probes',
+                  '# TYPE netxplorer_rtt_seconds histogram'))
+    cumulative = 0
+    for bound, count in zip((*metrics.BUCKETS, '+Inf'), metrics._rtt_counts):
+        cumulative += count
+        lines.append(f'netxplorer_rtt_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+    lines.extend((f'netxplorer_rtt_seconds_sum{{{label}}} {metrics._rtt_sum:.6f}',
+                  f'netxplorer_rtt_seconds_count{{{label}}} {cumulative}'))
+    return '\n'.join(lines) + '\n'
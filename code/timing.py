@@ -0,0 +1,96 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import heapq
+from telemetry import METRICS
+
+
+class Rtt_Estimator:
+
+    ALPHA       = 0.125    # Gains of RFC 6298
+    BETA        = 0.25
+    GRANULARITY = 0.001
+
+    __slots__ = ('_srtt', '_rttvar')    # One estimator is kept per target
+
+    def __init__(self) -> None:
+        self._srtt:float   = None
+        self._rttvar:float = None
+
+
+    def _observe(self, rtt:float) -> None:
+        if self._srtt is None:
+            self._srtt, self._rttvar = rtt, rtt / 2
+            return
+        self._rttvar = (1 - self.BETA) * self._rttvar + self.BETA * abs(self._srtt - rtt)
+        self._srtt   = (1 - self.ALPHA) * self._srtt + self.ALPHA * rtt
+
+
+    def _timeout(self) -> float|None:
+        if self._srtt is None: return None
+        return self._srtt + max(self.GRANULARITY, 4 * self._rttvar)
+
+
+
+class Timing:
+
+    INITIAL     = 1.0    # Timeout used until a reply has been timed
+    MIN_TIMEOUT = 0.1
+    MAX_TIMEOUT = 3.0
+    RETRIES     = 2
+
+    def __init__(self, max_timeout:float=None, retries:int=None) -> None:
+        self._max_timeout:float     = max_timeout or self.MAX_TIMEOUT
+        self._retries:int           = self.RETRIES if retries is None else retries
+        self._targets:dict          = dict()
+        self._overall:Rtt_Estimator = Rtt_Estimator()
+
+
+    def _observe(self, target, rtt:float) -> None:
+        if rtt <= 0: return
+        METRICS._observe_rtt(rtt)
+        self._overall._observe(rtt)
+        estimator = self._targets.get(target)
+        if estimator is None: estimator = self._targets[target] = Rtt_Estimator()
+        estimator._observe(rtt)
+
+
+    # Targets that have not answered yet borrow the estimate of all targets, every retransmission doubles the wait
+    def _timeout(self, target=None, attempt:int=0) -> float:
+        estimator = self._targets.get(target, self._overall)
+        timeout   = estimator._timeout() or self._overall._timeout() or self.INITIAL
+        return min(self._max_timeout, max(self.MIN_TIMEOUT, timeout) * 2 ** attempt)
+
+
+    # Longest time a probe can stay unanswered before it is given up
+    def _lifetime(self) -> float:
+        return self._max_timeout * (self._retries + 1)
+
+
+
+# Deadlines of the probes waiting for a reply. Answered probes are not removed, they are skipped when they expire
+class Retransmit_Timer:
+
+    def __init__(self) -> None:
+        self._heap:list = list()
+
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+    def _schedule(self, deadline:float, index:int, attempt:int) -> None:
+        heapq.heappush(self._heap, (deadline, index, attempt))
+
+
+    def _next_deadline(self) -> float|None:
+        return self._heap[0][0] if self._heap else None
+
+
+    def _expired(self, now:float):
+        while self._heap and self._heap[0][0] <= now:
+            _, index, attempt = heapq.heappop(self._heap)
+            yield index, attempt
@@ -0,0 +1,99 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import socket, struct
+from network import get_default_iface, get_ip_address, get_subnet_mask, get_mac_from_iface, get_route_source_ip
+from packets import TCP_SYN_ACK, TCP_RST_ACK
+
+
+LINGER_RESET = struct.pack('ii', 1, 0)   # Close with RST so no TIME_WAIT is left behind
+
+
+# Everything the engines exchange with the network goes through the transport: the sockets they send and
+# receive raw packets on, TCP connections, Scapy exchanges and the addresses of the local interface
+class Kernel_Transport:
+
+    # SOCKETS ------------------------------------------------------------------------------------------------
+
+    def _socket(self, family:int, kind:int, protocol:int=0) -> socket.socket:
+        return socket.socket(family, kind, protocol)
+
+
+    # LOCAL NETWORK ------------------------------------------------------------------------------------------
+
+    def _default_interface(self) -> str:
+        return get_default_iface()
+
+
+    def _ip_address(self, interface:str=None) -> str|None:
+        return get_ip_address(interface)
+
+
+    def _subnet_mask(self, interface:str=None) -> str|None:
+        return get_subnet_mask(interface)
+
+
+    def _mac_address(self, interface:str=None) -> str|None:
+        return get_mac_from_iface(interface)
+
+
+    def _route_source_ip(self, target_ip:str) -> str:
+        return get_route_source_ip(target_ip)
+
+
+    # CONNECTIONS --------------------------------------------------------------------------------------------
+
+    # Returns the flags the handshake implies: SYN-ACK when it completed, RST-ACK when it was refused, 0 when
+    # nothing answered in time
+    async def _connect(self, host:str, port:int, timeout:float) -> int:
+        import asyncio    # Only the connect engine runs an event loop
+        loop = asyncio.get_running_loop()
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.setblocking(False)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, LINGER_RESET)
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, (host, port)), timeout)
+            except ConnectionRefusedError:
+                return TCP_RST_ACK
+            except (asyncio.TimeoutError, OSError):
+                return 0
+            return TCP_RST_ACK if sock.getsockname() == sock.getpeername() else TCP_SYN_ACK
+
+
+    # SCAPY --------------------------------------------------------------------------------------------------
+
+    def _exchange(self, packet, timeout:float):
+        from scapy.sendrecv import sr1
+        return sr1(packet, timeout=timeout, verbose=0)
+
+
+    def _send_packet(self, packet) -> None:
+        from scapy.sendrecv import send
+        send(packet, verbose=0)
+
+
+
+_transport:Kernel_Transport = Kernel_Transport()
+
+
+# FUNCTIONS ==================================================================================================
+
+def current_transport() -> Kernel_Transport:
+    return _transport
+
+
+
+def use_transport(transport:Kernel_Transport) -> None:
+    global _transport
+    _transport = transport
+
+
+
+# The simulated network is only loaded when a description of it is given
+def select_transport(simulate:str|None) -> None:
+    if not simulate: return
+    from simulation import Simulated_Transport, load_virtual_network
+    use_transport(Simulated_Transport(load_virtual_network(simulate)))
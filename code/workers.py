@@ -0,0 +1,142 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import mmap, multiprocessing, multiprocessing.connection, signal, sys
+from results    import Result_Stream, Result_Table
+from checkpoint import Scan_Progress
+from telemetry  import METRICS
+
+
+BATCH = 4096    # Rows sent at most in one message
+
+
+class Worker_Pool:
+
+    def __init__(self, workers:int, size:int=0) -> None:
+        self._workers:int    = workers
+        self._region:int     = (size + 7) // 8
+        self._memory         = mmap.mmap(-1, max(1, workers * self._region))    # Shared with the forked workers
+        self._context        = multiprocessing.get_context('fork')
+        self._processes:list = list()
+        self._readers:dict   = dict()
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for process in self._processes:
+            if process.is_alive(): process.terminate()
+        for process in self._processes:
+            process.join()
+        return False
+
+
+    # Every worker marks its probes in its own region of the shared memory, no byte is written by two processes
+    def _done(self, worker:int) -> memoryview:
+        return memoryview(self._memory)[worker * self._region:(worker + 1) * self._region]
+
+
+    def _merge_done(self, done:bytearray) -> None:
+        merged = int.from_bytes(done, 'little')
+        for worker in range(self._workers):
+            merged |= int.from_bytes(self._memory[worker * self._region:(worker + 1) * self._region], 'little')
+        done[:] = merged.to_bytes(len(done), 'little')
+
+
+    # PROCESSES ----------------------------------------------------------------------------------------------
+
+    # Workers are forked from the calling thread before any result thread exists
+    def _start(self, work) -> None:
+        sys.stdout.flush()
+        for worker in range(self._workers):
+            reader, writer = self._context.Pipe(duplex=False)
+            process        = self._context.Process(target=self._run_worker, args=(worker, writer, work), daemon=True)
+            process.start()
+            writer.close()
+            self._processes.append(process)
+            self._readers[reader] = worker
+
+
+    # The coordinator handles Ctrl+C and terminates the workers. The metrics inherited from it are reset,
+    # so only what the worker counted is added to them
+    @staticmethod
+    def _run_worker(worker:int, connection, work) -> None:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        METRICS._reset()
+        try:
+            work(worker, connection)
+            connection.send(('metrics', METRICS._take()))
+            connection.send(('done', None))
+        except BaseException as error:
+            connection.send(('error', f'Worker {worker}: {error}'))
+        finally:
+            connection.close()
+
+
+    def _collect(self, handle) -> None:
+        while self._readers:
+            for reader in multiprocessing.connection.wait(list(self._readers)):
+                try:   kind, payload = reader.recv()
+                except EOFError: raise RuntimeError(f'Worker {self._readers[reader]} exited unexpectedly')
+                match kind:
+                    case 'error':   raise RuntimeError(payload)
+                    case 'done':    del self._readers[reader]
+                    case 'metrics': METRICS._merge(payload)
+                    case _:         handle(payload)
+
+
+    # SCANS --------------------------------------------------------------------------------------------------
+
+    # create(worker, done) returns the engine of one shard and start(engine) its result stream. The rows reach
+    # the coordinator as packed column batches and are streamed from its table
+    def _stream(self, create, start, progress:Scan_Progress) -> Result_Stream:
+        self._start(lambda worker, connection: self._scan_shard(worker, connection, create, start))
+        stream = Result_Stream(progress._table)
+        return stream._produce(lambda: self._gather_rows(stream, progress))
+
+
+    def _scan_shard(self, worker:int, connection, create, start) -> None:
+        with create(worker, self._done(worker)) as ENGINE:
+            stream_rows(connection.send, start(ENGINE))
+
+
+    def _gather_rows(self, stream:Result_Stream, progress:Scan_Progress) -> None:
+        self._collect(stream._put_rows)
+        self._merge_done(progress._done)
+
+
+    # SWEEPS -------------------------------------------------------------------------------------------------
+
+    # task(worker) runs in the worker and returns a list, the lists of all workers are concatenated
+    def _gather(self, task) -> list:
+        results = list()
+        self._start(lambda worker, connection: connection.send(('result', task(worker))))
+        self._collect(results.extend)
+        return results
+
+
+
+# FUNCTIONS ==================================================================================================
+
+# Rows are sent as soon as the engine stops producing them for a moment, or once a batch is full. They are
+# dropped once sent, not once read
+def stream_rows(send, stream:Result_Stream) -> None:
+    sent                   = 0
+    stream._table._recycle = False
+    for _ in stream:
+        if stream._queue.empty() or len(stream._table) - sent >= BATCH:
+            sent = send_rows(send, stream._table, sent)
+            stream._table._release(sent)
+    send_rows(send, stream._table, sent)
+
+
+
+def send_rows(send, table:Result_Table, start:int) -> int:
+    end  = len(table)
+    rows = slice(start - table._base, end - table._base)
+    if end > start: send(('rows', tuple(column[rows].tobytes() for column in table._columns())))
+    return end
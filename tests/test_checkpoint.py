@@ -0,0 +1,94 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import sys, pytest
+from checkpoint import *
+from packets    import TCP_SYN_ACK, TCP_RST_ACK
+from results    import Result_Table
+from targets    import Cyclic_Permutation, int_to_ip
+
+
+def table_with_rows(count:int) -> Result_Table:
+    table = Result_Table()
+    for index in range(count):
+        table._append(0x0a000001 + index, 1 + index, TCP_SYN_ACK if index % 3 else TCP_RST_ACK, 64, 64240, index / 1000)
+    return table
+
+
+
+# FILE FORMAT ------------------------------------------------------------------------------------------------
+
+def test_checkpoint_round_trip(tmp_path):
+    path  = str(tmp_path / 'scan.ckpt')
+    table = table_with_rows(100)
+    meta  = {'seed': 42, 'position': 123, 'complete': False, 'byteorder': sys.byteorder}
+    done  = bytes(range(256)) * 4
+    save_checkpoint(path, meta, done, [5, 17, 2 ** 40], table, 90)
+    loaded_meta, loaded_done, outstanding, loaded_table = load_checkpoint(path)
+    assert loaded_meta == meta
+    assert loaded_done == done
+    assert outstanding == [5, 17, 2 ** 40]
+    assert list(loaded_table) == list(table)[:90]
+
+
+
+def test_checkpoint_from_the_other_byte_order(tmp_path):
+    path    = str(tmp_path / 'scan.ckpt')
+    table   = table_with_rows(10)
+    foreign = Result_Table()
+    for column, source in zip(foreign._columns(), table._columns()):
+        column.extend(source)
+        column.byteswap()
+    other   = 'big' if sys.byteorder == 'little' else 'little'
+    swapped = [int.from_bytes(index.to_bytes(8, sys.byteorder), other) for index in (5, 17)]
+    save_checkpoint(path, {'byteorder': other}, b'\x01', swapped, foreign, len(foreign))
+    _, _, outstanding, loaded_table = load_checkpoint(path)
+    assert outstanding == [5, 17]
+    assert list(loaded_table) == list(table)
+
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / 'scan.ckpt'
+    path.write_bytes(b'{"not": "a checkpoint"}')
+    with pytest.raises(ValueError): load_checkpoint(str(path))
+
+
+
+# RESUME -----------------------------------------------------------------------------------------------------
+
+def test_resumed_scan_probes_only_what_is_left(tmp_path):
+    path     = str(tmp_path / 'scan.ckpt')
+    progress = Scan_Progress(Cyclic_Permutation(500, seed=3))
+    probes   = progress._probes()
+    taken    = [next(probes) for _ in range(200)]
+    for index in taken[:150]:
+        progress._complete_probe(index, lambda index=index: progress._table._append(index, 80, TCP_SYN_ACK))
+    with pytest.raises(KeyboardInterrupt), Checkpoint_Writer(path, {'seed': 3}, progress):
+        raise KeyboardInterrupt
+    meta, done, outstanding, table = load_checkpoint(path)
+    assert not meta['complete']
+    assert outstanding == sorted(taken[150:])
+    assert sorted(row[0] for row in table) == sorted(map(int_to_ip, taken[:150]))
+    resumed   = Scan_Progress(Cyclic_Permutation(500, seed=meta['seed'], position=meta['position']), done, outstanding, table)
+    remaining = list(resumed._probes())
+    assert remaining[:50] == sorted(taken[150:])
+    assert sorted(taken[:150] + remaining) == list(range(500))
+
+
+
+def test_checkpointed_tables_keep_every_row(tmp_path):
+    progress = Scan_Progress(Cyclic_Permutation(10, seed=1))
+    with Checkpoint_Writer(str(tmp_path / 'scan.ckpt'), {}, progress):
+        assert not progress._table._recycle
+
+
+
+def test_a_probe_completes_once():
+    progress  = Scan_Progress(Cyclic_Permutation(10, seed=1))
+    published = list()
+    for _ in range(3): progress._complete_probe(4, lambda: published.append(4))
+    assert published == [4] and progress._done_count() == 1
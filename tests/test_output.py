@@ -0,0 +1,59 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import csv, json, os, sys
+from output import *
+
+
+PORTS   = [{'host': '10.0.0.1', 'port': 22, 'flags': 'SA', 'ttl': 64, 'window': 64240, 'rtt': 0.25},
+           {'host': '10.0.0.2', 'port': 65535, 'flags': None, 'ttl': 0, 'window': 0, 'rtt': 0.0},
+           {'host': '255.255.255.255', 'port': 0, 'flags': 'RA', 'ttl': 255, 'window': 65535, 'rtt': 1.5}]
+HOSTS   = [{'host': '10.0.0.1', 'mac': '02:00:0a:00:00:01'}, {'host': '10.0.0.2', 'mac': None}]
+BANNERS = [{'host': '10.0.0.1', 'port': 22, 'protocol': 'ssh', 'lines': ['SSH-2.0-OpenSSH_9.6', 'é ✓'],
+            'error': None},
+           {'host': '10.0.0.2', 'port': 80, 'protocol': 'http', 'lines': None, 'error': 'Connection refused'}]
+RECORDS = [(kind, record) for kind, records in (('port', PORTS), ('host', HOSTS), ('banner', BANNERS)) for record in records]
+
+
+def write_records(output_format:str, path:str, records:list) -> None:
+    with create_sink(output_format, path) as sink:
+        for kind, record in records: sink._write(kind, record)
+
+
+
+def test_binary_records_read_back(tmp_path):
+    path = str(tmp_path / 'scan.bin')
+    write_records('binary', path, RECORDS)
+    assert list(read_binary_records(path)) == RECORDS
+
+
+
+def test_jsonl_records_read_back(tmp_path):
+    path = str(tmp_path / 'scan.jsonl')
+    write_records('jsonl', path, RECORDS)
+    with open(path) as file:
+        assert [json.loads(line) for line in file] == [{'type': kind, **record} for kind, record in RECORDS]
+
+
+
+def test_csv_writes_a_header_and_one_row_per_record(tmp_path):
+    path = str(tmp_path / 'scan.csv')
+    write_records('csv', path, [('banner', record) for record in BANNERS])
+    with open(path, newline='') as file:
+        rows = list(csv.reader(file))
+    assert rows == [list(BANNERS[0]), ['10.0.0.1', '22', 'ssh', 'SSH-2.0-OpenSSH_9.6\né ✓', ''],
+                    ['10.0.0.2', '80', 'http', '', 'Connection refused']]
+
+
+
+def test_output_stops_quietly_when_the_reader_goes_away(monkeypatch):
+    read_end, write_end = os.pipe()
+    os.close(read_end)
+    with os.fdopen(write_end, 'w') as stdout:
+        monkeypatch.setattr(sys, 'stdout', stdout)
+        with create_sink('jsonl', None) as sink:
+            for _ in range(10000): sink._write('port', PORTS[0])
+        assert sink._closed
@@ -0,0 +1,148 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import random, socket, struct
+from packets import *
+
+
+SRC_IP   = '192.0.2.2'
+DST_IP   = '192.0.2.1'
+SRC_PORT = 40000
+EDGES    = (0, 1, 0x00ff, 0x7fff, 0x8000, 0xff00, 0xfffe, 0xffff)
+
+
+# Checksums of a rendered probe computed from scratch over the whole packet, the way its receiver checks them
+def full_tcp_checksums(packet) -> tuple[int, int]:
+    packet = bytearray(packet)
+    packet[10:12] = bytes(2)
+    packet[36:38] = bytes(2)
+    src_ip, dst_ip = socket.inet_ntoa(bytes(packet[12:16])), socket.inet_ntoa(bytes(packet[16:20]))
+    return checksum(packet[:20]), checksum(pseudo_header(dst_ip, src_ip, 20) + packet[20:40])
+
+
+
+def rendered_tcp_checksums(packet) -> tuple[int, int]:
+    return struct.unpack_from('!H', packet, 10)[0], struct.unpack_from('!H', packet, 36)[0]
+
+
+
+# TCP TEMPLATE -----------------------------------------------------------------------------------------------
+
+def test_template_renders_the_packet_of_the_builders():
+    template = Tcp_Template(DST_IP, SRC_IP, SRC_PORT)
+    packet   = bytearray(template._render(memoryview(bytearray(Tcp_Template.SIZE)), 443, ip_id=1234))
+    expected = bytearray(IP(DST_IP, SRC_IP, socket.IPPROTO_TCP, ip_id=1234) + TCP(DST_IP, 443, SRC_IP, src_port=SRC_PORT))
+    for packet_bytes in (packet, expected):
+        packet_bytes[10:12] = bytes(2)
+        packet_bytes[36:38] = bytes(2)
+    assert packet == expected
+
+
+
+def test_incremental_checksums_equal_full_recompute():
+    template = Tcp_Template(DST_IP, SRC_IP, SRC_PORT)
+    slot     = memoryview(bytearray(Tcp_Template.SIZE))
+    rng      = random.Random(1)
+    probes   = [(port, ip_id, None) for port in EDGES for ip_id in EDGES]
+    probes  += [(rng.randrange(65536), rng.randrange(65536), rng.randrange(1, 65536)) for _ in range(2000)]
+    for port, ip_id, src_port in probes:
+        packet = template._render(slot, port, ip_id, src_port)
+        assert rendered_tcp_checksums(packet) == full_tcp_checksums(packet)
+
+
+
+def test_update_checksum_follows_a_changed_word():
+    rng = random.Random(2)
+    for _ in range(2000):
+        data     = bytearray(rng.randbytes(20))
+        offset   = rng.randrange(10) * 2
+        old_word = struct.unpack_from('!H', data, offset)[0]
+        new_word = rng.choice(EDGES) if rng.random() < 0.2 else rng.randrange(65536)
+        previous = checksum(data)
+        struct.pack_into('!H', data, offset, new_word)
+        assert update_checksum(previous, old_word, new_word) == checksum(data)
+
+
+
+def test_arena_recompute_matches_the_rendered_checksums():
+    template = Tcp_Template(DST_IP, SRC_IP, SRC_PORT)
+    arena    = Packet_Arena(64)
+    rendered = [bytes(template._render(arena._slot(index), 1000 + index, index * 997)) for index in range(len(arena))]
+    arena._recompute_tcp_checksums(template._pseudo_sum)
+    assert [bytes(arena._slot(index)) for index in range(len(arena))] == rendered
+
+
+
+def test_destination_rewrite_keeps_the_checksums_valid():
+    template = Tcp_Template(DST_IP, SRC_IP, SRC_PORT)
+    slot     = memoryview(bytearray(Tcp_Template.SIZE))
+    rng      = random.Random(3)
+    for _ in range(2000):
+        dst_ip = rng.choice((0, 0xffffffff, rng.getrandbits(32)))
+        packet = template._render(slot, rng.randrange(65536), rng.randrange(65536), rng.randrange(1, 65536), dst_ip)
+        assert struct.unpack_from('!I', packet, 16)[0] == dst_ip
+        assert rendered_tcp_checksums(packet) == full_tcp_checksums(packet)
+
+
+
+# OTHER TEMPLATES --------------------------------------------------------------------------------------------
+
+def test_arp_template_renders_the_request_of_the_builder():
+    src_mac  = bytes.fromhex('020000000001')
+    template = Arp_Template(src_mac, SRC_IP)
+    slot     = memoryview(bytearray(Arp_Template.SIZE))
+    for dst_ip in ('192.0.2.1', '10.0.0.254', '255.255.255.255'):
+        address = int.from_bytes(socket.inet_aton(dst_ip), 'big')
+        assert bytes(template._render(slot, address)) == create_arp_request(src_mac, SRC_IP, dst_ip)
+
+
+
+def test_icmp_template_renders_the_echo_of_the_builder():
+    for payload in (b'', b'netxplorer', b'\xff' * 7):
+        template = Icmp_Template(0x1234, payload)
+        slot     = memoryview(bytearray(template._size))
+        for sequence in EDGES:
+            assert bytes(template._render(slot, sequence)) == ICMP_Echo(0x1234, sequence, payload)
+
+
+
+def test_sequence_numbers_keep_the_checksums_valid():
+    template = Tcp_Template(DST_IP, SRC_IP, SRC_PORT)
+    slot     = memoryview(bytearray(Tcp_Template.SIZE))
+    rng      = random.Random(4)
+    for _ in range(2000):
+        seq    = rng.choice((1, 0xffff, 0x10000, 0xffffffff, rng.getrandbits(32)))
+        packet = template._render(slot, rng.randrange(65536), rng.randrange(65536), seq=seq)
+        assert struct.unpack_from('!I', packet, 24)[0] == seq
+        assert rendered_tcp_checksums(packet) == full_tcp_checksums(packet)
+
+
+
+# A zero UDP checksum means none was computed, so a computed zero is sent as 0xffff
+def full_udp_checksum(packet) -> int:
+    packet = bytearray(packet)
+    packet[26:28] = bytes(2)
+    pseudo = bytes(packet[12:20]) + struct.pack('!BBH', 0, socket.IPPROTO_UDP, len(packet) - 20)
+    return checksum(pseudo + packet[20:]) or 0xffff
+
+
+
+def test_udp_template_checksums_equal_full_recompute():
+    template = Udp_Template(SRC_IP, SRC_PORT)
+    slot     = memoryview(bytearray(1500))
+    rng      = random.Random(5)
+    payloads = [b'', b'\x00', b'\xff' * 3] + [rng.randbytes(rng.randrange(1, 200)) for _ in range(50)]
+    for _ in range(2000):
+        dst_ip, dst_port, ip_id = rng.getrandbits(32), rng.randrange(65536), rng.randrange(65536)
+        payload = rng.choice(payloads)
+        packet  = template._render(slot, dst_ip, dst_port, payload, ip_id)
+        header  = bytearray(packet[:20])
+        header[10:12] = bytes(2)
+        assert len(packet) == Udp_Template.HEADER + len(payload) == struct.unpack_from('!H', packet, 2)[0]
+        assert struct.unpack_from('!IHH', packet, 16) == (dst_ip, SRC_PORT, dst_port)
+        assert struct.unpack_from('!H', packet, 10)[0] == checksum(header)
+        assert struct.unpack_from('!H', packet, 26)[0] == full_udp_checksum(packet)
+        assert bytes(packet[28:]) == payload
@@ -0,0 +1,161 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import pytest
+import rate_control
+from rate_control import *
+
+
+# Stands in for the time module, sleeping only moves the clock forward
+class Fake_Clock:
+
+    def __init__(self) -> None:
+        self._now:float   = 1000.0
+        self._slept:float = 0.0
+
+
+    def monotonic(self) -> float:
+        return self._now
+
+
+    def sleep(self, seconds:float) -> None:
+        self._now   += seconds
+        self._slept += seconds
+
+
+    def _advance(self, seconds:float) -> None:
+        self._now += seconds
+
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Fake_Clock:
+    clock = Fake_Clock()
+    monkeypatch.setattr(rate_control, 'time', clock)
+    return clock
+
+
+
+# TOKEN BUCKET -----------------------------------------------------------------------------------------------
+
+def test_bucket_lets_a_burst_through_then_paces(clock):
+    limiter = Rate_Limiter(1000, burst=10)
+    for _ in range(10): limiter._acquire()
+    assert clock._slept == 0
+    for _ in range(1000): limiter._acquire()
+    assert clock._slept == pytest.approx(1.0)
+
+
+
+def test_bucket_holds_no_more_than_a_burst(clock):
+    limiter = Rate_Limiter(1000, burst=10)
+    clock._advance(60)
+    limiter._acquire(10)
+    assert clock._slept == 0
+    limiter._acquire(5)
+    assert clock._slept == pytest.approx(0.005)
+
+
+
+def test_burst_size_stays_within_a_second_of_sending(clock):
+    limiter = Rate_Limiter(100000)
+    assert limiter._burst_size() == 1000
+    limiter._rate = 10
+    assert limiter._burst_size() == 10
+    limiter._rate = 0.5
+    assert limiter._burst_size() == 1
+
+
+
+# ADAPTATION -------------------------------------------------------------------------------------------------
+
+# Feeds one window of probes with the given reply ratio, the counters given to the limiter are cumulative
+def observe_window(limiter:Rate_Limiter, clock:Fake_Clock, probes:int, ratio:float) -> float:
+    clock._advance(Rate_Limiter.WINDOW)
+    limiter._observe(limiter._window_sent + probes, limiter._window_replies + int(probes * ratio))
+    return limiter._rate
+
+
+
+def test_rate_halves_when_the_replies_drop_and_recovers_additively(clock):
+    limiter = Rate_Limiter(1000)
+    assert observe_window(limiter, clock, 100, 0.5) == 1000
+    assert observe_window(limiter, clock, 100, 0.1) == 500
+    assert observe_window(limiter, clock, 100, 0.1) == 250
+    assert observe_window(limiter, clock, 100, 0.4) == 300
+    assert observe_window(limiter, clock, 100, 0.5) == 350
+
+
+
+def test_rate_ignores_short_and_small_windows(clock):
+    limiter = Rate_Limiter(1000)
+    observe_window(limiter, clock, 100, 0.5)
+    assert observe_window(limiter, clock, Rate_Limiter.MIN_SAMPLE - 1, 0.0) == 1000
+    limiter._observe(limiter._window_sent + 100, limiter._window_replies)
+    assert limiter._rate == 1000
+    assert observe_window(limiter, clock, 100, 0.0) == 500
+
+
+
+def test_rate_stays_above_its_minimum(clock):
+    limiter = Rate_Limiter(1000)
+    observe_window(limiter, clock, 100, 0.5)
+    for _ in range(20): observe_window(limiter, clock, 100, 0.0)
+    assert limiter._rate == 1.0
+
+
+
+def test_congestion_backs_off_once_per_window(clock):
+    limiter = Rate_Limiter(1000)
+    for _ in range(5): limiter._report_congestion()
+    assert limiter._rate == 500
+    clock._advance(Rate_Limiter.WINDOW)
+    limiter._report_congestion()
+    assert limiter._rate == 250
+
+
+
+# ICMP PACER -------------------------------------------------------------------------------------------------
+
+# Retransmits for one window in steps of a millisecond, the target answers the first retransmissions
+def pace_window(pacer:Icmp_Pacer, start:float, answers:int) -> int:
+    sent = 0
+    for tick in range(1000):
+        now = start + tick / 1000
+        if pacer._next(now) is None: continue
+        if sent < answers: pacer._observe(now, True)
+        sent += 1
+    return sent
+
+
+
+def test_pacer_is_limited_once_a_retransmission_draws_a_message():
+    pacer = Icmp_Pacer()
+    pacer._observe(1.0, False)
+    assert not pacer._is_limited()
+    pacer._observe(2.0, True)
+    pacer._observe(3.0, True)
+    assert pacer._is_limited() and pacer._limited_since == 2.0
+
+
+
+def test_pacer_doubles_while_answered_and_falls_back_to_the_answered_rate():
+    pacer = Icmp_Pacer()
+    pacer._queue.extend((index, 1) for index in range(100))
+    sent  = [pace_window(pacer, 10.0 + second, answers) for second, answers in enumerate((100, 100, 100, 3))]
+    assert sent == [1, 2, 4, 8]
+    pacer._next(14.0)
+    assert pacer._rate == 3.0
+
+
+
+def test_pacer_waits_for_queued_retransmissions():
+    pacer = Icmp_Pacer()
+    assert pacer._next(10.0) is None
+    pacer._queue.extend([(7, 1), (8, 1)])
+    assert pacer._next(10.0) == (7, 1)
+    assert pacer._next(10.5) is None
+    assert pacer._next(11.0) == (8, 1)
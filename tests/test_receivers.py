@@ -0,0 +1,94 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import ctypes, socket, struct, pytest
+from packets   import create_tcp_packet, IP
+from receivers import destination_port_filter
+
+
+PORT = 40000
+
+
+# CLASSIC BPF ------------------------------------------------------------------------------------------------
+
+# Runs a classic BPF program the way the kernel does on a raw socket, over the packet from its IP header on.
+# Loads, jumps on constants and returns are known, a load past the end of the packet drops it
+def run_filter(program:list[tuple[int, int, int, int]], packet:bytes) -> int:
+    a = x = pc = 0
+    sizes = {0x00: 4, 0x08: 2, 0x10: 1}
+    while True:
+        code, jt, jf, k = program[pc]
+        pc += 1
+        match code:
+            case 0x06: return k                                                    # ret #k
+            case 0x16: return a                                                    # ret a
+            case 0x20 | 0x28 | 0x30 | 0x40 | 0x48 | 0x50:                          # ld [k] and ld [x + k]
+                offset = k + (x if code & 0x40 else 0)
+                size   = sizes[code & 0x18]
+                if offset + size > len(packet): return 0
+                a = int.from_bytes(packet[offset:offset + size], 'big')
+            case 0xb1:                                                             # ldx 4 * ([k] & 0xf)
+                if k >= len(packet): return 0
+                x = 4 * (packet[k] & 0x0f)
+            case 0x15: pc += jt if a == k else jf                                  # jeq #k
+            case 0x25: pc += jt if a > k else jf                                   # jgt #k
+            case 0x35: pc += jt if a >= k else jf                                  # jge #k
+            case 0x45: pc += jt if a & k else jf                                   # jset #k
+            case 0x05: pc += k                                                     # ja
+            case _: raise AssertionError(f'Unknown BPF instruction: {code:#x}')
+
+
+
+# The attached program points at its instructions, they are read back from that address
+def decode_filter(port:int) -> list[tuple[int, int, int, int]]:
+    program, instructions = destination_port_filter(port)
+    count, address        = struct.unpack('HL', program)
+    assert address == ctypes.addressof(instructions)
+    return [struct.unpack_from('HBBI', instructions, index * 8) for index in range(count)]
+
+
+
+def tcp_reply(dst_port:int, src_port:int=443, options:bytes=b'') -> bytes:
+    packet = bytearray(create_tcp_packet('192.0.2.2', dst_port, '192.0.2.1', src_port))
+    if not options: return bytes(packet)
+    packet[0] = 0x40 | (5 + len(options) // 4)
+    return bytes(packet[:20] + options + packet[20:])
+
+
+
+# FILTER -----------------------------------------------------------------------------------------------------
+
+def test_filter_accepts_replies_to_the_scan_port():
+    program = decode_filter(PORT)
+    assert run_filter(program, tcp_reply(PORT))
+    assert run_filter(program, tcp_reply(PORT, src_port=PORT))
+
+
+
+@pytest.mark.parametrize('dst_port', (0, 22, PORT - 1, PORT + 1, 65535))
+def test_filter_drops_replies_to_other_ports(dst_port):
+    assert not run_filter(decode_filter(PORT), tcp_reply(dst_port))
+
+
+
+def test_filter_finds_the_port_after_ip_options():
+    program = decode_filter(PORT)
+    for options in (b'\x01' * 4, b'\x01' * 40):
+        assert run_filter(program, tcp_reply(PORT, options=options))
+        assert not run_filter(program, tcp_reply(PORT + 1, 23, options=options))
+        assert not run_filter(program, tcp_reply(PORT + 1, PORT, options=options))
+
+
+
+def test_filter_reads_udp_ports_like_tcp_ones():
+    datagram = IP('192.0.2.2', '192.0.2.1', socket.IPPROTO_UDP) + struct.pack('!HHHH', 53, PORT, 8, 0)
+    assert run_filter(decode_filter(PORT), datagram)
+    assert not run_filter(decode_filter(PORT + 1), datagram)
+
+
+
+def test_filter_drops_truncated_packets():
+    assert not run_filter(decode_filter(PORT), tcp_reply(PORT)[:21])
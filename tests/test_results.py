@@ -0,0 +1,50 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+from packets import TCP_SYN_ACK, TCP_RST_ACK
+from results import *
+from targets import int_to_ip
+
+
+ROWS = 2 * Result_Table.RECYCLE + 10
+
+
+def filled_stream(recycle:bool=True) -> Result_Stream:
+    stream = Result_Stream()
+    stream._table._recycle = recycle
+    for index in range(ROWS): stream._put(index, 80, TCP_SYN_ACK if index % 2 else TCP_RST_ACK)
+    stream._close()
+    return stream
+
+
+
+def test_read_rows_are_dropped_in_chunks():
+    stream = filled_stream()
+    held   = list()
+    for count, row in enumerate(stream, 1):
+        held.append(len(stream._table._rtts))
+        assert row[0] == int_to_ip(count - 1)
+    assert count == ROWS == len(stream._table)
+    assert stream._table._base == 2 * Result_Table.RECYCLE
+    assert held[Result_Table.RECYCLE] == ROWS - Result_Table.RECYCLE
+
+
+
+def test_indexes_stay_valid_after_a_drop():
+    table = Result_Table()
+    for index in range(ROWS): table._append(index, 80, TCP_SYN_ACK if index % 2 else TCP_RST_ACK)
+    table._release(ROWS - 10)
+    assert table._base == ROWS - 10 and len(table) == ROWS
+    assert table._where(TCP_SYN_ACK) == [index for index in range(ROWS - 10, ROWS) if index % 2]
+    assert table._row(ROWS - 1)[0] == int_to_ip(ROWS - 1)
+    assert [row[0] for row in table] == [int_to_ip(index) for index in range(ROWS - 10, ROWS)]
+
+
+
+def test_rows_are_kept_when_recycling_is_off():
+    stream = filled_stream(recycle=False)
+    assert sum(1 for _ in stream) == ROWS
+    assert stream._table._base == 0 and len(stream._table._rtts) == ROWS
@@ -0,0 +1,94 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import json, os, subprocess, sys, pytest
+from output import read_binary_records
+
+
+MAIN    = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'code', 'main.py')
+TIMEOUT = 60
+PORTS   = (22, 53, 80, 443)
+HOSTS   = [f'10.0.0.{host}' for host in range(1, 7)]
+NETWORK = {'local': '10.0.0.1/24', 'latency': 0.001,
+           'hosts': {'10.0.0.0/29': {'tcp': '22,80', 'udp': '53,161'},
+                     '10.0.0.3':    {'ping': False},
+                     '10.0.0.5':    {'tcp': '443', 'filtered': True}}}
+
+
+@pytest.fixture
+def network(tmp_path) -> str:
+    path = tmp_path / 'network.json'
+    path.write_text(json.dumps(NETWORK))
+    return str(path)
+
+
+
+# Scans run as they do from the command line, the simulated network needs no root
+def run(network:str, *arguments:str) -> str:
+    result = subprocess.run([sys.executable, MAIN, *arguments, '-Z', network],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=TIMEOUT)
+    return result.stdout
+
+
+
+def run_records(network:str, *arguments:str) -> list[dict]:
+    return [json.loads(line) for line in run(network, *arguments, '-o', 'jsonl').splitlines()]
+
+
+
+def port_states(records:list[dict]) -> dict:
+    return {(record['host'], record['port']): record['state'] for record in records}
+
+
+
+# The more specific entries of the network replace the /29 one: 10.0.0.3 opens nothing, 10.0.0.5 only 443/tcp
+# and drops what it does not answer
+def expected_states(protocol:str) -> dict:
+    states = dict()
+    for host in HOSTS:
+        for port in PORTS:
+            match host:
+                case '10.0.0.3': state = 'closed'
+                case '10.0.0.5': state = 'open' if (protocol, port) == ('tcp', 443) else 'filtered'
+                case _:          state = 'open' if port in {'tcp': (22, 80), 'udp': (53,)}[protocol] else 'closed'
+            states[(host, port)] = 'open|filtered' if (protocol, state) == ('udp', 'filtered') else state
+    return states
+
+
+
+# SCANS ------------------------------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('engine', (['-F'], ['-C'], ['-F', '-W', '2']))
+def test_tcp_scans_find_the_state_of_every_port(network, engine):
+    records = run_records(network, 'pscan', '10.0.0.0/29', '-p', '22,53,80,443', '-s', *engine)
+    assert len(records) == len(HOSTS) * len(PORTS)
+    assert port_states(records) == expected_states('tcp')
+
+
+
+def test_udp_scan_finds_the_state_of_every_port(network):
+    records = run_records(network, 'pscan', '10.0.0.0/29', '-p', '22,53,80,443', '-s', '-U')
+    assert port_states(records) == expected_states('udp')
+
+
+
+def test_only_open_ports_are_shown_by_default(network):
+    records = run_records(network, 'pscan', '10.0.0.0/29', '-p', '22,53,80,443', '-F')
+    assert port_states(records) == {probe: state for probe, state in expected_states('tcp').items() if state == 'open'}
+
+
+
+def test_binary_output_holds_the_scan(network, tmp_path):
+    path = str(tmp_path / 'scan.bin')
+    run(network, 'pscan', '10.0.0.0/29', '-p', '22,53,80,443', '-F', '-o', 'binary', '-w', path)
+    opened = {(record['host'], record['port']) for _, record in read_binary_records(path) if record['flags'] == 'SA'}
+    assert opened == {probe for probe, state in expected_states('tcp').items() if state == 'open'}
+
+
+
+def test_ping_sweep_finds_the_hosts_that_answer(network):
+    records = run_records(network, 'netmap', '-p')
+    assert sorted(record['host'] for record in records) == [f'10.0.0.{host}' for host in (1, 2, 4, 5, 6, 7)]
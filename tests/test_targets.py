@@ -0,0 +1,86 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import ipaddress, itertools, pytest
+from targets import *
+from ports   import parse_ports
+
+
+SIZES    = (1, 2, 3, 10, 254, 1000, 65536)
+NETWORKS = [ipaddress.IPv4Network('10.0.0.0/29'), ipaddress.IPv4Network('192.0.2.7/32')]
+
+
+# PROBE ORDER ------------------------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('size', SIZES)
+def test_permutation_visits_every_index_once(size):
+    assert sorted(Cyclic_Permutation(size, seed=size)) == list(range(size))
+
+
+
+def test_permutation_is_fixed_by_the_seed():
+    assert list(Cyclic_Permutation(1000, seed=1)) == list(Cyclic_Permutation(1000, seed=1))
+    assert list(Cyclic_Permutation(1000, seed=1)) != list(Cyclic_Permutation(1000, seed=2))
+
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('shards', (2, 3, 7))
+def test_shards_split_the_permutation(size, shards):
+    parts = [list(Cyclic_Permutation(size, seed=5, shard=shard, shards=shards)) for shard in range(shards)]
+    assert sorted(itertools.chain(*parts)) == list(range(size))
+
+
+
+@pytest.mark.parametrize('shards', (1, 3))
+def test_permutation_resumes_from_its_position(shards):
+    order = Cyclic_Permutation(1000, seed=9, shard=shards - 1, shards=shards)
+    first = list(itertools.islice(order, 100))
+    rest  = list(Cyclic_Permutation(1000, seed=9, shard=shards - 1, shards=shards, position=order._position))
+    assert first + rest == list(Cyclic_Permutation(1000, seed=9, shard=shards - 1, shards=shards))
+
+
+
+@pytest.mark.parametrize('shards', (1, 2, 7))
+def test_sequential_shards_split_the_range(shards):
+    parts = [list(Sequential_Order(100, shard, shards)) for shard in range(shards)]
+    assert sorted(itertools.chain(*parts)) == list(range(100))
+    assert list(Sequential_Order(100, 0, shards, position=5)) == parts[0][5:]
+
+
+
+def test_parse_shard():
+    assert parse_shard(None) == (0, 1)
+    assert parse_shard('2/4') == (1, 4)
+    for spec in ('0/4', '5/4'):
+        with pytest.raises(ValueError): parse_shard(spec)
+
+
+
+# TARGET SPACE -----------------------------------------------------------------------------------------------
+
+def test_host_bounds_skip_network_and_broadcast():
+    first = int(ipaddress.IPv4Address('10.0.0.0'))
+    assert host_bounds(ipaddress.IPv4Network('10.0.0.0/24')) == (first + 1, 254)
+    assert host_bounds(ipaddress.IPv4Network('10.0.0.0/31')) == (first, 2)
+    assert host_bounds(ipaddress.IPv4Network('10.0.0.0/32')) == (first, 1)
+
+
+
+def test_space_probes_every_host_and_port():
+    space = Target_Space(NETWORKS, parse_ports('22,80,443'))
+    hosts = [int(host) for network in NETWORKS for host in network.hosts()]
+    assert len(space) == 7 * 3
+    assert sorted(space._probe(index) for index in range(len(space))) == sorted(itertools.product(hosts, [22, 80, 443]))
+
+
+
+def test_space_indexes_its_probes():
+    space = Target_Space(NETWORKS, parse_ports('22,80,443'))
+    for index in range(len(space)):
+        assert space._index(*space._probe(index)) == index
+    assert space._index(int(ipaddress.IPv4Address('10.0.0.7')), 22) is None
+    assert space._index(int(ipaddress.IPv4Address('10.0.0.1')), 23) is None
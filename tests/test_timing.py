@@ -0,0 +1,93 @@
+# MIT License
+# Copyright (c) 2024 Oliver Calazans
+# Repository: https://github.com/olivercalazans/netxplorer
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software...
+
+
+import random, pytest
+from timing import *
+
+
+# RTT ESTIMATOR ----------------------------------------------------------------------------------------------
+
+def test_first_sample_sets_the_estimate():
+    estimator = Rtt_Estimator()
+    assert estimator._timeout() is None
+    estimator._observe(0.1)
+    assert (estimator._srtt, estimator._rttvar) == (0.1, 0.05)
+    assert estimator._timeout() == pytest.approx(0.3)
+
+
+
+def test_later_samples_follow_rfc_6298():
+    estimator, rng = Rtt_Estimator(), random.Random(6)
+    samples        = [rng.uniform(0.001, 0.5) for _ in range(200)]
+    srtt, rttvar   = samples[0], samples[0] / 2
+    estimator._observe(samples[0])
+    for rtt in samples[1:]:
+        rttvar = 0.75 * rttvar + 0.25 * abs(srtt - rtt)
+        srtt   = 0.875 * srtt + 0.125 * rtt
+        estimator._observe(rtt)
+        assert estimator._srtt == pytest.approx(srtt)
+        assert estimator._rttvar == pytest.approx(rttvar)
+        assert estimator._timeout() == pytest.approx(srtt + max(Rtt_Estimator.GRANULARITY, 4 * rttvar))
+
+
+
+def test_steady_samples_leave_the_clock_granularity():
+    estimator = Rtt_Estimator()
+    for _ in range(200): estimator._observe(0.05)
+    assert estimator._timeout() == pytest.approx(0.05 + Rtt_Estimator.GRANULARITY)
+
+
+
+# TIMING -----------------------------------------------------------------------------------------------------
+
+def test_timeout_starts_from_the_initial_value():
+    assert Timing()._timeout('10.0.0.1') == Timing.INITIAL
+
+
+
+def test_unanswered_targets_borrow_the_overall_estimate():
+    timing = Timing()
+    timing._observe('10.0.0.1', 0.5)
+    timing._observe('10.0.0.2', 0.2)
+    assert timing._timeout('10.0.0.1') == pytest.approx(1.5)
+    assert timing._timeout('10.0.0.2') == pytest.approx(0.6)
+    assert timing._timeout('10.0.0.3') == pytest.approx(timing._overall._timeout())
+
+
+
+def test_timeout_is_clamped_and_doubles_with_every_attempt():
+    timing = Timing(max_timeout=2.0)
+    timing._observe('fast', 0.01)
+    timing._observe('slow', 0.4)
+    assert timing._timeout('fast') == Timing.MIN_TIMEOUT
+    assert [timing._timeout('slow', attempt) for attempt in range(3)] == pytest.approx([1.2, 2.0, 2.0])
+
+
+
+def test_unmeasured_replies_are_not_observed():
+    timing = Timing()
+    timing._observe('10.0.0.1', 0.0)
+    assert timing._targets == {} and timing._overall._srtt is None
+
+
+
+def test_lifetime_covers_every_attempt():
+    assert Timing(max_timeout=2.0, retries=0)._lifetime() == 2.0
+    assert Timing(max_timeout=2.0, retries=3)._lifetime() == 8.0
+
+
+
+# RETRANSMIT TIMER -------------------------------------------------------------------------------------------
+
+def test_timer_expires_probes_in_deadline_order():
+    timer = Retransmit_Timer()
+    for deadline, index in ((3.0, 30), (1.0, 10), (2.0, 20), (5.0, 50)):
+        timer._schedule(deadline, index, 0)
+    assert timer._next_deadline() == 1.0
+    assert list(timer._expired(2.5)) == [(10, 0), (20, 0)]
+    assert len(timer) == 2 and timer._next_deadline() == 3.0
+    assert list(timer._expired(10.0)) == [(30, 0), (50, 0)]
+    assert not timer and timer._next_deadline() is None